@@ -0,0 +1,217 @@
+"""Headless agent: collect on this host and push batches to a central instance.
+
+Runs the same collectors and sampling tiers as the server, without the
+database or the web app. Samples gathered over AGENT_PUSH_INTERVAL are
+written to the spool directory as one gzip-compressed batch, then the
+spool is sent oldest-first to AGGREGATOR_URL/api/ingest. A batch is
+deleted once the aggregator has committed it, so batches pile up on disk
+(up to AGENT_SPOOL_MAX_MB, oldest dropped first) while it is unreachable
+and drain when it is back.
+
+Usage: AGGREGATOR_URL=http://central:8081 INGEST_TOKEN=secret AGENT_HOST=web-3 python agent.py
+"""
+
+import gzip
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from config import Config
+from collectors import AGGREGATED_TIERS, COLLECTOR_TIERS, COUNTER_FIELDS, SNAPSHOT_ONLY_TYPES
+from ingest import is_valid_host
+from sampling import SampleAggregator
+from sketch import SketchAggregator
+from serialization import dumps
+
+logging.basicConfig(
+    level=getattr(logging, Config.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SEND_TIMEOUT_SECONDS = 30
+
+# Rejections that resending cannot fix; anything else is retried
+_DROP_STATUSES = frozenset({400, 413, 422})
+
+
+class Spool:
+    """Directory of pending batches, one file each, named in send order."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, body: bytes):
+        name = f'{time.time_ns():020d}.json.gz'
+        tmp_path = os.path.join(self.path, f'.{name}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, name))
+        self._enforce_limit()
+
+    def pending(self) -> list:
+        return sorted(n for n in os.listdir(self.path) if n.endswith('.json.gz'))
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+
+    def remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.path, name))
+        except FileNotFoundError:
+            pass
+
+    def _enforce_limit(self):
+        names = self.pending()
+        sizes = {n: os.path.getsize(os.path.join(self.path, n)) for n in names}
+        total = sum(sizes.values())
+        for name in names[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= sizes[name]
+            self.remove(name)
+            self.dropped += 1
+            logger.warning(f"Spool over {self.max_bytes // (1024 * 1024)} MB; dropped oldest batch {name}")
+
+
+class Agent:
+    """Collects every tier on schedule and pushes spooled batches."""
+
+    def __init__(self, host: str, url: str, token: str, spool: Spool):
+        self.host = host
+        self.url = f'{url}/api/ingest'
+        self.token = token
+        self.spool = spool
+        self.sampler = SampleAggregator(COUNTER_FIELDS)
+        self.sketcher = SketchAggregator()
+        self._lock = threading.Lock()
+        self._samples = []
+        self._sketches = []
+
+    def _queue(self, metric_type: str, data: dict):
+        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._samples.append([metric_type, timestamp, data])
+
+    def collect_tier(self, tier: str):
+        for metric_type, collector in COLLECTOR_TIERS[tier]:
+            if metric_type in SNAPSHOT_ONLY_TYPES:
+                continue
+            try:
+                data = collector()
+            except Exception as e:
+                logger.error(f"Error collecting {metric_type} metrics: {e}")
+                continue
+            if metric_type in Config.SKETCH_METRIC_TYPES:
+                self.sketcher.add(metric_type, data)
+            if tier in AGGREGATED_TIERS:
+                self.sampler.add(metric_type, data)
+            else:
+                self._queue(metric_type, data)
+
+    def flush_samples(self):
+        for metric_type, data in self.sampler.flush().items():
+            self._queue(metric_type, data)
+        sketches = [[metric_type, started, data] for metric_type, (started, data) in self.sketcher.flush().items()]
+        with self._lock:
+            self._sketches.extend(sketches)
+
+    def spool_samples(self):
+        """Write what was collected since the last push to the spool as one batch."""
+        with self._lock:
+            samples, self._samples = self._samples, []
+            sketches, self._sketches = self._sketches, []
+        if samples or sketches:
+            batch = {'host': self.host, 'samples': samples}
+            if sketches:
+                batch['sketches'] = sketches
+            self.spool.write(gzip.compress(dumps(batch), compresslevel=6))
+
+    def push(self):
+        """Spool the new samples, then send spooled batches oldest-first until one fails."""
+        self.spool_samples()
+        for name in self.spool.pending():
+            if not self._send(name, self.spool.read(name)):
+                break
+            self.spool.remove(name)
+
+    def _send(self, name: str, body: bytes) -> bool:
+        """POST one batch; True once it no longer needs sending."""
+        request = urllib.request.Request(self.url, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Authorization': f'Bearer {self.token}',
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=SEND_TIMEOUT_SECONDS) as resp:
+                resp.read()
+            return True
+        except urllib.error.HTTPError as e:
+            if e.code in _DROP_STATUSES:
+                logger.error(f"Aggregator rejected batch {name} ({e.code}: {e.read()[:200]!r}); dropping it")
+                return True
+            logger.warning(f"Aggregator returned {e.code}; keeping {len(self.spool.pending())} spooled batches")
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning(f"Aggregator unreachable ({e}); keeping {len(self.spool.pending())} spooled batches")
+        return False
+
+
+def start_agent(agent: Agent) -> BackgroundScheduler:
+    scheduler = BackgroundScheduler()
+    tier_intervals = {
+        'fast': Config.FAST_INTERVAL,
+        'medium': Config.MEDIUM_INTERVAL,
+        'slow': Config.SLOW_INTERVAL,
+    }
+    for tier, seconds in tier_intervals.items():
+        scheduler.add_job(agent.collect_tier, 'interval', args=[tier], seconds=seconds, id=f'collect_{tier}')
+        # First sample right away rather than one interval after startup
+        scheduler.add_job(agent.collect_tier, args=[tier], id=f'warm_up_{tier}')
+    scheduler.add_job(agent.flush_samples, 'interval', seconds=Config.COLLECTION_INTERVAL, id='flush_samples')
+    scheduler.add_job(agent.push, 'interval', seconds=Config.AGENT_PUSH_INTERVAL, id='push')
+    scheduler.start()
+    return scheduler
+
+
+def main():
+    if not Config.AGGREGATOR_URL:
+        logger.error("Set AGGREGATOR_URL to the central instance, e.g. http://central:8081")
+        return 2
+    if not is_valid_host(Config.AGENT_HOST):
+        logger.error(f"AGENT_HOST {Config.AGENT_HOST!r} is not a valid host name (letters, digits, '.', '_', '-')")
+        return 2
+
+    spool = Spool(Config.AGENT_SPOOL_DIR, Config.AGENT_SPOOL_MAX_MB * 1024 * 1024)
+    agent = Agent(Config.AGENT_HOST, Config.AGGREGATOR_URL, Config.INGEST_TOKEN, spool)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    scheduler = start_agent(agent)
+    logger.info(f"Agent {agent.host} pushing to {Config.AGGREGATOR_URL} every {Config.AGENT_PUSH_INTERVAL}s")
+    stopped.wait()
+    scheduler.shutdown(wait=True)
+
+    # Keep what was collected since the last push for the next run
+    agent.flush_samples()
+    agent.spool_samples()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,25 @@
 """Flask API server for server monitoring dashboard."""
 
+import hmac
 import logging
-import os
-import atexit
-from flask import Flask, jsonify, send_from_directory
-from apscheduler.schedulers.background import BackgroundScheduler
+import time
+from flask import Flask, Response, jsonify, send_from_directory, request, g
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from config import Config
-from database import init_database, store_metrics, get_metrics, get_latest_metrics, cleanup_old_data, get_database_stats, check_and_store_alert, get_alerts
-from collectors import collect_cpu_metrics, collect_memory_metrics, collect_disk_metrics, collect_smart_metrics, collect_drives_metrics, collect_docker_metrics, collect_process_metrics, collect_network_metrics, collect_services_metrics
+from database import get_dashboard, get_metrics_page, get_metrics_since, get_quantiles, iter_metrics, get_latest_metrics, get_daily_ranges, get_database_stats, get_alerts, get_recording, get_hosts, query_cache, LOCAL_HOST, MAX_ROW_ID
+from collection import start_collection
+from current import encoded_current, warming_up
+from downsample import DEFAULT_FIELDS, DEFAULT_METHOD, MAX_POINTS, METHODS, downsample_rows, resolve_fields
+from forecast import get_forecast
+from notify import notifier
+from rules import rule_engine
+from export import CONTENT_TYPES as EXPORT_CONTENT_TYPES, EXTENSIONS as EXPORT_EXTENSIONS, export_chunks, normalize_timestamp, parse_hosts, resolve_format
+from ingest import MAX_BATCH_BYTES, decode_batch, ingest_writer, is_valid_host
+from sketch import parse_quantiles
+from serialization import Raw, encode_rows, encode_ndjson, encode_cursor, decode_cursor, splice
+import instrumentation
+from exposition import CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE, get_exposition
 
 # Configure logging
 logging.basicConfig(
@@ -18,187 +29,419 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
+# Holds for chunked bodies too, which carry no Content-Length to check up
+# front. One byte over the batch cap, so read_body can tell a body of
+# exactly MAX_BATCH_BYTES from a longer one.
+app.config['MAX_CONTENT_LENGTH'] = MAX_BATCH_BYTES + 1
 
 
-def _check_alerts(cpu_data: dict, memory_data: dict, disk_data: dict):
-    """Check collected metrics against thresholds and log new alerts."""
-    t = Config.get_thresholds()
+# Metric types with stored history
+VALID_METRIC_TYPES = ['cpu', 'memory', 'disk', 'smart', 'drives', 'docker', 'processes', 'network']
 
-    # CPU temperature — find first valid zone
-    try:
-        temps = cpu_data.get('temperature', {})
-        if not isinstance(temps, dict) or temps.get('error'):
-            raise ValueError('no temp data')
-        temp = None
-        for zone in temps.values():
-            if isinstance(zone, dict) and 'temp_celsius' in zone:
-                if zone.get('type', '').lower() in ('x86_pkg_temp', 'cpu-thermal', 'cpu'):
-                    temp = zone['temp_celsius']
-                    break
-        if temp is None:
-            first = next((v for v in temps.values() if isinstance(v, dict) and 'temp_celsius' in v), None)
-            if first:
-                temp = first['temp_celsius']
-        if temp is not None:
-            if temp >= t['temperature']['critical']:
-                check_and_store_alert('critical', 'cpu_temp',
-                    f'CPU temp {temp}°C — critical threshold {t["temperature"]["critical"]}°C')
-            elif temp >= t['temperature']['warning']:
-                check_and_store_alert('warning', 'cpu_temp',
-                    f'CPU temp {temp}°C — warning threshold {t["temperature"]["warning"]}°C')
-    except Exception as e:
-        logger.debug(f"Alert check (cpu): {e}")
+# Largest page /api/history returns; use cursors or format=ndjson beyond it
+MAX_HISTORY_PAGE = 10000
 
-    # RAM
-    try:
-        if not memory_data.get('error'):
-            pct = memory_data.get('percent_used', 0)
-            if pct >= t['memory']['critical']:
-                check_and_store_alert('critical', 'memory',
-                    f'RAM {pct}% — critical threshold {t["memory"]["critical"]}%')
-            elif pct >= t['memory']['warning']:
-                check_and_store_alert('warning', 'memory',
-                    f'RAM {pct}% — warning threshold {t["memory"]["warning"]}%')
-    except Exception as e:
-        logger.debug(f"Alert check (memory): {e}")
+# Series the dashboard draws (frontend/app.js), when /api/dashboard is not told
+DASHBOARD_SERIES = ['cpu', 'network']
 
-    # Disk — check each mount point
-    try:
-        if not disk_data.get('error'):
-            for mount, disk in disk_data.items():
-                pct = disk.get('percent_used', 0)
-                if pct >= t['disk']['critical']:
-                    check_and_store_alert('critical', f'disk:{mount}',
-                        f'Disk {mount} at {pct}% — critical threshold {t["disk"]["critical"]}%')
-                elif pct >= t['disk']['warning']:
-                    check_and_store_alert('warning', f'disk:{mount}',
-                        f'Disk {mount} at {pct}% — warning threshold {t["disk"]["warning"]}%')
-    except Exception as e:
-        logger.debug(f"Alert check (disk): {e}")
 
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
 
-def collect_all_metrics():
-    """Collect and store all system metrics."""
-    logger.debug("Collecting metrics...")
 
-    cpu_data = memory_data = disk_data = {}
+@app.after_request
+def _record_request_time(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        instrumentation.observe('http', route, time.perf_counter() - started)
+    return response
 
-    try:
-        cpu_data = collect_cpu_metrics()
-        store_metrics('cpu', cpu_data)
-    except Exception as e:
-        logger.error(f"Error collecting CPU metrics: {e}")
 
-    try:
-        memory_data = collect_memory_metrics()
-        store_metrics('memory', memory_data)
-    except Exception as e:
-        logger.error(f"Error collecting memory metrics: {e}")
+# API Routes
+@app.route('/')
+def index():
+    """Serve the main dashboard."""
+    return send_from_directory(app.static_folder, 'index.html')
 
-    try:
-        disk_data = collect_disk_metrics()
-        store_metrics('disk', disk_data)
-    except Exception as e:
-        logger.error(f"Error collecting disk metrics: {e}")
 
-    try:
-        smart_data = collect_smart_metrics()
-        store_metrics('smart', smart_data)
-    except Exception as e:
-        logger.error(f"Error collecting SMART metrics: {e}")
+def _json_bytes(body: bytes) -> Response:
+    """Response for an already-encoded JSON body."""
+    return Response(body, mimetype='application/json')
 
-    try:
-        drives_data = collect_drives_metrics()
-        store_metrics('drives', drives_data)
-    except Exception as e:
-        logger.error(f"Error collecting drives metrics: {e}")
 
-    try:
-        docker_data = collect_docker_metrics()
-        store_metrics('docker', docker_data)
-    except Exception as e:
-        logger.error(f"Error collecting Docker metrics: {e}")
+def host_param(args) -> str:
+    """The ``host`` query parameter: an agent's name, or this instance when absent."""
+    host = (args.get('host') or '').strip()
+    if host and not is_valid_host(host):
+        raise ValueError(f'Invalid host name: {host!r}')
+    return host or LOCAL_HOST
 
-    try:
-        process_data = collect_process_metrics()
-        store_metrics('processes', process_data)
-    except Exception as e:
-        logger.error(f"Error collecting process metrics: {e}")
 
-    try:
-        network_data = collect_network_metrics()
-        if not network_data.get('_initializing'):
-            store_metrics('network', network_data)
-    except Exception as e:
-        logger.error(f"Error collecting network metrics: {e}")
+def since_param(value: str) -> tuple:
+    """The ``since`` query parameter as a keyset.
 
+    A timestamp (ISO, UTC) means rows after that second; a cursor from a
+    previous ``since`` response resumes exactly after its last row.
+    """
     try:
-        _check_alerts(cpu_data, memory_data, disk_data)
-    except Exception as e:
-        logger.error(f"Error checking alerts: {e}")
+        return normalize_timestamp(value), MAX_ROW_ID
+    except ValueError:
+        pass
+    try:
+        return decode_cursor(value)
+    except ValueError:
+        raise ValueError(f'Invalid since: {value!r}; expected a UTC timestamp or a cursor')
 
-    logger.debug("Metrics collection complete")
 
+def downsample_param(args, metric_type: str):
+    """The ``points`` query parameter and its options as ``downsample_rows`` arguments, or None.
 
-def daily_cleanup():
-    """Run daily database cleanup."""
-    logger.info("Running daily cleanup...")
-    cleanup_old_data(Config.RETENTION_DAYS)
+    ``field`` picks what the rows are ranked by (default: what the
+    dashboard draws for the type) and ``downsample`` the method.
+    """
+    if not args.get('points'):
+        return None
+    try:
+        points = int(args['points'])
+    except ValueError:
+        raise ValueError(f"Invalid points: {args['points']!r}")
+    points = min(max(points, 3), MAX_POINTS)
+    method = args.get('downsample') or DEFAULT_METHOD
+    if method not in METHODS:
+        raise ValueError(f'Invalid downsample method {method!r}. Valid: {list(METHODS)}')
+    return {'points': points, 'fields': resolve_fields(metric_type, args.get('field')), 'method': method}
+
+
+def agg_params(args, hours: int) -> dict:
+    """The ``agg`` query parameter and its options as ``get_quantiles`` arguments.
+
+    ``step`` is the bucket length in seconds (default an hour; at least
+    one collection interval, at most the whole window).
+    """
+    try:
+        step = int(args.get('step') or 3600)
+    except ValueError:
+        raise ValueError(f"Invalid step: {args['step']!r}")
+    return {
+        'field': (args.get('field') or '').strip(),
+        'quantiles': parse_quantiles(args['agg']),
+        'step': min(max(step, Config.COLLECTION_INTERVAL), hours * 3600),
+    }
+
+
+def encode_quantiles(metric_type: str, host: str, hours: int, params: dict, series: dict) -> dict:
+    """The /api/history body for ``agg=``."""
+    names = [name for name, _ in params['quantiles']]
+    return {
+        'metric_type': metric_type,
+        'host': host,
+        'hours': hours,
+        'step': params['step'],
+        'columns': ['timestamp', 'samples'] + names,
+        'series': series
+    }
 
 
-# API Routes
-@app.route('/')
-def index():
-    """Serve the main dashboard."""
-    return send_from_directory(app.static_folder, 'index.html')
+def history_limit(args) -> int:
+    """Rows to read: ``limit``, or with ``points`` a full page to downsample from."""
+    default = MAX_HISTORY_PAGE if args.get('points') else 1000
+    try:
+        limit = int(args.get('limit') or default)
+    except ValueError:
+        limit = default
+    return min(max(limit, 1), MAX_HISTORY_PAGE)
 
 
 @app.route('/api/current')
 def get_current_metrics():
     """Get current system metrics."""
-    return jsonify({
-        'cpu': collect_cpu_metrics(),
-        'memory': collect_memory_metrics(),
-        'disk': collect_disk_metrics(),
-        'smart': collect_smart_metrics(),
-        'drives': collect_drives_metrics(),
-        'docker': collect_docker_metrics(),
-        'processes': collect_process_metrics(),
-        'network': collect_network_metrics(),
-        'services': collect_services_metrics(),
-        'thresholds': Config.get_thresholds()
-    })
+    return _json_bytes(encoded_current())
 
 
 @app.route('/api/history/<metric_type>')
 def get_metric_history(metric_type):
     """Get historical metrics by type."""
-    from flask import request
-
-    valid_types = ['cpu', 'memory', 'disk', 'smart', 'drives', 'docker', 'processes', 'network']
-    if metric_type not in valid_types:
-        return jsonify({'error': f'Invalid metric type. Valid: {valid_types}'}), 400
+    if metric_type not in VALID_METRIC_TYPES:
+        return jsonify({'error': f'Invalid metric type. Valid: {VALID_METRIC_TYPES}'}), 400
 
     hours = request.args.get('hours', 24, type=int)
     hours = min(max(hours, 1), 2160)  # 1 hour to 90 days
+    try:
+        host = host_param(request.args)
+        downsample = downsample_param(request.args, metric_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = history_limit(request.args)
+
+    # Percentiles per step, merged from the stored quantile sketches
+    if request.args.get('agg'):
+        try:
+            params = agg_params(request.args, hours)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        series = get_quantiles(metric_type, hours=hours, host=host, **params)
+        return jsonify(encode_quantiles(metric_type, host, hours, params, series))
+
+    # Only rows newer than what the client already has
+    if request.args.get('since'):
+        try:
+            after = since_param(request.args['since'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        rows, last, more = get_metrics_since(metric_type, after, hours=hours, limit=limit, raw=True, host=host)
+        return _json_bytes(splice({
+            'metric_type': metric_type,
+            'host': host,
+            'hours': hours,
+            'data': encode_rows(rows),
+            'cursor': encode_cursor(last),
+            'more': more
+        }))
+
+    # Every row in the window, streamed in keyset batches
+    if request.args.get('format') == 'ndjson':
+        batches = iter_metrics(metric_type, hours=hours, raw=True, host=host)
+        return Response((encode_ndjson(batch) for batch in batches), mimetype='application/x-ndjson')
 
-    data = get_metrics(metric_type, hours=hours)
-    return jsonify({
+    try:
+        before = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows, next_page = get_metrics_page(metric_type, hours=hours, limit=limit, before=before, raw=True, host=host)
+    if downsample:
+        rows = downsample_rows(rows, **downsample)
+    return _json_bytes(splice({
         'metric_type': metric_type,
+        'host': host,
         'hours': hours,
-        'data': data
+        'data': encode_rows(rows),
+        'next_cursor': encode_cursor(next_page)
+    }))
+
+
+def dashboard_params(args) -> dict:
+    """Validate /api/dashboard query parameters into ``get_dashboard`` arguments.
+
+    ``series`` lists the history types; ``since.<type>`` asks for only
+    that type's rows after a timestamp or cursor, as on /api/history.
+    ``points`` is validated by ``dashboard_downsample``.
+    """
+    series = {}
+    for metric_type in (args.get('series') or ','.join(DASHBOARD_SERIES)).split(','):
+        metric_type = metric_type.strip()
+        if not metric_type:
+            continue
+        if metric_type not in VALID_METRIC_TYPES:
+            raise ValueError(f'Invalid metric type {metric_type!r}. Valid: {VALID_METRIC_TYPES}')
+        since = args.get(f'since.{metric_type}')
+        series[metric_type] = since_param(since) if since else None
+    return {
+        'series': series,
+        'hours': min(max(int(args.get('hours') or 24), 1), 2160),
+        'limit': history_limit(args),
+        'host': host_param(args),
+    }
+
+
+def dashboard_downsample(args, series: dict) -> dict:
+    """``downsample_param`` per dashboard series, from the shared ``points`` and ``downsample``.
+
+    Types are ranked by their default fields, and types without one are
+    sent in full; ``field`` is not accepted here, as it could not apply
+    to every series.
+    """
+    if args.get('field'):
+        raise ValueError('field is not supported on /api/dashboard; use /api/history')
+    return {
+        metric_type: downsample_param(args, metric_type)
+        for metric_type in series if metric_type in DEFAULT_FIELDS
+    }
+
+
+def encode_dashboard(params: dict, result: dict, downsample: dict = None, forecast: dict = None) -> bytes:
+    """The /api/dashboard body: the current snapshot plus ``get_dashboard`` output.
+
+    Full pages of the series in ``downsample`` are reduced to its points;
+    ``since`` deltas are sent as they are. ``forecast`` is the host's
+    ``get_forecast``, if it could be read.
+    """
+    series = {}
+    for metric_type, page in result['series'].items():
+        rows = page['data']
+        if 'next_cursor' in page and downsample and downsample.get(metric_type):
+            rows = downsample_rows(rows, **downsample[metric_type])
+        fields = {'data': encode_rows(rows)}
+        if 'next_cursor' in page:
+            fields['next_cursor'] = encode_cursor(page['next_cursor'])
+        else:
+            fields['cursor'] = encode_cursor(page['cursor'])
+            fields['more'] = page['more']
+        series[metric_type] = Raw(splice(fields))
+    return splice({
+        'host': params['host'],
+        'hours': params['hours'],
+        'current': Raw(encoded_current()),
+        'series': Raw(splice(series)),
+        'alerts': result['alerts'],
+        'stats': result['stats'],
+        'forecast': forecast
     })
 
 
+@app.route('/api/dashboard')
+def get_dashboard_route():
+    """Everything the dashboard shows, in one response and one read transaction."""
+    try:
+        params = dashboard_params(request.args)
+        downsample = dashboard_downsample(request.args, params['series'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        result = get_dashboard(raw=True, **params)
+    except Exception as e:
+        return jsonify({'error': f'Could not read dashboard data: {e}'}), 503
+    return _json_bytes(encode_dashboard(params, result, downsample, dashboard_forecast(params['host'])))
+
+
+def dashboard_forecast(host: str):
+    """``get_forecast`` for the dashboard, or None if it failed; the rest of the page still loads."""
+    try:
+        return get_forecast(host)
+    except Exception as e:
+        logger.error(f"Error computing forecast: {e}")
+        return None
+
+
+@app.route('/api/forecast')
+def get_forecast_route():
+    """Days until each disk fills and SMART attribute trends, from recent history."""
+    try:
+        host = host_param(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(get_forecast(host))
+    except Exception as e:
+        return jsonify({'error': f'Could not compute forecast: {e}'}), 503
+
+
 @app.route('/api/latest/<metric_type>')
 def get_latest(metric_type):
     """Get latest metric of a type."""
-    valid_types = ['cpu', 'memory', 'disk', 'smart', 'drives', 'docker', 'processes', 'network']
-    if metric_type not in valid_types:
-        return jsonify({'error': f'Invalid metric type. Valid: {valid_types}'}), 400
+    if metric_type not in VALID_METRIC_TYPES:
+        return jsonify({'error': f'Invalid metric type. Valid: {VALID_METRIC_TYPES}'}), 400
+
+    try:
+        host = host_param(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    row = get_latest_metrics(metric_type, raw=True, host=host)
+    if row is None:
+        return jsonify({'error': 'No data found'})
+    return _json_bytes(splice({'timestamp': row['timestamp'], 'data': Raw(row['data'])}))
+
+
+@app.route('/api/trend/<metric_type>')
+def get_trend(metric_type):
+    """Per-day min/max of a numeric field, e.g. disk percent_used over a year."""
+    if metric_type not in VALID_METRIC_TYPES:
+        return jsonify({'error': f'Invalid metric type. Valid: {VALID_METRIC_TYPES}'}), 400
+    field = request.args.get('field', '').strip()
+    if not field:
+        return jsonify({'error': 'field is required, e.g. field=percent_used'}), 400
+    try:
+        host = host_param(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    days = request.args.get('days', 365, type=int)
+    days = min(max(days, 1), 3650)
+    return jsonify({
+        'metric_type': metric_type,
+        'host': host,
+        'field': field,
+        'days': days,
+        'series': get_daily_ranges(metric_type, field, days, host=host)
+    })
+
 
-    data = get_latest_metrics(metric_type)
-    return jsonify(data or {'error': 'No data found'})
+def export_params(args: dict) -> tuple:
+    """Validate export query parameters into (format, metric types, start, end, hosts)."""
+    fmt = resolve_format(args.get('format'))
+    types = [t.strip() for t in (args.get('types') or ','.join(VALID_METRIC_TYPES)).split(',') if t.strip()]
+    unknown = sorted(set(types) - set(VALID_METRIC_TYPES))
+    if unknown:
+        raise ValueError(f'Invalid metric types {unknown}. Valid: {VALID_METRIC_TYPES}')
+    start, end = normalize_timestamp(args.get('start')), normalize_timestamp(args.get('end'))
+    return fmt, types, start, end, parse_hosts(args.get('hosts'))
+
+
+@app.route('/api/export')
+def export_history():
+    """Stream history for a time range as Parquet, Arrow IPC or gzip CSV."""
+    try:
+        fmt, types, start, end, hosts = export_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(
+        export_chunks(fmt, types, start, end, hosts=hosts),
+        mimetype=EXPORT_CONTENT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="metrics{EXPORT_EXTENSIONS[fmt]}"'}
+    )
+
+
+def read_body(stream, limit: int) -> bytes:
+    """
+    Read a request body of at most ``limit`` bytes, raising RequestEntityTooLarge
+    past it. Reads one byte beyond the limit, so a chunked body is rejected
+    rather than cut short at MAX_CONTENT_LENGTH.
+    """
+    chunks = []
+    size = 0
+    while True:
+        chunk = stream.read(min(64 * 1024, limit + 1 - size))
+        if not chunk:
+            return b''.join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise RequestEntityTooLarge()
+        chunks.append(chunk)
+
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest_batch():
+    """Store a batch of samples pushed by an agent (agent.py)."""
+    if not Config.INGEST_TOKEN:
+        return jsonify({'error': 'Ingest is disabled; set INGEST_TOKEN to accept agents'}), 404
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f'Bearer {Config.INGEST_TOKEN}'.encode('utf-8')):
+        return jsonify({'error': 'Invalid or missing ingest token'}), 401
+    try:
+        body = read_body(request.stream, MAX_BATCH_BYTES)
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Batch larger than {MAX_BATCH_BYTES} bytes'}), 413
+
+    try:
+        host, rows, sketches = decode_batch(body, request.headers.get('Content-Encoding', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        inserted = ingest_writer.submit(host, rows, sketches)
+    except TimeoutError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': f'Could not store batch: {e}'}), 503
+    return jsonify({'host': host, 'received': len(rows), 'inserted': inserted})
+
+
+@app.route('/api/hosts')
+def get_hosts_route():
+    """Agents that have pushed samples, with first/last seen times."""
+    return jsonify(get_hosts())
 
 
 @app.route('/api/alerts')
@@ -207,6 +450,24 @@ def get_alerts_route():
     return jsonify(get_alerts(limit=50))
 
 
+@app.route('/api/alerts/rules')
+def get_alert_rules():
+    """The alert rules in effect: the built-in ones and those from ALERT_RULES_FILE."""
+    return jsonify({
+        'file': Config.ALERT_RULES_FILE or None,
+        'rules': [rule.spec for rule in rule_engine.rules]
+    })
+
+
+@app.route('/api/recordings/<int:recording_id>')
+def get_recording_route(recording_id: int):
+    """A flight recording: the samples before and the burst after the alerts attached to it."""
+    recording = get_recording(recording_id)
+    if recording is None:
+        return jsonify({'error': f'No recording {recording_id}'}), 404
+    return jsonify(recording)
+
+
 @app.route('/api/stats')
 def get_stats():
     """Get database statistics."""
@@ -218,49 +479,50 @@ def get_config():
     """Get current configuration."""
     return jsonify({
         'collection_interval_seconds': Config.COLLECTION_INTERVAL,
+        'sampling_intervals_seconds': {
+            'fast': Config.FAST_INTERVAL,
+            'medium': Config.MEDIUM_INTERVAL,
+            'slow': Config.SLOW_INTERVAL
+        },
         'retention_days': Config.RETENTION_DAYS,
+        'archive_after_days': Config.ARCHIVE_AFTER_DAYS,
+        'archive_retention_days': Config.ARCHIVE_RETENTION_DAYS,
         'thresholds': Config.get_thresholds()
     })
 
 
-@app.route('/health')
-def health_check():
-    """Health check endpoint."""
-    return jsonify({'status': 'healthy'})
+@app.route('/api/metrics/internal')
+def get_internal_metrics():
+    """Get the monitor's own timings, counters and resource usage."""
+    snapshot = instrumentation.get_snapshot()
+    snapshot['query_cache'] = query_cache.stats()
+    snapshot['notify'] = notifier.stats()
+    return jsonify(snapshot)
 
 
-def start_scheduler():
-    """Start the background scheduler for metric collection."""
-    scheduler = BackgroundScheduler()
+@app.route('/metrics')
+def get_openmetrics():
+    """Prometheus/OpenMetrics exposition of the latest collected snapshot."""
+    return Response(get_exposition(), content_type=OPENMETRICS_CONTENT_TYPE)
 
-    # Collect metrics at configured interval
-    scheduler.add_job(
-        collect_all_metrics,
-        'interval',
-        seconds=Config.COLLECTION_INTERVAL,
-        id='collect_metrics',
-        replace_existing=True
-    )
-
-    # Daily cleanup at 3 AM
-    scheduler.add_job(
-        daily_cleanup,
-        'cron',
-        hour=3,
-        id='daily_cleanup',
-        replace_existing=True
-    )
 
-    scheduler.start()
-    atexit.register(lambda: scheduler.shutdown())
+@app.route('/health')
+def health_check():
+    """Health check endpoint.
 
-    return scheduler
+    Always 200 while the server is up; ``ready`` turns true once every
+    metric type has a sample. ``/health?ready=1`` answers 503 until then.
+    """
+    pending = warming_up()
+    body = {'status': 'healthy', 'ready': not pending, 'warming_up': pending}
+    if pending and request.args.get('ready'):
+        return jsonify(body), 503
+    return jsonify(body)
 
 
-# Initialize on module load (runs with gunicorn)
-init_database()
-collect_all_metrics()
-scheduler = start_scheduler()
+# Initialize on module load (runs with gunicorn); with several workers
+# only one of them collects
+start_collection()
 logger.info("Server monitor initialized")
 
 
@@ -0,0 +1,176 @@
+"""Immutable compressed segment files for history older than the hot window.
+
+One file per metric type per UTC day, under ARCHIVE_DIR/<type>/<day>.seg
+(ARCHIVE_DIR/hosts/<host>/<type>/<day>.seg for agent hosts):
+
+    magic, header length, header JSON, compressed body
+
+The header is the segment's index: row count, first/last timestamp and
+the min/max of every numeric field (dotted paths, as in change
+detection), so time-range reads and trend views can skip or answer from
+a segment without decompressing it. The body is one
+``timestamp<TAB>JSON`` line per row, oldest-first, with unchanged markers
+already expanded. It is compressed as a whole day, with zstd when
+available, else zlib.
+
+Segments are written to a temporary file and renamed into place, so a
+reader sees either the old file or the new one.
+"""
+
+import functools
+import logging
+import os
+import struct
+import zlib
+
+from serialization import dumps, loads
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SMARCH01'
+_LENGTH = struct.Struct('<I')
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_ZLIB = 'zlib'
+
+# Decoded segments kept in memory; a busy day of docker rows is a few MB
+_CACHED_SEGMENTS = 4
+
+
+def segment_path(root: str, metric_type: str, day: str, host: str = '') -> str:
+    if host:
+        return os.path.join(root, 'hosts', host, metric_type, f'{day}.seg')
+    return os.path.join(root, metric_type, f'{day}.seg')
+
+
+class FieldRanges:
+    """Running min/max of every numeric leaf in a series of payloads.
+
+    Nested dicts are flattened to dotted paths; lists (e.g. the process
+    table) are skipped. A flushed fast-tier row's ``_agg`` min/max widen
+    the range of the fields they describe, so the index covers every
+    sample, not just the averages that were stored.
+    """
+
+    def __init__(self):
+        self.ranges = {}
+
+    def _update(self, path: str, value):
+        current = self.ranges.get(path)
+        if current is None:
+            self.ranges[path] = [value, value]
+        elif value < current[0]:
+            current[0] = value
+        elif value > current[1]:
+            current[1] = value
+
+    def _walk(self, value, path: str):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == '_agg' and isinstance(item, dict):
+                    # Same shape as the payload; the extremes are just more points
+                    self._walk(item.get('min'), path)
+                    self._walk(item.get('max'), path)
+                    continue
+                self._walk(item, f'{path}.{key}' if path else str(key))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+            self._update(path, value)
+
+    def add(self, data):
+        self._walk(data, '')
+
+
+def _compress(body: bytes) -> tuple:
+    if ZSTD_AVAILABLE:
+        return COMPRESSION_ZSTD, zstandard.ZstdCompressor(level=10).compress(body)
+    return COMPRESSION_ZLIB, zlib.compress(body, 9)
+
+
+def _decompress(compression: str, payload: bytes) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    if compression == COMPRESSION_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstandard is required to read zstd-compressed archive segments")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown archive compression: {compression}")
+
+
+def write_segment(path: str, metric_type: str, day: str, rows: list) -> dict:
+    """
+    Write (timestamp, JSON bytes) rows, oldest-first, as one segment.
+
+    Returns the header, which also carries the compressed ``size``.
+    """
+    ranges = FieldRanges()
+    for _, payload in rows:
+        ranges.add(loads(payload))
+    body = b''.join(timestamp.encode('ascii') + b'\t' + payload + b'\n' for timestamp, payload in rows)
+    compression, compressed = _compress(body)
+    header = {
+        'metric_type': metric_type,
+        'day': day,
+        'rows': len(rows),
+        'first': rows[0][0],
+        'last': rows[-1][0],
+        'compression': compression,
+        'fields': ranges.ranges,
+    }
+    encoded_header = dumps(header)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + _LENGTH.pack(len(encoded_header)) + encoded_header + compressed)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    header['size'] = os.path.getsize(path)
+    return header
+
+
+def _split(path: str, data: bytes) -> tuple:
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'Not an archive segment: {path}')
+    start = len(MAGIC) + _LENGTH.size
+    end = start + _LENGTH.unpack_from(data, len(MAGIC))[0]
+    return loads(data[start:end]), end
+
+
+@functools.lru_cache(maxsize=_CACHED_SEGMENTS)
+def _load(path: str, mtime_ns: int, size: int) -> tuple:
+    with open(path, 'rb') as f:
+        data = f.read()
+    header, offset = _split(path, data)
+    body = _decompress(header['compression'], data[offset:])
+    rows = []
+    for line in body.split(b'\n'):
+        if line:
+            timestamp, payload = line.split(b'\t', 1)
+            rows.append((timestamp.decode('ascii'), payload))
+    return tuple(rows)
+
+
+def load_segment(path: str) -> tuple:
+    """All (timestamp, JSON bytes) rows of a segment, oldest-first.
+
+    Cached by path and modification time, so a rewritten day is reloaded.
+    """
+    st = os.stat(path)
+    return _load(path, st.st_mtime_ns, st.st_size)
+
+
+def remove_segment(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
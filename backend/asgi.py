@@ -0,0 +1,442 @@
+"""Optional ASGI entry point for serving many concurrent and idle clients.
+
+Read-API routes are async: database reads run on a dedicated executor,
+/api/current is answered from the collected snapshot, and /api/stream
+pushes snapshot updates over Server-Sent Events, so idle clients only
+hold a coroutine. Every other route falls through to the Flask app on a
+separate thread pool.
+
+Serve with: uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import io
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as flask_module
+import instrumentation
+from config import Config
+from current import encoded_current
+from database import get_dashboard, get_metrics_page, get_metrics_since, get_quantiles, iter_metrics, get_latest_metrics, get_alerts, get_database_stats
+from downsample import downsample_rows
+from export import CONTENT_TYPES as EXPORT_CONTENT_TYPES, EXTENSIONS as EXPORT_EXTENSIONS, export_chunks
+from ingest import MAX_BATCH_BYTES
+from serialization import Raw, dumps, encode_rows, encode_ndjson, encode_cursor, decode_cursor, splice
+from snapshot import snapshot
+
+logger = logging.getLogger(__name__)
+
+db_executor = ThreadPoolExecutor(max_workers=Config.DB_READ_THREADS, thread_name_prefix='db-read')
+wsgi_executor = ThreadPoolExecutor(max_workers=Config.WSGI_THREADS, thread_name_prefix='wsgi')
+
+_JSON_HEADERS = [(b'content-type', b'application/json')]
+
+# Largest request body passed on to Flask; an ingest batch is the largest
+# legitimate one
+MAX_REQUEST_BYTES = MAX_BATCH_BYTES
+
+
+class _ChangeBroadcaster:
+    """Wake every waiting coroutine when the snapshot is published to."""
+
+    def __init__(self):
+        self.loop = None
+        self.event = None
+
+    def attach(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+        snapshot.subscribe(self._on_publish)
+
+    def _on_publish(self, version):
+        # Called from scheduler threads; the loop is closed after shutdown
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._fire)
+
+    def _fire(self):
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+    async def wait(self):
+        await self.event.wait()
+
+
+broadcaster = _ChangeBroadcaster()
+
+
+async def _send_body(send, body: bytes, status: int = 200, headers=None):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': (headers or _JSON_HEADERS) + [(b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, payload, status: int = 200):
+    await _send_body(send, dumps(payload), status)
+
+
+async def _run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, lambda: func(*args, **kwargs))
+
+
+def _query_int(query: dict, name: str, default: int) -> int:
+    try:
+        return int(query.get(name, [default])[0])
+    except (TypeError, ValueError):
+        return default
+
+
+async def _current(scope, receive, send, query):
+    await _send_body(send, encoded_current())
+
+
+async def _history(scope, receive, send, query, metric_type):
+    if metric_type not in flask_module.VALID_METRIC_TYPES:
+        await _send_json(send, {'error': f'Invalid metric type. Valid: {flask_module.VALID_METRIC_TYPES}'}, 400)
+        return
+    hours = min(max(_query_int(query, 'hours', 24), 1), 2160)
+    args = {k: v[0] for k, v in query.items()}
+    try:
+        host = flask_module.host_param(args)
+        downsample = flask_module.downsample_param(args, metric_type)
+    except ValueError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+    limit = flask_module.history_limit(args)
+
+    if args.get('agg'):
+        try:
+            params = flask_module.agg_params(args, hours)
+        except ValueError as e:
+            await _send_json(send, {'error': str(e)}, 400)
+            return
+        series = await _run_db(get_quantiles, metric_type, hours=hours, host=host, **params)
+        await _send_json(send, flask_module.encode_quantiles(metric_type, host, hours, params, series))
+        return
+
+    if query.get('since'):
+        try:
+            after = flask_module.since_param(query['since'][0])
+        except ValueError as e:
+            await _send_json(send, {'error': str(e)}, 400)
+            return
+        rows, last, more = await _run_db(
+            get_metrics_since, metric_type, after, hours=hours, limit=limit, raw=True, host=host
+        )
+        await _send_body(send, splice({
+            'metric_type': metric_type,
+            'host': host,
+            'hours': hours,
+            'data': encode_rows(rows),
+            'cursor': encode_cursor(last),
+            'more': more,
+        }))
+        return
+
+    if query.get('format', [''])[0] == 'ndjson':
+        await _stream_history(send, metric_type, hours, host)
+        return
+
+    try:
+        before = decode_cursor(query['cursor'][0]) if query.get('cursor') else None
+    except ValueError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+
+    rows, next_page = await _run_db(
+        get_metrics_page, metric_type, hours=hours, limit=limit, before=before, raw=True, host=host
+    )
+    if downsample:
+        rows = await _run_db(downsample_rows, rows, **downsample)
+    await _send_body(send, splice({
+        'metric_type': metric_type,
+        'host': host,
+        'hours': hours,
+        'data': encode_rows(rows),
+        'next_cursor': encode_cursor(next_page),
+    }))
+
+
+async def _stream_history(send, metric_type: str, hours: int, host: str):
+    """Chunked NDJSON, one keyset batch per chunk, each fetched on the DB executor."""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')],
+    })
+    batches = iter_metrics(metric_type, hours=hours, raw=True, host=host)
+    while True:
+        batch = await _run_db(next, batches, None)
+        if batch is None:
+            break
+        await send({'type': 'http.response.body', 'body': encode_ndjson(batch), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _dashboard(scope, receive, send, query):
+    args = {k: v[0] for k, v in query.items()}
+    try:
+        params = flask_module.dashboard_params(args)
+        downsample = flask_module.dashboard_downsample(args, params['series'])
+    except ValueError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+    try:
+        result = await _run_db(get_dashboard, raw=True, **params)
+    except Exception as e:
+        await _send_json(send, {'error': f'Could not read dashboard data: {e}'}, 503)
+        return
+    forecast = await _run_db(flask_module.dashboard_forecast, params['host'])
+    if any(downsample.values()):
+        body = await _run_db(flask_module.encode_dashboard, params, result, downsample, forecast)
+    else:
+        body = flask_module.encode_dashboard(params, result, forecast=forecast)
+    await _send_body(send, body)
+
+
+async def _latest(scope, receive, send, query, metric_type):
+    if metric_type not in flask_module.VALID_METRIC_TYPES:
+        await _send_json(send, {'error': f'Invalid metric type. Valid: {flask_module.VALID_METRIC_TYPES}'}, 400)
+        return
+    try:
+        host = flask_module.host_param({k: v[0] for k, v in query.items()})
+    except ValueError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+    row = await _run_db(get_latest_metrics, metric_type, raw=True, host=host)
+    if row is None:
+        await _send_json(send, {'error': 'No data found'})
+        return
+    await _send_body(send, splice({'timestamp': row['timestamp'], 'data': Raw(row['data'])}))
+
+
+async def _export(scope, receive, send, query):
+    """Stream an export, encoding each database batch on the DB executor."""
+    try:
+        fmt, types, start, end, hosts = flask_module.export_params({k: v[0] for k, v in query.items()})
+    except ValueError as e:
+        await _send_json(send, {'error': str(e)}, 400)
+        return
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', EXPORT_CONTENT_TYPES[fmt].encode()),
+            (b'content-disposition', f'attachment; filename="metrics{EXPORT_EXTENSIONS[fmt]}"'.encode()),
+        ],
+    })
+    chunks = export_chunks(fmt, types, start, end, hosts=hosts)
+    while True:
+        chunk = await _run_db(next, chunks, None)
+        if chunk is None:
+            break
+        if chunk:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _alerts(scope, receive, send, query):
+    await _send_json(send, await _run_db(get_alerts, limit=50))
+
+
+async def _stats(scope, receive, send, query):
+    await _send_json(send, await _run_db(get_database_stats))
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _stream(scope, receive, send, query):
+    """Server-Sent Events: one 'current' event per snapshot change, comments as keepalive."""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')],
+    })
+
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    last_version = -1
+    try:
+        while True:
+            if snapshot.version != last_version:
+                last_version = snapshot.version
+                body = b'event: current\ndata: ' + encoded_current() + b'\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+            changed = asyncio.ensure_future(broadcaster.wait())
+            done, _ = await asyncio.wait(
+                {changed, disconnected},
+                timeout=Config.SSE_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                changed.cancel()
+                return
+            if not done:
+                changed.cancel()
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+            else:
+                # A fast-tier run publishes several types back to back; send once
+                await asyncio.sleep(0.25)
+    finally:
+        disconnected.cancel()
+
+
+def _call_wsgi(environ: dict):
+    """Run the Flask app synchronously, returning (status, headers, body)."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    chunks = flask_module.app(environ, start_response)
+    try:
+        body = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return response['status'], response['headers'], body
+
+
+async def _read_body(scope, receive):
+    """The request body, or None once it exceeds MAX_REQUEST_BYTES (declared or received)."""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            try:
+                if int(value) > MAX_REQUEST_BYTES:
+                    return None
+            except ValueError:
+                pass
+    chunks, size, more = [], 0, True
+    while more:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_REQUEST_BYTES:
+            return None
+        chunks.append(chunk)
+        more = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def _wsgi(scope, receive, send):
+    """Serve a request through the Flask app on the WSGI thread pool."""
+    body = await _read_body(scope, receive)
+    if body is None:
+        await _send_json(send, {'error': f'Request body larger than {MAX_REQUEST_BYTES} bytes'}, 413)
+        return
+
+    server = scope.get('server') or ('localhost', Config.PORT)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value.decode('latin-1')
+        elif key != 'CONTENT_LENGTH':
+            environ[f'HTTP_{key}'] = value.decode('latin-1')
+
+    loop = asyncio.get_running_loop()
+    status, headers, payload = await loop.run_in_executor(wsgi_executor, _call_wsgi, environ)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+# Exact paths, then prefixes that take one trailing path segment
+_ROUTES = {
+    '/api/current': (_current, '/api/current'),
+    '/api/alerts': (_alerts, '/api/alerts'),
+    '/api/stats': (_stats, '/api/stats'),
+    '/api/stream': (_stream, '/api/stream'),
+    '/api/export': (_export, '/api/export'),
+    '/api/dashboard': (_dashboard, '/api/dashboard'),
+}
+_PREFIX_ROUTES = (
+    ('/api/history/', _history, '/api/history/<metric_type>'),
+    ('/api/latest/', _latest, '/api/latest/<metric_type>'),
+)
+
+
+def _resolve(path: str):
+    route = _ROUTES.get(path)
+    if route:
+        return route[0], route[1], ()
+    for prefix, handler, label in _PREFIX_ROUTES:
+        if path.startswith(prefix):
+            rest = path[len(prefix):]
+            if rest and '/' not in rest:
+                return handler, label, (rest,)
+    return None, None, ()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            broadcaster.attach(asyncio.get_running_loop())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db_executor.shutdown(wait=False)
+            wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application."""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    if broadcaster.loop is None:
+        # Servers that skip the lifespan protocol
+        broadcaster.attach(asyncio.get_running_loop())
+
+    handler, label, args = (None, None, ())
+    if scope['method'] == 'GET':
+        handler, label, args = _resolve(scope['path'])
+    if handler is None:
+        await _wsgi(scope, receive, send)
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    started = time.perf_counter()
+    try:
+        await handler(scope, receive, send, query, *args)
+    finally:
+        if label != '/api/stream':
+            instrumentation.observe('http', label, time.perf_counter() - started)
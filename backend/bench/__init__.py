@@ -0,0 +1,4 @@
+"""Benchmarks for the collectors, storage layer and API.
+
+Run from the backend directory, e.g. ``python -m bench.compression``.
+"""
@@ -0,0 +1,106 @@
+"""Time to first paint: the dashboard's data as split requests vs one /api/dashboard call.
+
+The split flow is the dashboard before /api/dashboard: /api/current, then
+/api/history/cpu, /api/history/network, /api/alerts and /api/stats
+concurrently. The batched flow is one /api/dashboard request. Each
+iteration times the flow from the first request until every response is
+read. ``--rtt`` adds a delay per request to model a browser that is not
+on the same host.
+
+Usage: python -m bench.bootstrap --url http://127.0.0.1:8080 --iterations 50
+       python -m bench.bootstrap --serve "gunicorn --bind 127.0.0.1:8099 --workers 1 --threads 4 app:app" \\
+                                 --url http://127.0.0.1:8099 --rtt 40
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.loadtest import FOLLOW_UP_ROUTES, _wait_healthy
+from bench.stats import summarize
+
+
+def _get(base_url: str, route: str, rtt: float, timeout: float) -> int:
+    """GET a route and return the body size; ``rtt`` seconds are added to model latency."""
+    if rtt:
+        time.sleep(rtt)
+    with urllib.request.urlopen(base_url + route, timeout=timeout) as resp:
+        return len(resp.read())
+
+
+def split_flow(base_url: str, hours: int, rtt: float, timeout: float, pool: ThreadPoolExecutor) -> int:
+    size = _get(base_url, '/api/current', rtt, timeout)
+    routes = [r.format(hours=hours) for r in FOLLOW_UP_ROUTES]
+    return size + sum(pool.map(lambda r: _get(base_url, r, rtt, timeout), routes))
+
+
+def batched_flow(base_url: str, hours: int, rtt: float, timeout: float, pool: ThreadPoolExecutor) -> int:
+    return _get(base_url, f'/api/dashboard?hours={hours}', rtt, timeout)
+
+
+FLOWS = {
+    'split': split_flow,
+    'dashboard': batched_flow,
+}
+
+
+def run(base_url: str, iterations: int, hours: int, rtt: float, timeout: float) -> dict:
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(FOLLOW_UP_ROUTES)) as pool:
+        for flow in FLOWS.values():
+            # Warm caches and connections before timing
+            flow(base_url, hours, rtt, timeout, pool)
+        durations = {name: [] for name in FLOWS}
+        sizes = {}
+        # Interleaved, so drift in the instance affects both flows alike
+        for _ in range(iterations):
+            for name, flow in FLOWS.items():
+                started = time.perf_counter()
+                sizes[name] = flow(base_url, hours, rtt, timeout, pool)
+                durations[name].append(time.perf_counter() - started)
+    for name in FLOWS:
+        results[name] = dict(summarize(durations[name]), bytes=sizes[name])
+    return {'iterations': iterations, 'hours': hours, 'rtt_ms': round(rtt * 1000, 1), 'flows': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--hours', type=int, default=24, help='history window, as the dashboard range selector')
+    parser.add_argument('--rtt', type=float, default=0, help='milliseconds added to every request')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--serve', help='command that starts a local instance for the duration of the test')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.serve:
+        server = subprocess.Popen(shlex.split(args.serve), cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if not _wait_healthy(args.url, 120):
+            server.terminate()
+            raise SystemExit(f'instance did not become healthy at {args.url}')
+
+    try:
+        results = run(args.url, args.iterations, args.hours, args.rtt / 1000, args.timeout)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    for name, r in results['flows'].items():
+        print(f"{name:<10} p50 {r['p50_ms']:>9.3f}  p95 {r['p95_ms']:>9.3f}  p99 {r['p99_ms']:>9.3f} ms  "
+              f"({r['bytes']} bytes)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Compare stored size and CPU cost of each payload encoding on a generated dataset.
+
+Usage: python -m bench.compression [--days 90] [--containers 20] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from codec import encode, decode, ENCODING_JSON, ENCODING_ZLIB, ENCODING_ZSTD, ZSTD_AVAILABLE
+from bench.datasets import generate_rows
+
+
+def _run(encoding, rows, workdir: str) -> dict:
+    path = os.path.join(workdir, f'{encoding or "json"}.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE metrics (id INTEGER PRIMARY KEY, timestamp DATETIME, '
+                 'metric_type TEXT NOT NULL, data TEXT NOT NULL, encoding TEXT)')
+
+    cpu = time.process_time()
+    encoded = [(ts, metric_type, encode(payload, encoding), encoding) for ts, metric_type, payload in rows]
+    encode_cpu = time.process_time() - cpu
+
+    conn.executemany('INSERT INTO metrics (timestamp, metric_type, data, encoding) VALUES (?, ?, ?, ?)', encoded)
+    conn.commit()
+    conn.execute('VACUUM')
+
+    payload_bytes = sum(len(row[2]) for row in encoded)
+    stored = conn.execute('SELECT data, encoding FROM metrics').fetchall()
+    cpu = time.process_time()
+    for data, enc in stored:
+        decode(data, enc)
+    decode_cpu = time.process_time() - cpu
+    conn.close()
+
+    return {
+        'encoding': encoding or 'json',
+        'rows': len(encoded),
+        'payload_mb': round(payload_bytes / (1024 * 1024), 2),
+        'database_mb': round(os.path.getsize(path) / (1024 * 1024), 2),
+        'encode_cpu_us_per_row': round(encode_cpu / len(encoded) * 1e6, 2),
+        'decode_cpu_us_per_row': round(decode_cpu / len(encoded) * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--containers', type=int, default=20)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    rows = list(generate_rows(days=args.days, containers=args.containers))
+    encodings = [ENCODING_JSON, ENCODING_ZLIB] + ([ENCODING_ZSTD] if ZSTD_AVAILABLE else [])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [_run(encoding, rows, workdir) for encoding in encodings]
+
+    baseline = results[0]['database_mb'] or 1
+    for r in results:
+        r['size_ratio'] = round(r['database_mb'] / baseline, 3)
+        print(f"{r['encoding']:>8}  rows={r['rows']}  db={r['database_mb']}MB  "
+              f"ratio={r['size_ratio']}  encode={r['encode_cpu_us_per_row']}us  "
+              f"decode={r['decode_cpu_us_per_row']}us")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'days': args.days, 'containers': args.containers, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
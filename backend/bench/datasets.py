@@ -0,0 +1,60 @@
+"""Synthetic metric payloads shaped like the real collectors' output."""
+
+import random
+from datetime import datetime, timedelta
+
+SAMPLES_PER_DAY = 24 * 60 * 60 // 300  # one row per default collection interval
+
+IMAGES = ('nginx:latest', 'postgres:16', 'redis:7', 'plexinc/pms-docker:latest',
+           'ghcr.io/home-assistant/home-assistant:stable', 'caddy:2', 'grafana/grafana:latest')
+PROCESS_NAMES = ('Plex Media Serv', 'postgres', 'python3', 'dockerd', 'containerd', 'smbd',
+                  'caddy', 'redis-server', 'node', 'systemd-journal', 'cloudflared', 'java')
+
+
+def docker_payload(rng: random.Random, containers: int, step: int) -> dict:
+    """One docker collector sample for ``containers`` containers."""
+    data = {}
+    for i in range(containers):
+        running = i % 7 != 6
+        data[f'container-{i:03d}'] = {
+            'id': f'{i * 2654435761 % (16 ** 10):010x}',
+            'image': IMAGES[i % len(IMAGES)],
+            'status': 'running' if running else 'exited',
+            'health': 'healthy' if running and i % 3 == 0 else 'none',
+            'created': '2026-01-01T00:00:00.000000000Z',
+            'started': '2026-01-02T03:04:05.000000000Z',
+            'restart_count': i % 4,
+            'cpu_percent': round(rng.uniform(0, 25), 2) if running else 0,
+            'memory_mb': round(rng.uniform(20, 2048), 1) if running else 0,
+            'memory_percent': round(rng.uniform(0, 15), 1) if running else 0,
+            'network_rx_mb': round(step * 0.37 + i, 2) if running else 0,
+            'network_tx_mb': round(step * 0.11 + i, 2) if running else 0,
+            'uptime_seconds': step * 300 + i if running else 0,
+        }
+    return data
+
+
+def process_payload(rng: random.Random, step: int, top: int = 12) -> dict:
+    """One processes collector sample."""
+    return {
+        'processes': [
+            {
+                'pid': 100 + i * 37,
+                'name': PROCESS_NAMES[i % len(PROCESS_NAMES)],
+                'mem_mb': round(rng.uniform(50, 1500) / (i + 1), 1),
+                'mem_percent': round(rng.uniform(0.3, 9) / (i + 1), 1),
+                'cpu_jiffies': step * (40 - i) + rng.randint(0, 50),
+            }
+            for i in range(top)
+        ]
+    }
+
+
+def generate_rows(days: int = 90, containers: int = 20, seed: int = 1):
+    """Yield (timestamp, metric_type, payload) for ``days`` of docker and processes rows."""
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=days)
+    for step in range(days * SAMPLES_PER_DAY):
+        ts = (start + timedelta(seconds=step * 300)).strftime('%Y-%m-%d %H:%M:%S')
+        yield ts, 'docker', docker_payload(rng, containers, step)
+        yield ts, 'processes', process_payload(rng, step)
@@ -0,0 +1,218 @@
+"""Synthetic host fixtures: generated /proc and /sys trees, command stubs and a fake Docker SDK."""
+
+import json
+import os
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import types
+
+from bench.datasets import IMAGES, PROCESS_NAMES
+
+_STUB_SCRIPT = '''#!{python}
+import json, sys
+spec = json.load(open({spec!r}))
+cmd = {cmd!r}
+args = sys.argv[1:]
+if cmd == 'df':
+    print('Filesystem     Type     1B-blocks        Used   Available Use% Mounted on')
+    for m in spec['mounts']:
+        used = m['size'] * m['percent'] // 100
+        print(f"{{m['device']}} {{m['fstype']}} {{m['size']}} {{used}} {{m['size'] - used}} {{m['percent']}}% {{m['target']}}")
+elif cmd == 'lsblk':
+    for d in spec['disks']:
+        if 'SIZE' in ' '.join(args):
+            print(f"{{d['name']}} disk {{d['size']}} {{d['model']}}")
+        else:
+            print(f"{{d['name']}} disk")
+elif cmd == 'smartctl':
+    name = args[-1].rsplit('/', 1)[-1]
+    disk = next((d for d in spec['disks'] if d['name'] == name), None)
+    if disk is None:
+        sys.exit(2)
+    print(json.dumps({{
+        'model_name': disk['model'],
+        'serial_number': 'SN' + name.upper(),
+        'smart_status': {{'passed': True}},
+        'temperature': {{'current': 34}},
+        'power_on_time': {{'hours': 12000}},
+        'ata_smart_attributes': {{'table': [
+            {{'name': 'Reallocated_Sector_Ct', 'value': 100, 'raw': {{'value': 0}}}},
+            {{'name': 'Current_Pending_Sector', 'value': 100, 'raw': {{'value': 0}}}},
+            {{'name': 'Temperature_Celsius', 'value': 66, 'raw': {{'value': 34}}}},
+            {{'name': 'Power_On_Hours', 'value': 90, 'raw': {{'value': 12000}}}},
+        ]}},
+    }}))
+'''
+
+
+def _write(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def build_proc_tree(root: str, pids: int, interfaces: int, seed: int = 1):
+    """Write a minimal /proc with ``pids`` processes and ``interfaces`` NICs."""
+    rng = random.Random(seed)
+    _write(f'{root}/loadavg', f'0.52 0.58 0.59 2/{pids} {pids + 100}\n')
+    _write(f'{root}/uptime', '1234567.89 4567890.12\n')
+    _write(f'{root}/stat', 'cpu  4705 356 584 3699176 23060 0 277 0 0 0\n')
+    _write(f'{root}/meminfo', ''.join(f'{k}: {v} kB\n' for k, v in (
+        ('MemTotal', 16303004), ('MemFree', 1200000), ('MemAvailable', 13400000),
+        ('Buffers', 250000), ('Cached', 9800000), ('SwapTotal', 4194300), ('SwapFree', 4100000),
+    )))
+
+    lines = ['Inter-|   Receive                            |  Transmit',
+             ' face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets']
+    names = ['lo'] + [f'eth{i}' for i in range(interfaces)] + ['docker0', 'veth1a2b3c']
+    for name in names:
+        rx, tx = rng.randint(10 ** 9, 10 ** 12), rng.randint(10 ** 9, 10 ** 12)
+        lines.append(f'{name:>6}: {rx} 1000 0 0 0 0 0 0 {tx} 1000 0 0 0 0 0 0')
+    _write(f'{root}/net/dev', '\n'.join(lines) + '\n')
+
+    watched = ('cloudflared', 'caddy', 'smbd', 'nmbd')
+    for i in range(pids):
+        pid = i + 1
+        name = watched[i] if i < len(watched) else PROCESS_NAMES[i % len(PROCESS_NAMES)]
+        rss_pages = rng.randint(100, 400000)
+        _write(f'{root}/{pid}/comm', name + '\n')
+        _write(f'{root}/{pid}/statm', f'{rss_pages * 3} {rss_pages} 500 100 0 {rss_pages} 0\n')
+        _write(f'{root}/{pid}/stat',
+               f'{pid} ({name}) S 1 {pid} {pid} 0 -1 4194560 100 0 0 0 '
+               f'{rng.randint(0, 10 ** 6)} {rng.randint(0, 10 ** 5)} 0 0 20 0 1 0 100 {rss_pages * 12288} {rss_pages}\n')
+
+
+def build_sys_tree(root: str, thermal_zones: int):
+    """Write /sys/class/thermal with ``thermal_zones`` zones."""
+    for i in range(thermal_zones):
+        zone_type = 'x86_pkg_temp' if i == 0 else f'acpitz{i}'
+        _write(f'{root}/class/thermal/thermal_zone{i}/temp', f'{40000 + i * 1500}\n')
+        _write(f'{root}/class/thermal/thermal_zone{i}/type', zone_type + '\n')
+
+
+def install_command_stubs(bindir: str, mounts: int, disks: int):
+    """Write df/lsblk/smartctl stand-ins into ``bindir`` driven by a JSON spec."""
+    spec = {
+        'disks': [
+            {'name': f'sd{chr(ord("a") + i)}', 'size': (i + 1) * 500 * 1024 ** 3, 'model': f'BENCH DISK {i}'}
+            for i in range(disks)
+        ],
+        'mounts': [
+            {'device': f'/dev/sd{chr(ord("a") + i % max(disks, 1))}{i + 1}', 'fstype': 'ext4',
+             'size': (i + 1) * 100 * 1024 ** 3, 'percent': (i * 13) % 100, 'target': '/' if i == 0 else f'/mnt/data{i}'}
+            for i in range(mounts)
+        ],
+    }
+    os.makedirs(bindir, exist_ok=True)
+    spec_path = os.path.join(bindir, 'spec.json')
+    with open(spec_path, 'w') as f:
+        json.dump(spec, f)
+
+    for cmd in ('df', 'lsblk', 'smartctl'):
+        path = os.path.join(bindir, cmd)
+        with open(path, 'w') as f:
+            f.write(_STUB_SCRIPT.format(python=sys.executable, spec=spec_path, cmd=cmd))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+class _FakeContainer:
+    def __init__(self, index: int):
+        running = index % 7 != 6
+        self.name = f'container-{index:03d}'
+        self.short_id = f'{index * 2654435761 % (16 ** 10):010x}'
+        self.status = 'running' if running else 'exited'
+        self.image = types.SimpleNamespace(tags=[IMAGES[index % len(IMAGES)]], short_id='sha256:0123456789')
+        self.attrs = {
+            'Created': '2026-01-01T00:00:00.000000000Z',
+            'RestartCount': index % 4,
+            'State': {
+                'StartedAt': '2026-01-02T03:04:05.000000000Z',
+                'Health': {'Status': 'healthy'} if index % 3 == 0 else {},
+            },
+        }
+        self._index = index
+
+    def stats(self, stream=False):
+        i = self._index
+        return {
+            'cpu_stats': {'cpu_usage': {'total_usage': 2_000_000 + i * 1000}, 'system_cpu_usage': 90_000_000, 'online_cpus': 4},
+            'precpu_stats': {'cpu_usage': {'total_usage': 1_000_000}, 'system_cpu_usage': 10_000_000},
+            'memory_stats': {'usage': (i + 1) * 50 * 1024 ** 2, 'limit': 16 * 1024 ** 3, 'stats': {'inactive_file': 1024 ** 2}},
+            'networks': {'eth0': {'rx_bytes': i * 10 ** 7, 'tx_bytes': i * 10 ** 6}},
+        }
+
+
+class _FakeDockerClient:
+    def __init__(self, containers: int):
+        items = [_FakeContainer(i) for i in range(containers)]
+        self.containers = types.SimpleNamespace(list=lambda all=False: items)
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def fake_docker_module(containers: int):
+    """A stand-in for the ``docker`` SDK module exposing ``containers`` containers."""
+    class DockerException(Exception):
+        pass
+
+    return types.SimpleNamespace(
+        from_env=lambda timeout=None: _FakeDockerClient(containers),
+        errors=types.SimpleNamespace(DockerException=DockerException),
+    )
+
+
+class HostFixture:
+    """
+    Point every collector at a generated host for the duration of a ``with`` block.
+
+    Patches the collectors' PROC_BASE/SYS_BASE, prepends command stubs to
+    PATH and swaps the Docker SDK for a fake with N containers.
+    """
+
+    def __init__(self, pids=300, thermal_zones=4, interfaces=2, mounts=4, disks=2, containers=20):
+        self.params = {
+            'pids': pids, 'thermal_zones': thermal_zones, 'interfaces': interfaces,
+            'mounts': mounts, 'disks': disks, 'containers': containers,
+        }
+        self.root = None
+        self._saved = []
+        self._saved_path = None
+
+    def _patch(self, module, name, value):
+        self._saved.append((module, name, getattr(module, name, None)))
+        setattr(module, name, value)
+
+    def __enter__(self):
+        from collectors import cpu, memory, procfs, processes, services, docker_containers
+
+        p = self.params
+        self.root = tempfile.mkdtemp(prefix='monitor-bench-')
+        proc, sys_root, bindir = (os.path.join(self.root, d) for d in ('proc', 'sys', 'bin'))
+        build_proc_tree(proc, p['pids'], p['interfaces'])
+        build_sys_tree(sys_root, p['thermal_zones'])
+        install_command_stubs(bindir, p['mounts'], p['disks'])
+
+        for module in (procfs, cpu, memory, processes, services):
+            self._patch(module, 'PROC_BASE', proc)
+        self._patch(cpu, 'SYS_BASE', sys_root)
+        self._patch(docker_containers, 'docker', fake_docker_module(p['containers']))
+        self._patch(docker_containers, 'DOCKER_AVAILABLE', True)
+
+        self._saved_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = bindir + os.pathsep + self._saved_path
+        return self
+
+    def __exit__(self, *exc):
+        for module, name, value in reversed(self._saved):
+            setattr(module, name, value)
+        self._saved.clear()
+        os.environ['PATH'] = self._saved_path
+        shutil.rmtree(self.root, ignore_errors=True)
+        return False
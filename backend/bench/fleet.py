@@ -0,0 +1,158 @@
+"""Fleet test: N real agent processes pushing to one aggregator while it serves reads.
+
+Each agent runs agent.py with its own AGENT_HOST and spool directory and a
+short push interval. Meanwhile a reader polls the aggregator's history
+route, so the numbers show read latency under ingest load. At the end,
+/api/hosts is checked for a sample count from every agent.
+
+Usage: python -m bench.fleet --url http://127.0.0.1:8099 --token secret --agents 50 --duration 60
+       python -m bench.fleet --serve "gunicorn --bind 127.0.0.1:8099 --workers 1 --threads 8 app:app" \\
+                             --url http://127.0.0.1:8099 --token secret --agents 20
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from bench.loadtest import Recorder, _fetch, _wait_healthy
+from bench.stats import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_ROUTES = (
+    '/api/history/cpu?hours=1',
+    '/api/latest/memory',
+)
+
+
+def _agent_env(url: str, token: str, host: str, spool_dir: str, push_interval: float) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'AGGREGATOR_URL': url,
+        'INGEST_TOKEN': token,
+        'AGENT_HOST': host,
+        'AGENT_SPOOL_DIR': spool_dir,
+        'AGENT_PUSH_INTERVAL': str(push_interval),
+        # Flush the fast tier often so every push carries rows
+        'COLLECTION_INTERVAL': str(max(int(push_interval), 5)),
+    })
+    return env
+
+
+def _reader(base_url: str, deadline: float, interval: float, recorder: Recorder, timeout: float):
+    while time.time() < deadline:
+        for route in READ_ROUTES:
+            _fetch(base_url, route, recorder, timeout)
+        time.sleep(interval)
+
+
+def _hosts(base_url: str) -> dict:
+    try:
+        with urllib.request.urlopen(base_url + '/api/hosts', timeout=10) as resp:
+            return {h['host']: h for h in json.loads(resp.read())}
+    except (urllib.error.URLError, OSError, ValueError):
+        return {}
+
+
+def run(base_url: str, token: str, agents: int, duration: float, push_interval: float,
+        read_interval: float, timeout: float) -> dict:
+    spool_root = tempfile.mkdtemp(prefix='fleet-spool-')
+    names = [f'bench-agent-{i:03d}' for i in range(agents)]
+    before = _hosts(base_url)
+
+    processes = []
+    for name in names:
+        env = _agent_env(base_url, token, name, os.path.join(spool_root, name), push_interval)
+        processes.append(subprocess.Popen(
+            [sys.executable, 'agent.py'], cwd=BACKEND_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    try:
+        _reader(base_url, time.time() + duration, read_interval, recorder, timeout)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=60)
+    elapsed = time.perf_counter() - started
+
+    # Agents spool what they held at shutdown; what was sent is on the aggregator
+    after = _hosts(base_url)
+    samples = {name: after.get(name, {}).get('samples', 0) - before.get(name, {}).get('samples', 0) for name in names}
+    left_in_spool = sum(
+        len([n for n in os.listdir(os.path.join(spool_root, name)) if n.endswith('.json.gz')])
+        for name in names if os.path.isdir(os.path.join(spool_root, name))
+    )
+    all_latencies = [s for latencies in recorder.latencies.values() for s in latencies]
+
+    return {
+        'agents': agents,
+        'duration_seconds': round(elapsed, 1),
+        'push_interval_seconds': push_interval,
+        'hosts_reporting': sum(1 for count in samples.values() if count > 0),
+        'samples_stored': sum(samples.values()),
+        'samples_per_host': {'min': min(samples.values()), 'max': max(samples.values())} if samples else {},
+        'batches_left_in_spool': left_in_spool,
+        'read_errors': recorder.errors,
+        'reads': summarize(all_latencies) if all_latencies else {},
+        'routes': {route: summarize(latencies) for route, latencies in recorder.latencies.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--token', default=os.environ.get('INGEST_TOKEN', ''), help="the aggregator's INGEST_TOKEN")
+    parser.add_argument('--agents', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--push-interval', type=float, default=2, help='AGENT_PUSH_INTERVAL for every agent')
+    parser.add_argument('--read-interval', type=float, default=0.5, help='seconds between reader polls')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--serve', help='command that starts a local aggregator for the duration of the test')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+    if not args.token:
+        raise SystemExit('--token (or INGEST_TOKEN) is required')
+
+    server = None
+    if args.serve:
+        env = dict(os.environ, INGEST_TOKEN=args.token)
+        server = subprocess.Popen(shlex.split(args.serve), cwd=BACKEND_DIR, env=env)
+        if not _wait_healthy(args.url, 120):
+            server.terminate()
+            raise SystemExit(f'aggregator did not become healthy at {args.url}')
+
+    try:
+        results = run(args.url, args.token, args.agents, args.duration, args.push_interval,
+                      args.read_interval, args.timeout)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(f"{results['hosts_reporting']}/{results['agents']} agents stored {results['samples_stored']} samples "
+          f"in {results['duration_seconds']}s ({results['batches_left_in_spool']} batches left in spools)")
+    reads = results['reads']
+    if reads:
+        print(f"reads p50 {reads['p50_ms']} ms  p95 {reads['p95_ms']} ms  p99 {reads['p99_ms']} ms "
+              f"({sum(results['read_errors'].values())} errors)")
+    for route, r in sorted(results['routes'].items()):
+        print(f"  {route:<28} p50 {r['p50_ms']:>9.3f}  p95 {r['p95_ms']:>9.3f}  p99 {r['p99_ms']:>9.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""Load test: replay the dashboard's request mix from N simulated viewers.
+
+``--flow dashboard`` (default) is frontend/app.js: one /api/dashboard
+request per refresh. ``--flow split`` is the earlier mix of five requests.
+
+Usage: python -m bench.loadtest --url http://127.0.0.1:8080 --viewers 10 --duration 60
+       python -m bench.loadtest --serve "gunicorn --bind 127.0.0.1:8099 --workers 1 --threads 2 app:app" \\
+                                --url http://127.0.0.1:8099 --viewers 20 --refresh 2
+"""
+
+import argparse
+import json
+import os
+import random
+import shlex
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.stats import summarize
+
+# The split flow: /api/current first, then these four concurrently.
+# History routes load the full window once, then only rows since the last one
+FOLLOW_UP_ROUTES = (
+    '/api/history/cpu?hours={hours}',
+    '/api/history/network?hours={hours}',
+    '/api/alerts',
+    '/api/stats',
+)
+
+
+class Recorder:
+    """Thread-safe per-route latency and error collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route: str, seconds: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(route, []).append(seconds)
+            else:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def _fetch(base_url: str, route: str, recorder: Recorder, timeout: float):
+    """GET a route, recording its latency; returns the body, or None on failure."""
+    start = time.perf_counter()
+    body = None
+    try:
+        with urllib.request.urlopen(base_url + route, timeout=timeout) as resp:
+            data = resp.read()
+            if resp.status == 200:
+                body = data
+    except (urllib.error.URLError, OSError):
+        pass
+    recorder.record(route.split('?')[0], time.perf_counter() - start, body is not None)
+    return body
+
+
+def _fetch_follow_up(base_url: str, route: str, since: dict, recorder: Recorder, timeout: float):
+    """Fetch a follow-up route; history routes resume from ``since`` like the dashboard."""
+    path = route.split('?')[0]
+    is_history = path.startswith('/api/history/')
+    if is_history and since.get(path):
+        route += '&since=' + urllib.parse.quote(since[path])
+    body = _fetch(base_url, route, recorder, timeout)
+    if is_history and body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return
+        if 'cursor' in payload:
+            since[path] = payload['cursor']
+        elif payload.get('data'):
+            since[path] = payload['data'][-1]['timestamp']
+
+
+def _fetch_dashboard(base_url: str, hours: int, since: dict, recorder: Recorder, timeout: float):
+    """One /api/dashboard refresh; each series resumes from ``since`` like app.js."""
+    params = {'hours': hours, 'series': 'cpu,network'}
+    params.update({f'since.{t}': value for t, value in since.items()})
+    body = _fetch(base_url, '/api/dashboard?' + urllib.parse.urlencode(params), recorder, timeout)
+    if not body:
+        return
+    try:
+        series = json.loads(body)['series']
+    except (ValueError, KeyError):
+        return
+    for metric_type, page in series.items():
+        if 'cursor' in page:
+            since[metric_type] = page['cursor']
+        elif page.get('data'):
+            since[metric_type] = page['data'][-1]['timestamp']
+
+
+def _viewer(base_url: str, hours: int, refresh: float, deadline: float, recorder: Recorder, timeout: float,
+            flow: str = 'dashboard'):
+    """One dashboard tab: load, fan out follow-ups, wait for the refresh interval, repeat."""
+    follow_ups = [r.format(hours=hours) for r in FOLLOW_UP_ROUTES]
+    since = {}
+    # Viewers opened at different moments rather than in lockstep
+    time.sleep(random.uniform(0, refresh))
+    with ThreadPoolExecutor(max_workers=len(follow_ups)) as pool:
+        while time.time() < deadline:
+            cycle_start = time.time()
+            if flow == 'dashboard':
+                _fetch_dashboard(base_url, hours, since, recorder, timeout)
+            else:
+                _fetch(base_url, '/api/current', recorder, timeout)
+                list(pool.map(lambda r: _fetch_follow_up(base_url, r, since, recorder, timeout), follow_ups))
+            time.sleep(max(0.0, refresh - (time.time() - cycle_start)))
+
+
+def _internal_metrics(base_url: str) -> dict:
+    try:
+        with urllib.request.urlopen(base_url + '/api/metrics/internal', timeout=10) as resp:
+            return json.loads(resp.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return {}
+
+
+def _db_deltas(before: dict, after: dict) -> dict:
+    """Difference in database timing histograms across the run."""
+    b = before.get('timings', {}).get('db', {})
+    a = after.get('timings', {}).get('db', {})
+    deltas = {}
+    for name, hist in a.items():
+        prev = b.get(name, {})
+        count = hist['count'] - prev.get('count', 0)
+        total = hist['sum_seconds'] - prev.get('sum_seconds', 0)
+        if count:
+            deltas[name] = {
+                'count': count,
+                'total_ms': round(total * 1000, 1),
+                'avg_ms': round(total / count * 1000, 3),
+            }
+    return deltas
+
+
+def _wait_healthy(base_url: str, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/health', timeout=2) as resp:
+                if resp.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run(base_url: str, viewers: int, duration: float, refresh: float, hours: int, timeout: float,
+        flow: str = 'dashboard') -> dict:
+    recorder = Recorder()
+    before = _internal_metrics(base_url)
+    deadline = time.time() + duration
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=_viewer, args=(base_url, hours, refresh, deadline, recorder, timeout, flow), daemon=True)
+        for _ in range(viewers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    after = _internal_metrics(base_url)
+    all_latencies = [s for samples in recorder.latencies.values() for s in samples]
+    total = len(all_latencies) + sum(recorder.errors.values())
+
+    return {
+        'viewers': viewers,
+        'flow': flow,
+        'duration_seconds': round(elapsed, 1),
+        'refresh_seconds': refresh,
+        'requests': total,
+        'errors': recorder.errors,
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0,
+        'overall': summarize(all_latencies) if all_latencies else {},
+        'routes': {route: summarize(samples) for route, samples in recorder.latencies.items()},
+        'db': _db_deltas(before, after),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--viewers', type=int, default=10)
+    parser.add_argument('--flow', choices=('dashboard', 'split'), default='dashboard',
+                        help='one /api/dashboard request per refresh, or the five separate requests')
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--refresh', type=float, default=60, help='seconds between dashboard refreshes (app.js: 60)')
+    parser.add_argument('--hours', type=int, default=24, help='history window requested by each viewer')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--serve', help='command that starts a local instance for the duration of the test')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.serve:
+        server = subprocess.Popen(shlex.split(args.serve), cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if not _wait_healthy(args.url, 120):
+            server.terminate()
+            raise SystemExit(f'instance did not become healthy at {args.url}')
+
+    try:
+        results = run(args.url, args.viewers, args.duration, args.refresh, args.hours, args.timeout, args.flow)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    overall = results['overall']
+    print(f"{results['requests']} requests in {results['duration_seconds']}s "
+          f"({results['throughput_rps']} req/s, {sum(results['errors'].values())} errors)")
+    if overall:
+        print(f"latency p50 {overall['p50_ms']} ms  p95 {overall['p95_ms']} ms  p99 {overall['p99_ms']} ms")
+    for route, r in sorted(results['routes'].items()):
+        print(f"  {route:<28} p50 {r['p50_ms']:>9.3f}  p95 {r['p95_ms']:>9.3f}  p99 {r['p99_ms']:>9.3f} ms")
+    for name in ('write_lock_wait', 'write_lock_hold', 'connection_hold'):
+        if name in results['db']:
+            d = results['db'][name]
+            print(f"  db {name:<24} {d['count']} x avg {d['avg_ms']} ms (total {d['total_ms']} ms)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
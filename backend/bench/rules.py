@@ -0,0 +1,129 @@
+"""Alert rule evaluation time per collection cycle, with thousands of rules and entities.
+
+Builds a snapshot with ``--entities`` containers, plus a tenth as many
+mounts and a twentieth as many interfaces, and ``--rules`` rules spread
+over them: per-entity rules on every type, some with include globs and
+per-entity overrides, and the built-in rules. Each cycle draws new
+values, ``--hot`` of them over their thresholds (so conditions start,
+hold and clear), and times one ``RuleEngine.evaluate`` over the whole
+snapshot.
+
+Usage: python -m bench.rules --rules 2000 --entities 1000 --cycles 200 [--hot 0.01]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from bench.stats import summarize
+from rules import RuleEngine, default_rules
+
+# (type, field, op, warning, critical) the generated rules cycle through
+_TEMPLATES = (
+    ('docker', 'cpu_percent', '>=', 80, 95),
+    ('docker', 'memory_percent', '>=', 85, 95),
+    ('docker', 'restart_count', '>', 0, None),
+    ('docker', 'health', '==', 'unhealthy', None),
+    ('disk', 'percent_used', '>=', 80, 95),
+    ('network', 'rx_mb_per_sec', '>=', 100, None),
+)
+
+
+def build_snapshot(entities: int, hot: float, rng: random.Random) -> dict:
+    """A snapshot in which about ``hot`` of the values are over their thresholds."""
+    def level(normal: float, high: float) -> float:
+        return rng.uniform(high, high * 1.05) if rng.random() < hot else rng.uniform(0, normal)
+
+    return {
+        'docker': {
+            f'app-{i:05d}': {
+                'status': 'running',
+                'health': 'unhealthy' if rng.random() < hot else 'healthy',
+                'restart_count': i + (rng.random() < hot),
+                'cpu_percent': level(60, 96),
+                'memory_percent': level(60, 96),
+            } for i in range(entities)
+        },
+        'disk': {f'/mnt/vol{i:04d}': {'percent_used': level(70, 96)} for i in range(max(entities // 10, 1))},
+        'network': {f'eth{i}': {'rx_mb_per_sec': level(50, 110), 'tx_mb_per_sec': level(50, 110)}
+                    for i in range(max(entities // 20, 1))},
+        'cpu': {'temperature': {'zone0': {'temp_celsius': level(60, 86)}}, 'load': {'load_5min': 0.5}},
+        'memory': {'percent_used': level(60, 96), 'swap_total_mb': 2048, 'swap_used_mb': 100},
+    }
+
+
+def build_rules(count: int) -> list:
+    rules = default_rules()
+    for i in range(max(count - len(rules), 0)):
+        metric_type, field, op, warning, critical = _TEMPLATES[i % len(_TEMPLATES)]
+        rule = {'name': f'bench_{i}', 'type': metric_type, 'entities': '', 'field': field, 'op': op,
+                'warning': warning, 'for': (i % 3) * 30}
+        if critical is not None:
+            rule['critical'] = critical
+        if field == 'restart_count':
+            rule['delta'] = True
+        # Every fourth rule is scoped to a subset, every fifth has an override
+        if i % 4 == 0:
+            rule['include'] = [f'*{i % 10}', '/mnt/*', 'eth*']
+        if i % 5 == 0 and op == '>=':
+            rule['overrides'] = {'*1': {'warning': 90}}
+        rules.append(rule)
+    return rules
+
+
+def run(rule_count: int, entities: int, cycles: int, hot: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    rules = build_rules(rule_count)
+    started = time.perf_counter()
+    engine = RuleEngine(rules)
+    compile_seconds = time.perf_counter() - started
+
+    durations, alerts = [], 0
+    snapshot = build_snapshot(entities, hot, rng)
+    checks = sum(
+        len(snapshot[rule.type]) if rule.spec.get('entities') == '' else 1
+        for rule in engine.rules if rule.type in snapshot
+    )
+    for cycle in range(cycles):
+        snapshot = build_snapshot(entities, hot, rng)
+        started = time.perf_counter()
+        alerts += len(engine.evaluate(snapshot, now=cycle * 5.0))
+        durations.append(time.perf_counter() - started)
+
+    summary = summarize(durations)
+    return {
+        'rules': len(engine.rules),
+        'entities': {metric_type: len(payload) for metric_type, payload in snapshot.items()},
+        'checks_per_cycle': checks,
+        'compile_ms': round(compile_seconds * 1000, 3),
+        'cycle': summary,
+        'us_per_check': round(summary['mean_ms'] * 1000 / checks, 3) if checks else None,
+        'alerts_emitted': alerts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, default=2000)
+    parser.add_argument('--entities', type=int, default=1000, help='containers; mounts and interfaces scale with it')
+    parser.add_argument('--cycles', type=int, default=200)
+    parser.add_argument('--hot', type=float, default=0.01, help='fraction of values over their thresholds per cycle')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.rules, args.entities, args.cycles, args.hot, args.seed)
+    cycle = results['cycle']
+    print(f"{results['rules']} rules, {results['checks_per_cycle']} checks per cycle "
+          f"(compiled in {results['compile_ms']} ms)")
+    print(f"evaluate p50 {cycle['p50_ms']} ms  p95 {cycle['p95_ms']} ms  p99 {cycle['p99_ms']} ms  "
+          f"({results['us_per_check']} us per check, {results['alerts_emitted']} alerts)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
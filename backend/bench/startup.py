@@ -0,0 +1,93 @@
+"""Startup benchmark: time from process start to first byte and to a warmed snapshot.
+
+Usage: python -m bench.startup --serve "gunicorn --bind 127.0.0.1:8099 --workers 1 --threads 2 app:app" \\
+                               --url http://127.0.0.1:8099 --runs 5
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from bench.stats import summarize
+
+
+def _get(url: str, timeout: float = 2):
+    """Return (status, parsed JSON body), or (None, None) if nothing answered."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, OSError, ValueError):
+        return None, None
+
+
+def measure_once(command: str, base_url: str, timeout: float, poll: float) -> dict:
+    """Start ``command`` against an empty database and time its startup milestones."""
+    workdir = tempfile.mkdtemp(prefix='monitor-startup-')
+    env = dict(os.environ, MONITOR_DB_PATH=os.path.join(workdir, 'metrics.db'))
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.perf_counter()
+    server = subprocess.Popen(shlex.split(command), cwd=backend, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {}
+    try:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status, body = _get(base_url + '/health')
+            now = time.perf_counter() - started
+            if status is not None and 'first_byte_seconds' not in result:
+                result['first_byte_seconds'] = now
+                current_start = time.perf_counter()
+                _, current = _get(base_url + '/api/current', timeout=timeout)
+                result['first_current_seconds'] = time.perf_counter() - current_start
+                result['warming_at_first_byte'] = (current or {}).get('warming_up', [])
+            if body and body.get('ready'):
+                result['ready_seconds'] = now
+                break
+            time.sleep(poll)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--serve', required=True, help='command that starts the instance under test')
+    parser.add_argument('--url', default='http://127.0.0.1:8099')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for readiness per run')
+    parser.add_argument('--poll', type=float, default=0.01, help='seconds between /health polls')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    runs = [measure_once(args.serve, args.url, args.timeout, args.poll) for _ in range(args.runs)]
+    results = {'runs': runs}
+    for key in ('first_byte_seconds', 'first_current_seconds', 'ready_seconds'):
+        values = [r[key] for r in runs if key in r]
+        if values:
+            results[key.replace('_seconds', '')] = summarize(values)
+
+    for key in ('first_byte', 'first_current', 'ready'):
+        if key in results:
+            r = results[key]
+            print(f"{key:<14} p50 {r['p50_ms']:>9.1f} ms  max {r['max_ms']:>9.1f} ms")
+    missing = sum(1 for r in runs if 'ready_seconds' not in r)
+    if missing:
+        print(f'{missing} of {len(runs)} runs did not become ready within {args.timeout}s')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""Latency summaries shared by the benchmarks."""
+
+import statistics
+
+
+def summarize(durations: list) -> dict:
+    """Latency summary in milliseconds."""
+    ordered = sorted(durations)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
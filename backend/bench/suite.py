@@ -0,0 +1,306 @@
+"""End-to-end benchmark: collectors, collection cycle, API latency and database growth.
+
+Usage: python -m bench [--containers 50] [--pids 1000] [--days 90] [--output bench_results.json]
+       python -m bench --compare old_results.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Keep the scheduler idle and the database out of /app while benchmarking;
+# must happen before config/database are imported.
+_WORKDIR = tempfile.mkdtemp(prefix='monitor-bench-db-')
+os.environ.setdefault('MONITOR_DB_PATH', os.path.join(_WORKDIR, 'metrics.db'))
+for _var in ('FAST_INTERVAL', 'MEDIUM_INTERVAL', 'SLOW_INTERVAL', 'COLLECTION_INTERVAL'):
+    os.environ.setdefault(_var, '86400')
+
+import current  # noqa: E402
+import database  # noqa: E402
+import serialization  # noqa: E402
+from collectors import (  # noqa: E402
+    collect_cpu_metrics, collect_memory_metrics, collect_disk_metrics, collect_smart_metrics,
+    collect_drives_metrics, collect_docker_metrics, collect_process_metrics, collect_network_metrics,
+    collect_services_metrics,
+)
+from sampling import SampleAggregator  # noqa: E402
+from bench.datasets import SAMPLES_PER_DAY, docker_payload, process_payload  # noqa: E402
+from bench.fixtures import HostFixture  # noqa: E402
+from bench.stats import summarize  # noqa: E402
+
+COLLECTORS = (
+    ('cpu', collect_cpu_metrics),
+    ('memory', collect_memory_metrics),
+    ('network', collect_network_metrics),
+    ('disk', collect_disk_metrics),
+    ('docker', collect_docker_metrics),
+    ('processes', collect_process_metrics),
+    ('services', collect_services_metrics),
+    ('smart', collect_smart_metrics),
+    ('drives', collect_drives_metrics),
+)
+
+API_ROUTES = (
+    '/api/current',
+    '/api/history/cpu?hours=24',
+    '/api/history/network?hours=24',
+    '/api/history/docker?hours=24',
+    '/api/latest/docker',
+    '/api/alerts',
+    '/api/stats',
+    '/metrics',
+)
+
+
+def time_calls(func, iterations: int) -> list:
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def peak_allocation_kb(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def bench_collectors(iterations: int) -> dict:
+    results = {}
+    for name, collector in COLLECTORS:
+        collector()  # warm caches and the network collector's previous counters
+        results[name] = summarize(time_calls(collector, iterations))
+        results[name]['peak_alloc_kb'] = peak_allocation_kb(collector)
+    return results
+
+
+def _jitter(data, rng: random.Random, spread: float):
+    """Copy ``data`` with float leaves scaled by a random factor."""
+    if isinstance(data, dict):
+        return {k: _jitter(v, rng, spread) for k, v in data.items()}
+    if isinstance(data, float):
+        return round(data * rng.uniform(1 - spread, 1 + spread), 4)
+    return data
+
+
+def simulate_growth(days: int, containers: int, samples: dict) -> dict:
+    """
+    Store ``days`` of rows the way the scheduler would with default tiers.
+
+    Fast- and medium-tier samples are folded into the aggregator (fast ones
+    jittered) and flushed once per storage interval; slow-tier rows are
+    stored every SLOW_INTERVAL. Everything goes through ``store_metrics`` so
+    change detection and compression apply.
+    """
+    rng = random.Random(7)
+    flush_every, medium_every, slow_every = 300, 60, 900
+    cycles = days * SAMPLES_PER_DAY
+    sampler = SampleAggregator()
+    disk = copy.deepcopy(samples.get('disk', {}))
+
+    start_size = os.path.getsize(database.DB_PATH)
+    rows = 0
+    started = time.perf_counter()
+    for cycle in range(cycles):
+        for name in ('cpu', 'memory', 'network'):
+            sampler.add(name, _jitter(samples.get(name, {}), rng, 0.05))
+
+        for tick in range(flush_every // medium_every):
+            step = cycle * (flush_every // medium_every) + tick
+            for mount in disk.values():
+                if isinstance(mount, dict) and 'used_gb' in mount:
+                    mount['used_gb'] = round(mount['used_gb'] + 0.001, 3)
+            sampler.add('disk', copy.deepcopy(disk))
+            sampler.add('docker', docker_payload(rng, containers, step))
+            sampler.add('processes', process_payload(rng, step))
+
+        for metric_type, data in sampler.flush().items():
+            database.store_metrics(metric_type, data)
+            rows += 1
+
+        if cycle % (slow_every // flush_every) == 0:
+            for name in ('smart', 'drives'):
+                database.store_metrics(name, samples.get(name, {}))
+                rows += 1
+
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(database.DB_PATH) - start_size
+    return {
+        'days': days,
+        'rows': rows,
+        'database_mb': round(size / (1024 * 1024), 2),
+        'mb_per_day': round(size / (1024 * 1024) / days, 3) if days else 0,
+        'store_us_per_row': round(elapsed / rows * 1e6, 1) if rows else 0,
+        'stats': database.get_database_stats(),
+    }
+
+
+def bench_serialization(iterations: int, samples: dict) -> dict:
+    """
+    Response encoding cost, old path against new.
+
+    ``dicts`` decodes stored rows and encodes the whole response with the
+    standard library (what jsonify did); ``spliced`` copies stored JSON
+    into the envelope. /api/current is timed encoding every sample
+    (``cold``) and with each sample's fragment already cached (``warm``).
+    Spliced paths are timed with both JSON backends when orjson is installed.
+    """
+    backends = [False, True] if serialization.ORJSON_AVAILABLE else [False]
+    saved = serialization.USE_ORJSON
+    results = {'current': {'dicts': summarize(time_calls(lambda: json.dumps(samples), iterations))}}
+    try:
+        for use_orjson in backends:
+            serialization.USE_ORJSON = use_orjson
+            name = 'orjson' if use_orjson else 'json'
+
+            def cold():
+                current._fragments.clear()
+                current.encode_current(samples)
+            results['current'][f'cold_{name}'] = summarize(time_calls(cold, iterations))
+            results['current'][f'warm_{name}'] = summarize(
+                time_calls(lambda: current.encode_current(samples), iterations))
+
+        for metric_type in ('cpu', 'docker'):
+            route = results[f'history_{metric_type}'] = {}
+            route['rows'] = len(database.get_metrics(metric_type, hours=24))
+            serialization.USE_ORJSON = False
+            route['dicts'] = summarize(time_calls(
+                lambda: json.dumps({'metric_type': metric_type, 'hours': 24,
+                                    'data': database.get_metrics(metric_type, hours=24)}),
+                max(3, iterations // 5)))
+            for use_orjson in backends:
+                serialization.USE_ORJSON = use_orjson
+                route['spliced_orjson' if use_orjson else 'spliced_json'] = summarize(time_calls(
+                    lambda: serialization.splice({
+                        'metric_type': metric_type, 'hours': 24,
+                        'data': serialization.encode_rows(database.get_metrics(metric_type, hours=24, raw=True)),
+                    }),
+                    max(3, iterations // 5)))
+    finally:
+        serialization.USE_ORJSON = saved
+    return results
+
+
+def stored_rows() -> dict:
+    """Rows per metric type in the database, to put API latencies in context."""
+    with database.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT metric_type, COUNT(*) AS n FROM metrics GROUP BY metric_type')
+        return {row['metric_type']: row['n'] for row in cursor.fetchall()}
+
+
+def bench_app(iterations: int) -> dict:
+    """
+    Cycle wall time and API latency; needs the full Flask stack.
+
+    Run after ``simulate_growth``, so history is read from a database of
+    realistic size; the rows per type it was measured at go in ``api_rows``.
+    """
+    try:
+        import app as monitor_app
+        import collection
+    except ImportError as e:
+        return {'app_skipped': f'app unavailable: {e}'}
+
+    try:
+        collection.stop_collection()
+    except Exception:
+        pass
+
+    results = {'cycle': summarize(time_calls(collection.collect_all_metrics, max(3, iterations // 5)))}
+    results['api_rows'] = stored_rows()
+    client = monitor_app.app.test_client()
+    routes = {}
+    for route in API_ROUTES:
+        client.get(route)
+        routes[route] = summarize(time_calls(lambda: client.get(route), iterations))
+    results['api'] = routes
+    return results
+
+
+def compare(current: dict, baseline: dict):
+    """Print p50 ratios against a previous results file."""
+    rows, base_rows = sum(current.get('api_rows', {}).values()), sum(baseline.get('api_rows', {}).values())
+    if rows != base_rows:
+        print(f'note: API latency measured at {rows} stored rows, baseline at {base_rows}; '
+              f'run both with the same --days')
+
+    def walk(cur, base, prefix=''):
+        for key, value in cur.items():
+            if isinstance(value, dict) and 'p50_ms' in value and isinstance(base.get(key), dict):
+                old = base[key].get('p50_ms') or 0
+                ratio = value['p50_ms'] / old if old else float('inf')
+                flag = '  REGRESSION' if ratio > 1.2 else ''
+                print(f'{prefix}{key:<36} p50 {old:>9.3f} -> {value["p50_ms"]:>9.3f} ms  x{ratio:.2f}{flag}')
+            elif isinstance(value, dict) and isinstance(base.get(key), dict):
+                walk(value, base[key], prefix + key + '.')
+    walk(current, baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pids', type=int, default=300)
+    parser.add_argument('--thermal-zones', type=int, default=4)
+    parser.add_argument('--interfaces', type=int, default=2)
+    parser.add_argument('--mounts', type=int, default=4)
+    parser.add_argument('--disks', type=int, default=2)
+    parser.add_argument('--containers', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--days', type=int, default=90, help='simulated days of database growth (0 to skip)')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='previous results file to compare p50 latencies against')
+    args = parser.parse_args()
+
+    host = HostFixture(pids=args.pids, thermal_zones=args.thermal_zones, interfaces=args.interfaces,
+                       mounts=args.mounts, disks=args.disks, containers=args.containers)
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'fixture': host.params,
+            'iterations': args.iterations,
+        }
+    }
+
+    database.init_database()
+    with host:
+        results['collectors'] = bench_collectors(args.iterations)
+        samples = {name: collector() for name, collector in COLLECTORS}
+        if args.days:
+            results['db_growth'] = simulate_growth(args.days, args.containers, samples)
+        results.update(bench_app(args.iterations))
+        results['serialization'] = bench_serialization(args.iterations, samples)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    for name, r in results['collectors'].items():
+        print(f'collector {name:<10} p50 {r["p50_ms"]:>8.3f} ms  p95 {r["p95_ms"]:>8.3f} ms  peak {r["peak_alloc_kb"]} KB')
+    for name, r in results['serialization'].items():
+        timings = ', '.join(f'{k} {v["p50_ms"]:.3f}' for k, v in r.items() if isinstance(v, dict))
+        print(f'serialize {name:<14} p50 ms: {timings}')
+    if 'db_growth' in results:
+        g = results['db_growth']
+        print(f'db growth: {g["rows"]} rows, {g["database_mb"]} MB over {g["days"]} days ({g["mb_per_day"]} MB/day)')
+    if 'api' in results:
+        print(f'api latency measured at {sum(results["api_rows"].values())} stored rows')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
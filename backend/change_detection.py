@@ -0,0 +1,72 @@
+"""Detect metric payloads that have not meaningfully changed since the last stored row."""
+
+import threading
+import time
+
+# Stored in place of the payload when a row repeats the previous full row
+SAME_AS_PREVIOUS = '='
+
+
+def _tolerance(path: tuple, tolerances: dict) -> float:
+    """Look up the tolerance for a leaf by any dotted suffix of its path."""
+    for start in range(len(path)):
+        tol = tolerances.get('.'.join(str(p) for p in path[start:]))
+        if tol is not None:
+            return tol
+    return 0
+
+
+def within_tolerance(base, new, tolerances: dict, path: tuple = ()) -> bool:
+    """True if ``new`` matches ``base`` structurally with numeric leaves inside their tolerance."""
+    if isinstance(base, dict):
+        if not isinstance(new, dict) or base.keys() != new.keys():
+            return False
+        return all(within_tolerance(base[k], new[k], tolerances, path + (k,)) for k in base)
+
+    if isinstance(base, list):
+        if not isinstance(new, list) or len(base) != len(new):
+            return False
+        return all(within_tolerance(b, n, tolerances, path) for b, n in zip(base, new))
+
+    numeric = (int, float)
+    if (isinstance(base, numeric) and isinstance(new, numeric)
+            and not isinstance(base, bool) and not isinstance(new, bool)):
+        if base == new:
+            return True
+        return abs(new - base) <= _tolerance(path, tolerances)
+
+    return base == new
+
+
+class ChangeDetector:
+    """
+    Remember the last fully stored payload per metric type.
+
+    ``is_unchanged`` compares against that base rather than the previous
+    sample, so small drifts cannot accumulate across a run of markers.
+    """
+
+    def __init__(self, metric_types, tolerances: dict, max_age_seconds: int):
+        self.metric_types = frozenset(metric_types)
+        self.tolerances = tolerances
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._bases = {}
+
+    def is_unchanged(self, metric_type: str, data) -> bool:
+        if metric_type not in self.metric_types:
+            return False
+        with self._lock:
+            entry = self._bases.get(metric_type)
+        if entry is None:
+            return False
+        base, stored_at = entry
+        if time.monotonic() - stored_at > self.max_age_seconds:
+            return False
+        return within_tolerance(base, data, self.tolerances.get(metric_type, {}))
+
+    def remember(self, metric_type: str, data):
+        """Record ``data`` as the latest fully stored payload."""
+        if metric_type in self.metric_types:
+            with self._lock:
+                self._bases[metric_type] = (data, time.monotonic())
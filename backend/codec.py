@@ -0,0 +1,101 @@
+"""Payload encoding for stored metric rows: plain JSON or dictionary-compressed JSON."""
+
+import json
+import logging
+import zlib
+
+from serialization import loads
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Encodings recorded per row. None (NULL) is plain JSON text, so rows
+# written before compression existed keep reading unchanged.
+ENCODING_JSON = None
+ENCODING_ZLIB = 'zlib-d1'
+ENCODING_ZSTD = 'zstd-d1'
+
+# Static preset dictionary built from the collectors' own field names and
+# common values, laid out the way json.dumps renders them. Rows depend on
+# the exact bytes: never edit this, add a new version (d2) instead.
+_DICT_FRAGMENTS = (
+    # processes
+    '{"processes": [{"pid": ', ', "name": "', '", "mem_mb": ', ', "mem_percent": ', ', "cpu_jiffies": ',
+    '}, {"pid": ',
+    # docker
+    '": {"id": "', '", "image": "', '", "status": "running", "health": "',
+    '", "status": "exited", "health": "none', 'healthy', 'unhealthy', 'starting',
+    '", "created": "', '", "started": "', '", "restart_count": ',
+    ', "cpu_percent": ', ', "memory_mb": ', ', "memory_percent": ',
+    ', "network_rx_mb": ', ', "network_tx_mb": ', ', "uptime_seconds": ',
+    ':latest', '.000000000Z', 'T00:00:00.',
+    # disk / smart / drives
+    '{"device": "/dev/', '", "fstype": "ext4', '", "total_gb": ', ', "used_gb": ',
+    ', "available_gb": ', ', "percent_used": ',
+    '", "model": "', '", "serial": "', '", "health_passed": true, "temperature_celsius": ',
+    ', "power_on_hours": ', ', "attributes": {', '": {"value": ', ', "raw": ',
+    '"size_gb": ', ', "mounted": true, "mount_point": "', ', "mounted": false, "mount_point": null, "fstype": null}',
+)
+PRESET_DICT = ''.join(reversed(_DICT_FRAGMENTS)).encode('utf-8')
+
+_zstd_dict = zstandard.ZstdCompressionDict(PRESET_DICT, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if ZSTD_AVAILABLE else None
+
+
+def resolve_encoding(mode: str):
+    """Map a configured compression mode to the encoding written for new rows."""
+    mode = (mode or 'none').lower()
+    if mode == 'zstd':
+        if ZSTD_AVAILABLE:
+            return ENCODING_ZSTD
+        logger.warning("zstandard not installed; falling back to zlib compression")
+        return ENCODING_ZLIB
+    if mode == 'zlib':
+        return ENCODING_ZLIB
+    return ENCODING_JSON
+
+
+def encode(data, encoding):
+    """Serialize ``data`` with the given encoding, returning the column value."""
+    # Always the standard library: the preset dictionary matches its separators
+    text = json.dumps(data)
+    if encoding == ENCODING_JSON:
+        return text
+    return encode_raw(text.encode('utf-8'), encoding)
+
+
+def encode_raw(raw: bytes, encoding):
+    """Column value for already-serialized JSON ``raw`` (UTF-8 bytes)."""
+    if encoding == ENCODING_JSON:
+        return raw.decode('utf-8')
+    if encoding == ENCODING_ZLIB:
+        compressor = zlib.compressobj(level=6, zdict=PRESET_DICT)
+        return compressor.compress(raw) + compressor.flush()
+    if encoding == ENCODING_ZSTD:
+        return zstandard.ZstdCompressor(level=3, dict_data=_zstd_dict).compress(raw)
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+
+def decode_raw(payload, encoding) -> bytes:
+    """Undo compression only, returning the stored JSON as UTF-8 bytes."""
+    if encoding == ENCODING_JSON:
+        return payload.encode('utf-8') if isinstance(payload, str) else payload
+    if encoding == ENCODING_ZLIB:
+        decompressor = zlib.decompressobj(zdict=PRESET_DICT)
+        return decompressor.decompress(payload) + decompressor.flush()
+    if encoding == ENCODING_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstandard is required to read zstd-compressed rows")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dict).decompress(payload)
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+
+def decode(payload, encoding):
+    """Inverse of ``encode``."""
+    if encoding == ENCODING_JSON:
+        return loads(payload)
+    return loads(decode_raw(payload, encoding))
@@ -0,0 +1,342 @@
+"""Metric collection and scheduling, run by exactly one process per database.
+
+With several web workers (``gunicorn --workers N``) every worker calls
+``start_collection()``; the one holding the collector lock file collects
+and the others serve the snapshot it shares through a memory-mapped
+segment. A separate
+``python collector.py`` process can own collection instead.
+"""
+
+import atexit
+import logging
+import threading
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_ERROR
+
+from config import Config
+from database import init_database, store_metrics, store_sketches, archive_old_data, cleanup_old_data, check_and_store_alert
+from collectors import AGGREGATED_TIERS, COLLECTOR_TIERS, COUNTER_FIELDS, SNAPSHOT_ONLY_TYPES
+from coordination import CollectorLock, SnapshotMirror
+from current import encoded_current, use_shared_body
+from serialization import dumps
+from shared_snapshot import SegmentReader, SegmentWriter
+from sampling import SampleAggregator
+from sketch import SketchAggregator
+from forecast import get_forecast
+from notify import notifier
+from recorder import recorder
+from rules import Alert, rule_engine
+import instrumentation
+from snapshot import snapshot
+from instrumentation import instrument, timed
+
+logger = logging.getLogger(__name__)
+
+
+def _store_and_notify(alerts: list, record: bool = True):
+    """
+    Store alerts and queue the ones not already stored in the last hour for notification.
+
+    With ``record``, alerts that start firing get a flight recording.
+    """
+    stored, started = [], []
+    for alert in alerts:
+        alert_id = check_and_store_alert(alert.level, alert.metric, alert.message)
+        if alert_id:
+            stored.append(alert)
+            if alert.transition:
+                started.append(alert_id)
+    if record and started:
+        recorder.trigger(started)
+    if stored:
+        notifier.submit(stored)
+
+
+def _evaluate_rules(published: dict):
+    """Evaluate the alert rules of the types just collected and store what fires."""
+    with timed('scheduler', 'evaluate_rules'):
+        alerts = rule_engine.evaluate(published)
+    _store_and_notify(alerts)
+
+
+def _check_forecast_alerts(forecast: dict):
+    """Alert on mounts projected to fill soon and SMART counters that keep growing."""
+    t = Config.get_thresholds()['disk_days_to_full']
+    alerts = []
+
+    for mount, disk in forecast['disk'].items():
+        days = disk['days_to_full']
+        if days is None:
+            continue
+        if days <= t['critical']:
+            level = 'critical'
+        elif days <= t['warning']:
+            level = 'warning'
+        else:
+            continue
+        alerts.append(Alert(level, f'disk_forecast:{mount}',
+            f'Disk {mount} projected full in {days:.1f} days at {disk["used_gb_per_day"]} GB/day', True))
+
+    for device, trends in forecast['smart'].items():
+        for name, trend in trends.items():
+            if trend.get('growing'):
+                alerts.append(Alert('warning', f'smart_trend:{device}:{name}',
+                    f'{device} {name} rising {trend["per_day"]:g}/day (now {trend["value"]:g})', True))
+
+    # Trends span days; a few minutes of samples would not explain them
+    _store_and_notify(alerts, record=False)
+
+
+sampler = SampleAggregator(COUNTER_FIELDS)
+sketcher = SketchAggregator()
+
+# A tier still being collected (e.g. by the warm-up run) is skipped by the
+# scheduler rather than collected concurrently
+_tier_locks = {tier: threading.Lock() for tier in COLLECTOR_TIERS}
+
+
+def collect_tier(tier: str):
+    """Run every collector in a sampling tier.
+
+    Fast- and medium-tier samples are folded into the in-memory aggregator;
+    slow-tier samples are stored as they are collected. Every sample is checked against the
+    alert rules of its type as it is collected, so a spike between fast-tier
+    flushes still alerts.
+    """
+    lock = _tier_locks[tier]
+    if not lock.acquire(blocking=False):
+        instrumentation.increment('scheduler_skipped', f'collect_{tier}')
+        return
+    try:
+        with timed('scheduler', f'collect_{tier}'):
+            _collect_tier(tier)
+    finally:
+        lock.release()
+
+
+def _collect_tier(tier: str):
+    published = {}
+    for metric_type, collector in COLLECTOR_TIERS[tier]:
+        try:
+            with timed('collector', metric_type):
+                data = collector()
+        except Exception as e:
+            logger.error(f"Error collecting {metric_type} metrics: {e}")
+            continue
+
+        snapshot.publish(metric_type, data)
+        published[metric_type] = data
+
+        if metric_type in SNAPSHOT_ONLY_TYPES:
+            continue
+        if metric_type in Config.SKETCH_METRIC_TYPES:
+            sketcher.add(metric_type, data)
+        if tier in AGGREGATED_TIERS:
+            sampler.add(metric_type, data)
+            continue
+
+        try:
+            store_metrics(metric_type, data)
+        except Exception as e:
+            logger.error(f"Error storing {metric_type} metrics: {e}")
+
+    # Web workers that do not collect read the snapshot from the shared segment
+    if published:
+        try:
+            _share_snapshot()
+        except Exception as e:
+            logger.error(f"Error publishing {tier} snapshot: {e}")
+        try:
+            _evaluate_rules(published)
+        except Exception as e:
+            logger.error(f"Error evaluating alert rules: {e}")
+
+
+def _share_snapshot():
+    _, _, updated = snapshot.read()
+    with timed('scheduler', 'share_snapshot'):
+        segment_writer.publish(encoded_current(), dumps(updated))
+
+
+@instrument('scheduler')
+def flush_samples():
+    """Store aggregated fast- and medium-tier samples and sketches, and check the forecasts."""
+    aggregated = sampler.flush()
+
+    for metric_type, data in aggregated.items():
+        try:
+            store_metrics(metric_type, data)
+        except Exception as e:
+            logger.error(f"Error storing {metric_type} metrics: {e}")
+    try:
+        store_sketches(sketcher.flush())
+    except Exception as e:
+        logger.error(f"Error storing sketches: {e}")
+
+    try:
+        _check_forecast_alerts(get_forecast())
+    except Exception as e:
+        logger.error(f"Error checking forecasts: {e}")
+
+
+@instrument('scheduler')
+def collect_all_metrics():
+    """Collect every tier once and flush the aggregated samples."""
+    logger.debug("Collecting metrics...")
+
+    for tier in COLLECTOR_TIERS:
+        collect_tier(tier)
+    flush_samples()
+
+    logger.debug("Metrics collection complete")
+
+
+@instrument('scheduler')
+def daily_cleanup():
+    """Run daily archiving and database cleanup."""
+    logger.info("Running daily cleanup...")
+    archive_old_data(Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_RETENTION_DAYS)
+    cleanup_old_data(Config.RETENTION_DAYS, Config.SKETCH_RETENTION_DAYS)
+
+
+_SCHEDULER_EVENT_NAMES = {
+    EVENT_JOB_MISSED: 'missed',
+    EVENT_JOB_MAX_INSTANCES: 'max_instances',
+    EVENT_JOB_ERROR: 'error',
+}
+
+
+def _record_scheduler_event(event):
+    """Count missed, skipped and failed scheduler runs per job."""
+    kind = _SCHEDULER_EVENT_NAMES.get(event.code, 'other')
+    instrumentation.increment(f'scheduler_{kind}', event.job_id)
+
+
+def start_scheduler():
+    """Start the background scheduler for metric collection."""
+    scheduler = BackgroundScheduler()
+
+    # Collect each sampling tier at its own interval
+    tier_intervals = {
+        'fast': Config.FAST_INTERVAL,
+        'medium': Config.MEDIUM_INTERVAL,
+        'slow': Config.SLOW_INTERVAL,
+    }
+    for tier, seconds in tier_intervals.items():
+        scheduler.add_job(
+            collect_tier,
+            'interval',
+            args=[tier],
+            seconds=seconds,
+            id=f'collect_{tier}',
+            replace_existing=True
+        )
+
+    # Flush aggregated fast- and medium-tier samples at the storage interval
+    scheduler.add_job(
+        flush_samples,
+        'interval',
+        seconds=Config.COLLECTION_INTERVAL,
+        id='flush_samples',
+        replace_existing=True
+    )
+
+    # Daily cleanup at 3 AM
+    scheduler.add_job(
+        daily_cleanup,
+        'cron',
+        hour=3,
+        id='daily_cleanup',
+        replace_existing=True
+    )
+
+    scheduler.add_listener(
+        _record_scheduler_event,
+        EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_ERROR
+    )
+
+    scheduler.start()
+
+    return scheduler
+
+
+collector_lock = CollectorLock(Config.COLLECTOR_LOCK_PATH)
+segment_writer = SegmentWriter(Config.SNAPSHOT_SEGMENT_PATH)
+segment_reader = SegmentReader(Config.SNAPSHOT_SEGMENT_PATH)
+mirror = SnapshotMirror(snapshot, segment_reader.load_since, Config.SNAPSHOT_POLL_SECONDS)
+scheduler = None
+_role = None
+_stopping = threading.Event()
+
+
+def _become_collector():
+    """Take over collection in this process (the collector lock is held)."""
+    global scheduler, _role
+    mirror.stop()
+    use_shared_body(None)
+    _role = 'collector'
+    logger.info(f"Collecting in process {collector_lock.pid}")
+    scheduler = start_scheduler()
+    atexit.register(stop_collection)
+    recorder.start()
+    # The first full collection (smartctl, docker stats) runs on the
+    # scheduler so startup does not wait for it; fast tiers publish first
+    scheduler.add_job(collect_all_metrics, id='warm_up')
+
+
+def _contend_for_lock():
+    """Follower loop: take over collection if the current collector exits."""
+    while not collector_lock.try_acquire():
+        if _stopping.wait(Config.COLLECTOR_LOCK_RETRY_SECONDS):
+            return
+    _become_collector()
+
+
+def start_collection(role: str = None) -> str:
+    """
+    Start collecting, or mirroring the collector's snapshot, per ``role``.
+
+    auto:      collect if the collector lock can be taken, otherwise mirror
+               and take over if the collector exits
+    web:       only mirror; a separate collector process owns collection
+    collector: block until the lock is free, then collect
+
+    Returns the role this process ended up in ('collector' or 'follower').
+    """
+    global _role
+    role = role or Config.COLLECTOR_ROLE
+    init_database()
+
+    if role == 'collector':
+        collector_lock.acquire()
+        _become_collector()
+    elif role != 'web' and collector_lock.try_acquire():
+        _become_collector()
+    else:
+        _role = 'follower'
+        use_shared_body(segment_reader.current_body)
+        mirror.start()
+        if role != 'web':
+            threading.Thread(target=_contend_for_lock, name='collector-lock', daemon=True).start()
+        logger.info("Serving the snapshot published by the collector process")
+    return _role
+
+
+def current_role():
+    """'collector', 'follower', or None before start_collection()."""
+    return _role
+
+
+def stop_collection():
+    """Stop the scheduler or the snapshot mirror, whichever this process runs.
+
+    Also registered with atexit by the collector; safe to call more than once.
+    """
+    atexit.unregister(stop_collection)
+    _stopping.set()
+    mirror.stop()
+    notifier.stop()
+    recorder.stop()
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
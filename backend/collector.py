@@ -0,0 +1,34 @@
+"""Standalone collector process.
+
+Owns metric collection so web workers can run with COLLECTOR_ROLE=web and
+only serve. Usage: python collector.py
+"""
+
+import logging
+import signal
+import threading
+
+from config import Config
+from collection import start_collection, stop_collection
+
+logging.basicConfig(
+    level=getattr(logging, Config.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    # Blocks until any other collector (e.g. an 'auto' web worker) exits
+    start_collection('collector')
+    logger.info("Collector running")
+    stopped.wait()
+    stop_collection()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,42 @@ from .processes import collect_process_metrics
 from .network import collect_network_metrics
 from .services import collect_services_metrics
 
+# Collectors grouped by sampling tier; shared by the server's scheduler
+# (collection.py) and the headless agent (agent.py)
+COLLECTOR_TIERS = {
+    'fast': (
+        ('cpu', collect_cpu_metrics),
+        ('memory', collect_memory_metrics),
+        ('network', collect_network_metrics),
+    ),
+    'medium': (
+        ('disk', collect_disk_metrics),
+        ('docker', collect_docker_metrics),
+        ('processes', collect_process_metrics),
+        ('services', collect_services_metrics),
+    ),
+    'slow': (
+        ('smart', collect_smart_metrics),
+        ('drives', collect_drives_metrics),
+    ),
+}
+
+# Collected into the snapshot only; there is no history for these
+SNAPSHOT_ONLY_TYPES = frozenset({'services'})
+
+# Tiers sampled more often than COLLECTION_INTERVAL: their samples are
+# aggregated in memory and stored as one min/avg/max row per interval.
+# Slow-tier samples are stored as they are taken.
+AGGREGATED_TIERS = frozenset({'fast', 'medium'})
+
+# Counter-like fields (uptimes, restart counts, cumulative traffic) in those
+# tiers' payloads, by leaf name: aggregated rows keep the latest sample's
+# value instead of the window average
+COUNTER_FIELDS = {
+    'cpu': frozenset({'uptime_seconds'}),
+    'docker': frozenset({'restart_count', 'uptime_seconds', 'network_rx_mb', 'network_tx_mb'}),
+}
+
 __all__ = [
     'collect_cpu_metrics',
     'collect_memory_metrics',
@@ -20,4 +56,8 @@ __all__ = [
     'collect_process_metrics',
     'collect_network_metrics',
     'collect_services_metrics',
+    'COLLECTOR_TIERS',
+    'SNAPSHOT_ONLY_TYPES',
+    'AGGREGATED_TIERS',
+    'COUNTER_FIELDS',
 ]
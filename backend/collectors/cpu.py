@@ -3,11 +3,12 @@
 import os
 import logging
 
+from .procfs import PROC_BASE
+
 logger = logging.getLogger(__name__)
 
 # Support both native and Docker-mounted paths
 SYS_BASE = '/host/sys' if os.path.exists('/host/sys') else '/sys'
-PROC_BASE = '/host/proc' if os.path.exists('/host/proc') else '/proc'
 
 
 def collect_cpu_metrics() -> dict:
@@ -1,18 +1,27 @@
 """
 Collector for Docker container metrics.
 """
+import importlib.util
 import logging
 from datetime import datetime
 
-try:
-    import docker
-    DOCKER_AVAILABLE = True
-except ImportError:
-    DOCKER_AVAILABLE = False
+# The SDK (and requests/urllib3 behind it) is imported on first collection
+# rather than at startup; only check here that it is installed.
+DOCKER_AVAILABLE = importlib.util.find_spec('docker') is not None
+docker = None
 
 logger = logging.getLogger(__name__)
 
 
+def _docker_sdk():
+    """Import the Docker SDK on first use."""
+    global docker
+    if docker is None:
+        import docker as sdk
+        docker = sdk
+    return docker
+
+
 def collect_docker_metrics() -> dict:
     """
     Collect comprehensive Docker container metrics.
@@ -23,10 +32,11 @@ def collect_docker_metrics() -> dict:
     if not DOCKER_AVAILABLE:
         return {'error': 'Docker SDK not installed'}
 
+    sdk = _docker_sdk()
     try:
-        client = docker.from_env(timeout=10)
+        client = sdk.from_env(timeout=10)
         client.ping()
-    except docker.errors.DockerException as e:
+    except sdk.errors.DockerException as e:
         logger.warning(f"Docker daemon unavailable: {e}")
         return {'error': 'Docker daemon unavailable'}
     except Exception as e:
@@ -1,12 +1,10 @@
 """Memory usage metrics collector."""
 
-import os
 import logging
 
-logger = logging.getLogger(__name__)
+from .procfs import PROC_BASE
 
-# Support both native and Docker-mounted paths
-PROC_BASE = '/host/proc' if os.path.exists('/host/proc') else '/proc'
+logger = logging.getLogger(__name__)
 
 
 def collect_memory_metrics() -> dict:
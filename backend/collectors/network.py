@@ -1,44 +1,22 @@
 """Network I/O rate metrics collector."""
 
-import os
 import time
 import logging
 
-logger = logging.getLogger(__name__)
-
-PROC_BASE = '/host/proc' if os.path.exists('/host/proc') else '/proc'
+from .procfs import read_net_dev
 
-_SKIP_IFACES = frozenset({'lo'})
-_SKIP_PREFIXES = ('docker', 'br-', 'veth', 'virbr', 'dummy', 'tunl', 'sit')
+logger = logging.getLogger(__name__)
 
 _prev_bytes: dict = {}
 _prev_time: float = 0.0
 
 
-def _read_net_dev() -> dict:
-    path = f'{PROC_BASE}/net/dev'
-    stats = {}
-    try:
-        with open(path, 'r') as f:
-            for line in f.readlines()[2:]:
-                parts = line.split()
-                if len(parts) < 10:
-                    continue
-                iface = parts[0].rstrip(':')
-                if iface in _SKIP_IFACES or any(iface.startswith(p) for p in _SKIP_PREFIXES):
-                    continue
-                stats[iface] = (int(parts[1]), int(parts[9]))  # rx_bytes, tx_bytes
-    except Exception as e:
-        logger.error(f"Error reading {path}: {e}")
-    return stats
-
-
 def collect_network_metrics() -> dict:
     """Return per-interface and aggregate TX/RX rates in MB/s."""
     global _prev_bytes, _prev_time
 
     now = time.monotonic()
-    current = _read_net_dev()
+    current = read_net_dev()
 
     if not current:
         return {'error': 'no network interfaces found'}
@@ -3,9 +3,9 @@
 import os
 import logging
 
-logger = logging.getLogger(__name__)
+from .procfs import PROC_BASE
 
-PROC_BASE = '/host/proc' if os.path.exists('/host/proc') else '/proc'
+logger = logging.getLogger(__name__)
 
 
 def collect_process_metrics() -> dict:
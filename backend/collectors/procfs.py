@@ -0,0 +1,74 @@
+"""Shared /proc location and the readers used by more than one module."""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Support both native and Docker-mounted paths
+PROC_BASE = '/host/proc' if os.path.exists('/host/proc') else '/proc'
+
+_SKIP_IFACES = frozenset({'lo'})
+_SKIP_PREFIXES = ('docker', 'br-', 'veth', 'virbr', 'dummy', 'tunl', 'sit')
+
+
+def read_net_dev() -> dict:
+    """{interface: (rx_bytes, tx_bytes)} for physical interfaces, from /proc/net/dev."""
+    path = f'{PROC_BASE}/net/dev'
+    stats = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f.readlines()[2:]:
+                parts = line.split()
+                if len(parts) < 10:
+                    continue
+                iface = parts[0].rstrip(':')
+                if iface in _SKIP_IFACES or any(iface.startswith(p) for p in _SKIP_PREFIXES):
+                    continue
+                stats[iface] = (int(parts[1]), int(parts[9]))  # rx_bytes, tx_bytes
+    except Exception as e:
+        logger.error(f"Error reading {path}: {e}")
+    return stats
+
+
+def read_cpu_times() -> tuple:
+    """(total, idle, iowait) jiffies from the aggregate line of /proc/stat."""
+    with open(f'{PROC_BASE}/stat', 'r') as f:
+        fields = [int(v) for v in f.readline().split()[1:9]]
+    return sum(fields), fields[3] + fields[4], fields[4]
+
+
+def read_meminfo(keys) -> dict:
+    """The given /proc/meminfo fields, in kB; stops reading once all are found."""
+    wanted = set(keys)
+    meminfo = {}
+    with open(f'{PROC_BASE}/meminfo', 'r') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in wanted:
+                meminfo[key] = int(rest.split()[0])
+                if len(meminfo) == len(wanted):
+                    break
+    return meminfo
+
+
+def read_process_stats() -> dict:
+    """{pid: (name, utime + stime jiffies, RSS pages)} from each /proc/<pid>/stat."""
+    processes = {}
+    for entry in os.listdir(PROC_BASE):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'{PROC_BASE}/{entry}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the ')' that closes the name start at state (field 3):
+        # utime and stime are fields 14 and 15, rss is field 24
+        lparen, rparen = stat.find('('), stat.rfind(')')
+        fields = stat[rparen + 2:].split()
+        try:
+            processes[int(entry)] = (stat[lparen + 1:rparen], int(fields[11]) + int(fields[12]), int(fields[21]))
+        except (IndexError, ValueError):
+            continue
+    return processes
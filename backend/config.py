@@ -1,6 +1,24 @@
 """Configuration settings for server monitor."""
 
 import os
+import socket
+import zlib
+
+
+def _parse_tolerances(spec: str, defaults: dict) -> dict:
+    """Merge 'type:field=tolerance,...' overrides into the default tolerances."""
+    tolerances = {t: dict(fields) for t, fields in defaults.items()}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item or ':' not in item or '=' not in item:
+            continue
+        metric_type, rest = item.split(':', 1)
+        field, value = rest.split('=', 1)
+        try:
+            tolerances.setdefault(metric_type.strip(), {})[field.strip()] = float(value)
+        except ValueError:
+            continue
+    return tolerances
 
 
 class Config:
@@ -9,17 +27,130 @@ class Config:
     # Data collection interval in seconds (default: 5 minutes)
     COLLECTION_INTERVAL = int(os.environ.get('COLLECTION_INTERVAL', 300))
 
+    # Per-collector sampling tiers in seconds. Fast-tier (cpu, memory,
+    # network) and medium-tier (disk, docker, processes) samples are
+    # aggregated in memory and flushed as min/avg/max every
+    # COLLECTION_INTERVAL; slow-tier (smart, drives) samples are stored
+    # directly.
+    FAST_INTERVAL = int(os.environ.get('FAST_INTERVAL', 5))
+    MEDIUM_INTERVAL = int(os.environ.get('MEDIUM_INTERVAL', 60))
+    SLOW_INTERVAL = int(os.environ.get('SLOW_INTERVAL', 900))
+
     # Data retention period in days
     RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 90))
 
+    # Change detection: rows for these types that match the previous stored
+    # payload (within the per-field tolerances below) are written as
+    # "same as previous" markers. A full row is forced after DEDUP_MAX_AGE.
+    DEDUP_METRIC_TYPES = frozenset(
+        t.strip() for t in os.environ.get('DEDUP_METRIC_TYPES', 'smart,drives,docker,disk').split(',') if t.strip()
+    )
+    DEDUP_MAX_AGE_SECONDS = int(os.environ.get('DEDUP_MAX_AGE', 6 * 3600))
+
+    # Absolute per-field tolerances, matched against the field name or a
+    # dotted suffix of its path (e.g. 'Power_On_Hours.raw'). Override or
+    # extend with CHANGE_TOLERANCES='disk:used_gb=0.1,docker:cpu_percent=5'.
+    CHANGE_TOLERANCES = _parse_tolerances(os.environ.get('CHANGE_TOLERANCES', ''), {
+        'disk': {'used_gb': 0.05, 'available_gb': 0.05},
+        'smart': {'temperature_celsius': 2, 'power_on_hours': 24, 'Power_On_Hours.raw': 24,
+                  'Temperature_Celsius.raw': 2, 'Temperature_Celsius.value': 2},
+        'docker': {'cpu_percent': 2.0, 'memory_mb': 16, 'memory_percent': 1.0,
+                   'network_rx_mb': 16, 'network_tx_mb': 16, 'uptime_seconds': 3600},
+    })
+
+    # Payload compression for stored rows: none, zlib or zstd (needs the
+    # zstandard package; falls back to zlib). Applied to the listed types.
+    STORAGE_COMPRESSION = os.environ.get('STORAGE_COMPRESSION', 'zlib')
+    COMPRESS_METRIC_TYPES = frozenset(
+        t.strip() for t in os.environ.get('COMPRESS_METRIC_TYPES', 'docker,processes').split(',') if t.strip()
+    )
+
     # Database path
     DB_PATH = os.environ.get('MONITOR_DB_PATH', '/app/data/metrics.db')
 
+    # Archive tier: whole days older than ARCHIVE_AFTER_DAYS move out of the
+    # database into compressed per-day segment files that history reads
+    # still see (0 disables). Archived days are kept ARCHIVE_RETENTION_DAYS
+    # (0 = forever); RETENTION_DAYS then only bounds alerts and, with
+    # archiving off, metrics.
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 14))
+    ARCHIVE_RETENTION_DAYS = int(os.environ.get('ARCHIVE_RETENTION_DAYS', 730))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(os.path.dirname(DB_PATH), 'archive'))
+
+    # Which process collects. 'auto': every web worker competes for the lock
+    # file and only its holder collects, the rest serve the snapshot it
+    # shares (and take over if the holder exits). 'web': never collect;
+    # run `python collector.py` separately.
+    COLLECTOR_ROLE = os.environ.get('COLLECTOR_ROLE', 'auto')
+    COLLECTOR_LOCK_PATH = os.environ.get(
+        'COLLECTOR_LOCK_PATH', os.path.join(os.path.dirname(DB_PATH), 'collector.lock')
+    )
+    COLLECTOR_LOCK_RETRY_SECONDS = int(os.environ.get('COLLECTOR_LOCK_RETRY', 30))
+
+    # Memory-mapped file the collector shares the snapshot through. Defaults
+    # to tmpfs, keyed by database so separate instances do not collide; put
+    # it on the data volume when the collector runs in another container.
+    SNAPSHOT_SEGMENT_PATH = os.environ.get('SNAPSHOT_SEGMENT', (
+        f'/dev/shm/server-monitor-{zlib.crc32(DB_PATH.encode()):08x}.snapshot'
+        if os.path.isdir('/dev/shm') else os.path.join(os.path.dirname(DB_PATH), 'snapshot.seg')
+    ))
+    SNAPSHOT_POLL_SECONDS = float(os.environ.get('SNAPSHOT_POLL', 1))
+
+    # Fleet mode. Agents (agent.py) push batches to AGGREGATOR_URL every
+    # AGENT_PUSH_INTERVAL seconds under AGENT_HOST, spooling them to
+    # AGENT_SPOOL_DIR (at most AGENT_SPOOL_MAX_MB) while it is unreachable.
+    # The central instance accepts them on POST /api/ingest only when
+    # INGEST_TOKEN is set; agents send the same token.
+    AGGREGATOR_URL = os.environ.get('AGGREGATOR_URL', '').rstrip('/')
+    AGENT_HOST = os.environ.get('AGENT_HOST', socket.gethostname())
+    AGENT_PUSH_INTERVAL = float(os.environ.get('AGENT_PUSH_INTERVAL', 10))
+    AGENT_SPOOL_DIR = os.environ.get('AGENT_SPOOL_DIR', os.path.join(os.path.dirname(DB_PATH), 'spool'))
+    AGENT_SPOOL_MAX_MB = int(os.environ.get('AGENT_SPOOL_MAX_MB', 100))
+    INGEST_TOKEN = os.environ.get('INGEST_TOKEN', '')
+
+    # Quantile sketches: every numeric field of these types gets a sketch
+    # per COLLECTION_INTERVAL bucket, for percentiles over any window
+    # (/api/history?agg=p95). Kept SKETCH_RETENTION_DAYS (0 = forever),
+    # by default as long as archived history.
+    SKETCH_METRIC_TYPES = frozenset(
+        t.strip() for t in os.environ.get('SKETCH_METRIC_TYPES', 'cpu,memory,network,docker').split(',') if t.strip()
+    )
+    SKETCH_RETENTION_DAYS = int(os.environ.get(
+        'SKETCH_RETENTION_DAYS', ARCHIVE_RETENTION_DAYS if ARCHIVE_AFTER_DAYS else RETENTION_DAYS
+    ))
+
+    # Query result cache: history windows, alerts and stats are kept in
+    # memory (LRU, at most QUERY_CACHE_ENTRIES results and QUERY_CACHE_MB)
+    # and updated as samples are stored; 0 disables it
+    QUERY_CACHE_ENTRIES = int(os.environ.get('QUERY_CACHE_ENTRIES', 256))
+    QUERY_CACHE_MB = int(os.environ.get('QUERY_CACHE_MB', 64))
+
+    # Forecasts (/api/forecast): disk free space and SMART counters are
+    # fitted with a line that weighs samples by age, halving every
+    # FORECAST_HALF_LIFE_HOURS, and refreshed from new samples at most every
+    # FORECAST_REFRESH seconds. A mount projected to fill within
+    # FORECAST_DISK_WARNING_DAYS / FORECAST_DISK_CRITICAL_DAYS raises an
+    # alert, as does a growing reallocated, pending or uncorrectable count.
+    FORECAST_HALF_LIFE_HOURS = float(os.environ.get('FORECAST_HALF_LIFE_HOURS', 72))
+    FORECAST_REFRESH_SECONDS = float(os.environ.get('FORECAST_REFRESH', 60))
+    FORECAST_DISK_WARNING_DAYS = float(os.environ.get('FORECAST_DISK_WARNING_DAYS', 7))
+    FORECAST_DISK_CRITICAL_DAYS = float(os.environ.get('FORECAST_DISK_CRITICAL_DAYS', 1))
+
+    # JSON backend for API responses: 'auto' uses orjson when installed,
+    # 'json' forces the standard library
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+
     # Web server settings
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 8080))
     DEBUG = os.environ.get('DEBUG', 'false').lower() == 'true'
 
+    # ASGI serving mode (asgi.py): threads for database reads and for
+    # routes still served by the Flask app, and the SSE keepalive period
+    DB_READ_THREADS = int(os.environ.get('DB_READ_THREADS', 4))
+    WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 4))
+    SSE_KEEPALIVE_SECONDS = int(os.environ.get('SSE_KEEPALIVE', 15))
+
     # Alert thresholds
     TEMP_WARNING_CELSIUS = int(os.environ.get('TEMP_WARNING', 70))
     TEMP_CRITICAL_CELSIUS = int(os.environ.get('TEMP_CRITICAL', 85))
@@ -29,6 +160,53 @@ class Config:
     MEMORY_CRITICAL_PERCENT = int(os.environ.get('MEMORY_CRITICAL', 95))
     LOAD_WARNING_MULTIPLIER = float(os.environ.get('LOAD_WARNING', 1.0))
     LOAD_CRITICAL_MULTIPLIER = float(os.environ.get('LOAD_CRITICAL', 2.0))
+    SWAP_WARNING_PERCENT = int(os.environ.get('SWAP_WARNING', 50))
+    SWAP_CRITICAL_PERCENT = int(os.environ.get('SWAP_CRITICAL', 80))
+    SERVICE_DOWN_SECONDS = int(os.environ.get('SERVICE_DOWN_SECONDS', 60))
+    # Per-interface rx or tx rate held for NETWORK_SATURATION_SECONDS (0 disables)
+    NETWORK_WARNING_MB_PER_SEC = float(os.environ.get('NETWORK_WARNING', 100))
+    NETWORK_SATURATION_SECONDS = int(os.environ.get('NETWORK_SATURATION_SECONDS', 60))
+
+    # Alert rules (rules.py): the thresholds above become built-in rules;
+    # a JSON file of rules adds to them or replaces them by name
+    ALERT_RULES_FILE = os.environ.get('ALERT_RULES_FILE', '')
+
+    # Notifications (notify.py): every newly stored alert at or above
+    # NOTIFY_MIN_LEVEL goes to each configured target; alerts stored in the
+    # same collection pass are sent as one message. A target is enabled by
+    # setting its address: webhook URL, SMTP host plus recipients, or script.
+    NOTIFY_WEBHOOK_URL = os.environ.get('NOTIFY_WEBHOOK_URL', '')
+    NOTIFY_SMTP_HOST = os.environ.get('NOTIFY_SMTP_HOST', '')
+    NOTIFY_SMTP_PORT = int(os.environ.get('NOTIFY_SMTP_PORT', 25))
+    NOTIFY_SMTP_STARTTLS = os.environ.get('NOTIFY_SMTP_STARTTLS', 'false').lower() == 'true'
+    NOTIFY_SMTP_USER = os.environ.get('NOTIFY_SMTP_USER', '')
+    NOTIFY_SMTP_PASSWORD = os.environ.get('NOTIFY_SMTP_PASSWORD', '')
+    NOTIFY_EMAIL_FROM = os.environ.get('NOTIFY_EMAIL_FROM', f'server-monitor@{socket.gethostname()}')
+    NOTIFY_EMAIL_TO = [
+        a.strip() for a in os.environ.get('NOTIFY_EMAIL_TO', '').split(',') if a.strip()
+    ]
+    NOTIFY_SCRIPT = os.environ.get('NOTIFY_SCRIPT', '')
+    NOTIFY_MIN_LEVEL = os.environ.get('NOTIFY_MIN_LEVEL', 'warning').lower()
+    # Per target: batches queued while it is unreachable, messages per
+    # rolling hour, and retries of a failed send (backing off from
+    # NOTIFY_RETRY_SECONDS, doubling each time)
+    NOTIFY_QUEUE_SIZE = int(os.environ.get('NOTIFY_QUEUE_SIZE', 100))
+    NOTIFY_MAX_PER_HOUR = int(os.environ.get('NOTIFY_MAX_PER_HOUR', 20))
+    NOTIFY_RETRIES = int(os.environ.get('NOTIFY_RETRIES', 5))
+    NOTIFY_RETRY_SECONDS = float(os.environ.get('NOTIFY_RETRY_SECONDS', 5))
+    NOTIFY_TIMEOUT_SECONDS = float(os.environ.get('NOTIFY_TIMEOUT', 10))
+
+    # Flight recorder (recorder.py): cpu, memory, network and the busiest
+    # and largest RECORDER_PROCESSES processes, sampled every
+    # RECORDER_INTERVAL seconds into a ring of the last RECORDER_WINDOW
+    # seconds (0 disables). When an alert starts firing, the ring is frozen
+    # and sampled every RECORDER_BURST_INTERVAL for RECORDER_BURST seconds;
+    # both are stored with the alert.
+    RECORDER_INTERVAL_SECONDS = float(os.environ.get('RECORDER_INTERVAL', 1))
+    RECORDER_WINDOW_SECONDS = int(os.environ.get('RECORDER_WINDOW', 300))
+    RECORDER_BURST_SECONDS = float(os.environ.get('RECORDER_BURST', 20))
+    RECORDER_BURST_INTERVAL_SECONDS = float(os.environ.get('RECORDER_BURST_INTERVAL', 0.25))
+    RECORDER_PROCESSES = int(os.environ.get('RECORDER_PROCESSES', 8))
 
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
@@ -52,5 +230,13 @@ class Config:
             'load': {
                 'warning': cls.LOAD_WARNING_MULTIPLIER,
                 'critical': cls.LOAD_CRITICAL_MULTIPLIER
+            },
+            'swap': {
+                'warning': cls.SWAP_WARNING_PERCENT,
+                'critical': cls.SWAP_CRITICAL_PERCENT
+            },
+            'disk_days_to_full': {
+                'warning': cls.FORECAST_DISK_WARNING_DAYS,
+                'critical': cls.FORECAST_DISK_CRITICAL_DAYS
             }
         }
@@ -0,0 +1,105 @@
+"""Single-collector coordination between processes sharing one database."""
+
+import fcntl
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CollectorLock:
+    """
+    Exclusive advisory lock on a file, held for the life of the process.
+
+    The kernel drops the lock when its holder exits, however it exits, so
+    a waiting process can take over without stale-lock cleanup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = None
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        """Take the lock without blocking; True if this process now holds it."""
+        return self._lock(fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def acquire(self):
+        """Block until the lock is free, then take it."""
+        self._lock(fcntl.LOCK_EX)
+
+    def _lock(self, flags: int) -> bool:
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        f = open(self.path, 'a+')
+        try:
+            fcntl.flock(f.fileno(), flags)
+        except BlockingIOError:
+            f.close()
+            return False
+        # Holder's pid, for operators; the lock itself is the flock
+        f.seek(0)
+        f.truncate()
+        f.write(f'{os.getpid()}\n')
+        f.flush()
+        self._file = f
+        self.pid = os.getpid()
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+            self.pid = None
+
+
+class SnapshotMirror:
+    """
+    Keep a local snapshot in step with the one the collector publishes.
+
+    Polls ``loader(since)`` every ``interval`` seconds for samples updated
+    after ``since`` and merges them, so reads stay in-process and listeners
+    (the SSE broadcaster) fire as in the collecting process.
+    """
+
+    def __init__(self, target, loader, interval: float):
+        self.target = target
+        self.loader = loader
+        self.interval = interval
+        self.since = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='snapshot-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def refresh(self) -> int:
+        """Merge samples published since the last refresh; returns how many."""
+        try:
+            rows = self.loader(self.since)
+        except Exception as e:
+            logger.error(f"Error reading published snapshot: {e}")
+            return 0
+        if rows:
+            self.target.merge(
+                {metric_type: data for metric_type, _, data in rows},
+                {metric_type: updated for metric_type, updated, _ in rows}
+            )
+            self.since = max(updated for _, updated, _ in rows)
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
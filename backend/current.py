@@ -0,0 +1,76 @@
+"""The /api/current response body, encoded once per snapshot change."""
+
+from config import Config
+from serialization import Raw, dumps, splice
+from snapshot import snapshot
+
+CURRENT_METRIC_TYPES = ('cpu', 'memory', 'disk', 'smart', 'drives', 'docker', 'processes', 'network', 'services')
+
+_WARMING_UP = Raw(b'{"warming_up": true}')
+
+# metric_type -> (sample, its JSON); a sample is encoded once however
+# many snapshot versions it survives
+_fragments = {}
+# (snapshot version, body), swapped in one assignment so a reader never
+# pairs one version with another's body
+_cache = (-1, b'')
+_shared_body = None
+
+
+def use_shared_body(source):
+    """Serve the body from ``source()`` (e.g. a shared segment) when it returns bytes.
+
+    Pass None to go back to encoding the local snapshot.
+    """
+    global _shared_body
+    _shared_body = source
+
+
+def warming_up(samples: dict = None) -> list:
+    """Metric types with no sample collected (or mirrored) yet."""
+    if samples is None:
+        return [metric_type for metric_type in CURRENT_METRIC_TYPES if snapshot.get(metric_type) is None]
+    return [metric_type for metric_type in CURRENT_METRIC_TYPES if metric_type not in samples]
+
+
+def _fragment(metric_type: str, data) -> Raw:
+    cached = _fragments.get(metric_type)
+    if cached is not None and cached[0] is data:
+        return cached[1]
+    encoded = Raw(dumps(data))
+    _fragments[metric_type] = (data, encoded)
+    return encoded
+
+
+def encode_current(samples: dict) -> bytes:
+    """
+    Encode the /api/current payload for ``samples``.
+
+    Types without a sample are ``{"warming_up": true}`` and listed under
+    ``warming_up``; thresholds ride along for the dashboard.
+    """
+    fields = {}
+    for metric_type in CURRENT_METRIC_TYPES:
+        data = samples.get(metric_type)
+        fields[metric_type] = _WARMING_UP if data is None else _fragment(metric_type, data)
+    fields['warming_up'] = warming_up(samples)
+    fields['thresholds'] = Config.get_thresholds()
+    return splice(fields)
+
+
+def encoded_current() -> bytes:
+    """/api/current body, re-encoded only when the snapshot changes."""
+    global _cache
+    if _shared_body is not None:
+        body = _shared_body()
+        if body is not None:
+            return body
+    cached = _cache
+    if cached[0] == snapshot.version:
+        return cached[1]
+    version, samples, _ = snapshot.read()
+    body = encode_current(samples)
+    # A slower caller must not replace a newer body with an older one
+    if version >= _cache[0]:
+        _cache = (version, body)
+    return body
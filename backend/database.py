@@ -1,40 +1,243 @@
 """SQLite database module for storing historical metrics."""
 
+import heapq
 import sqlite3
 import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 from typing import Optional
 
+from config import Config
+from archive import FieldRanges, segment_path, write_segment, load_segment, remove_segment
+from change_detection import ChangeDetector, SAME_AS_PREVIOUS
+from codec import encode, encode_raw, decode, decode_raw, resolve_encoding, ENCODING_JSON
+from serialization import dumps, loads
+from instrumentation import instrument, increment, observe, timed
+from querycache import HistoryWindow, QueryCache
+from sketch import QuantileSketch
+
 logger = logging.getLogger(__name__)
 
 DB_PATH = os.environ.get('MONITOR_DB_PATH', '/app/data/metrics.db')
 
+change_detector = ChangeDetector(
+    Config.DEDUP_METRIC_TYPES,
+    Config.CHANGE_TOLERANCES,
+    Config.DEDUP_MAX_AGE_SECONDS
+)
+
+_compressed_encoding = resolve_encoding(Config.STORAGE_COMPRESSION)
+
+# Host column value of rows collected by this instance; rows pushed by
+# agents (agent.py, ingest.py) carry the agent's host name
+LOCAL_HOST = ''
+
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+_END_OF_TIME = '9999-12-31 23:59:59'
+
+# Above every row id, so (timestamp, MAX_ROW_ID) sorts after all rows of that second
+MAX_ROW_ID = 2 ** 63 - 1
+
+
+def _db_time(moment: datetime) -> str:
+    """Format like CURRENT_TIMESTAMP, so text comparisons on the column are exact."""
+    return moment.strftime(_TIMESTAMP_FORMAT)
+
+
+def _window_start(hours: int) -> str:
+    """History windows hold rows strictly newer than this."""
+    return _db_time(datetime.utcnow() - timedelta(hours=hours))
+
+
+# Results of history, alert and stats reads; see querycache.py
+query_cache = QueryCache(Config.QUERY_CACHE_ENTRIES, Config.QUERY_CACHE_MB * 1024 * 1024)
+
+_ALERTS_TAG = 'alerts'
+_STATS_TAG = 'stats'
+
+
+def _series_tag(host: str, metric_type: str) -> tuple:
+    return 'series', host, metric_type
+
+
+# Descriptor the change counter is read through, with the file's (st_dev, st_ino)
+_counter_file = None
+_counter_lock = threading.Lock()
+
+
+def _change_counter() -> int:
+    """
+    SQLite's file change counter (header offset 24).
+
+    Every committed write transaction increments it in rollback-journal
+    mode, whichever process made it, so reading it tells whether cached
+    results are still current without querying the database.
+    """
+    global _counter_file
+    with _counter_lock:
+        try:
+            st = os.stat(DB_PATH)
+        except FileNotFoundError:
+            return 0
+        if _counter_file is None or _counter_file[1] != (st.st_dev, st.st_ino):
+            # Kept open: closing any descriptor of the database file would
+            # release the POSIX locks SQLite holds on it in this process
+            if _counter_file is not None:
+                os.close(_counter_file[0])
+            _counter_file = (os.open(DB_PATH, os.O_RDONLY), (st.st_dev, st.st_ino))
+        return int.from_bytes(os.pread(_counter_file[0], 4, 24), 'big')
+
+
+def _cache_ready() -> bool:
+    """Validate the cache against the database; False when it is disabled."""
+    if not query_cache.enabled:
+        return False
+    query_cache.sync(_change_counter())
+    return True
+
+
+def _cached(cursor, key: tuple, tags: tuple, read, view=None):
+    """
+    ``read(cursor)`` through the cache, or ``view`` of it if given.
+
+    On a miss the result is read with ``cursor``, or on a new connection
+    if it is None, and stored for the next lookup.
+    """
+    result = query_cache.get(key, view)
+    if result is not None:
+        return result
+    token = query_cache.token(tags)
+    if cursor is None:
+        with get_connection() as conn:
+            value = read(conn.cursor())
+    else:
+        value = read(cursor)
+    result = value if view is None else view(value)
+    size = value.size if isinstance(value, HistoryWindow) else len(dumps(value))
+    query_cache.put(key, value, size, tags, token)
+    return result
+
+
+def _read_window(cursor, metric_type: str, hours: int, limit: int, host: str) -> HistoryWindow:
+    since = _window_start(hours)
+    rows, next_page = _metrics_page(cursor, metric_type, since, limit, None, True, host, with_ids=True)
+    return HistoryWindow(hours, limit, since, [(r['timestamp'], r['id'], r['data']) for r in rows],
+                         complete=next_page is None)
+
+
+def _history_key(metric_type: str, hours: int, limit: int, host: str) -> tuple:
+    return 'history', host, metric_type, hours, limit
+
+
+def _page_view(hours: int):
+    """View of a cached window as ``get_metrics_page`` returns its newest page."""
+    def view(window):
+        rows, next_page = window.page(_window_start(hours))
+        return [{'timestamp': timestamp, 'data': data} for timestamp, _, data in rows], next_page
+    return view
+
+
+def _since_view(after: tuple, hours: int, limit: int):
+    """View of a cached window as ``get_metrics_since`` returns it; None unless it holds every newer row."""
+    after = max(after, (_window_start(hours), MAX_ROW_ID))
+
+    def view(window):
+        if not window.covers(after, MAX_ROW_ID):
+            return None
+        rows, more = window.after(after, limit)
+        last = (rows[-1][0], rows[-1][1]) if rows else after
+        return [{'timestamp': timestamp, 'data': data} for timestamp, _, data in rows], last, more
+    return view
+
+
+def _cached_page(cursor, metric_type: str, hours: int, limit: int, host: str) -> tuple:
+    """Raw ``get_metrics_page`` for the newest page of a window, through the cache."""
+    return _cached(
+        cursor, _history_key(metric_type, hours, limit, host), (_series_tag(host, metric_type),),
+        lambda c: _read_window(c, metric_type, hours, limit, host), _page_view(hours)
+    )
+
+
+def _cached_since(metric_type: str, after: tuple, hours: int, limit: int, host: str) -> Optional[tuple]:
+    """Raw ``get_metrics_since`` from a cached window holding every newer row, or None."""
+    return query_cache.find(_series_tag(host, metric_type), _since_view(after, hours, limit))
+
+
+def _cached_dashboard(series: dict, hours: int, limit: int, alerts_limit: int, host: str) -> Optional[dict]:
+    """``get_dashboard`` answered entirely from the cache, or None if any part is not cached."""
+    with query_cache.atomic():
+        history = {}
+        for metric_type, after in series.items():
+            if after is None:
+                page = query_cache.get(_history_key(metric_type, hours, limit, host), _page_view(hours), count=False)
+                if page is None:
+                    return None
+                history[metric_type] = {'data': page[0], 'next_cursor': page[1]}
+            else:
+                delta = query_cache.find(_series_tag(host, metric_type), _since_view(after, hours, limit),
+                                         count=False)
+                if delta is None:
+                    return None
+                history[metric_type] = {'data': delta[0], 'cursor': delta[1], 'more': delta[2]}
+        alerts = query_cache.get(('alerts', alerts_limit), count=False)
+        stats = query_cache.get(('stats',), count=False)
+        if alerts is None or stats is None:
+            return None
+    query_cache.counted(True, len(series) + 2)
+    return {'series': history, 'alerts': alerts, 'stats': dict(stats)}
+
+
+def _cache_stored(counter: int, metric_type: str, timestamp: str, row_id: int, payload):
+    """Extend cached windows of a series with a row this process just stored."""
+    query_cache.wrote(counter)
+    query_cache.update(
+        _series_tag(LOCAL_HOST, metric_type),
+        lambda window: window.size if window.append(timestamp, row_id, payload) else None
+    )
+    query_cache.invalidate(_STATS_TAG)
+
 
 def init_database():
     """Initialize database with required tables and indexes."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        # Serialize concurrent startups so the migration check and ALTER are atomic
+        cursor.execute('BEGIN IMMEDIATE')
 
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS metrics (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                 metric_type TEXT NOT NULL,
-                data TEXT NOT NULL
+                data TEXT NOT NULL,
+                encoding TEXT,
+                host TEXT NOT NULL DEFAULT ''
             )
         ''')
 
+        # Databases created before payload compression or agents lack the columns
+        cursor.execute('PRAGMA table_info(metrics)')
+        columns = {row['name'] for row in cursor.fetchall()}
+        if 'encoding' not in columns:
+            cursor.execute('ALTER TABLE metrics ADD COLUMN encoding TEXT')
+        if 'host' not in columns:
+            cursor.execute("ALTER TABLE metrics ADD COLUMN host TEXT NOT NULL DEFAULT ''")
+
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_metrics_timestamp
             ON metrics(timestamp)
         ''')
 
+        # Every history read filters on type and host; replaces the
+        # (metric_type, timestamp) index of single-host databases
+        cursor.execute('DROP INDEX IF EXISTS idx_metrics_type_timestamp')
         cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_metrics_type_timestamp
-            ON metrics(metric_type, timestamp)
+            CREATE INDEX IF NOT EXISTS idx_metrics_type_host_timestamp
+            ON metrics(metric_type, host, timestamp)
         ''')
 
         cursor.execute('''
@@ -52,6 +255,71 @@ def init_database():
             ON alerts(timestamp)
         ''')
 
+        # Flight recordings (recorder.py); alerts that fire together share
+        # one. Databases created before recordings lack the alerts column
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recordings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                data BLOB NOT NULL,
+                encoding TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('PRAGMA table_info(alerts)')
+        if 'recording_id' not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE alerts ADD COLUMN recording_id INTEGER')
+
+        # Index of archived days; the rows live in segment files (archive.py).
+        # The host column joined the primary key later: rebuild older tables
+        cursor.execute('PRAGMA table_info(archive_segments)')
+        archive_columns = {row['name'] for row in cursor.fetchall()}
+        if archive_columns and 'host' not in archive_columns:
+            cursor.execute('ALTER TABLE archive_segments RENAME TO archive_segments_v1')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_segments (
+                host TEXT NOT NULL DEFAULT '',
+                metric_type TEXT NOT NULL,
+                day TEXT NOT NULL,
+                first_timestamp TEXT NOT NULL,
+                last_timestamp TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                fields TEXT NOT NULL,
+                PRIMARY KEY (host, metric_type, day)
+            )
+        ''')
+        if archive_columns and 'host' not in archive_columns:
+            cursor.execute('''
+                INSERT INTO archive_segments
+                (metric_type, day, first_timestamp, last_timestamp, rows, size, fields)
+                SELECT metric_type, day, first_timestamp, last_timestamp, rows, size, fields
+                FROM archive_segments_v1
+            ''')
+            cursor.execute('DROP TABLE archive_segments_v1')
+
+        # Agents that have pushed to this instance
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS hosts (
+                host TEXT PRIMARY KEY,
+                first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+                samples INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        # Quantile sketches of every numeric field, one row per type and
+        # collection bucket (see sketch.py); ``timestamp`` is the bucket start
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sketches (
+                host TEXT NOT NULL DEFAULT '',
+                metric_type TEXT NOT NULL,
+                timestamp DATETIME NOT NULL,
+                data BLOB NOT NULL,
+                encoding TEXT NOT NULL,
+                PRIMARY KEY (host, metric_type, timestamp)
+            ) WITHOUT ROWID
+        ''')
+
         conn.commit()
         logger.info("Database initialized successfully")
 
@@ -60,84 +328,584 @@ def init_database():
 def get_connection():
     """Context manager for database connections."""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    opened = time.perf_counter()
     conn = sqlite3.connect(DB_PATH, timeout=30)
     conn.row_factory = sqlite3.Row
     try:
         yield conn
     finally:
         conn.close()
+        observe('db', 'connection_hold', time.perf_counter() - opened)
+
+
+def _begin_write(cursor):
+    """Take the write lock up front so waiting for it is timed apart from holding it."""
+    with timed('db', 'write_lock_wait'):
+        cursor.execute('BEGIN IMMEDIATE')
 
 
+@instrument('db')
 def store_metrics(metric_type: str, data: dict):
-    """Store a metric data point."""
+    """Store a metric data point.
+
+    Payloads of change-detected types that match the previous full row
+    within tolerance are stored as a SAME_AS_PREVIOUS marker.
+    """
+    unchanged = change_detector.is_unchanged(metric_type, data)
+    if unchanged:
+        payload, encoding = SAME_AS_PREVIOUS, ENCODING_JSON
+    else:
+        encoding = _compressed_encoding if metric_type in Config.COMPRESS_METRIC_TYPES else ENCODING_JSON
+        payload = encode(data, encoding)
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'INSERT INTO metrics (metric_type, data) VALUES (?, ?)',
-                (metric_type, json.dumps(data))
-            )
-            conn.commit()
+            _begin_write(cursor)
+            counter = _change_counter() if query_cache.enabled else None
+            with timed('db', 'write_lock_hold'):
+                timestamp = _db_time(datetime.utcnow())
+                cursor.execute(
+                    'INSERT INTO metrics (timestamp, metric_type, data, encoding) VALUES (?, ?, ?, ?)',
+                    (timestamp, metric_type, payload, encoding)
+                )
+                row_id = cursor.lastrowid
+                conn.commit()
+            increment('db', 'writes')
+        if counter is not None:
+            _cache_stored(counter, metric_type, timestamp, row_id,
+                          None if unchanged else decode_raw(payload, encoding))
+        if unchanged:
+            increment('db', 'unchanged_markers')
+        else:
+            change_detector.remember(metric_type, data)
     except Exception as e:
         logger.error(f"Error storing metrics: {e}")
         raise
 
 
-def get_metrics(metric_type: str, hours: int = 24, limit: int = 1000) -> list:
-    """Retrieve metrics for a given time period."""
+@instrument('db')
+def get_metrics(metric_type: str, hours: int = 24, limit: int = 1000, raw: bool = False,
+                host: str = LOCAL_HOST) -> list:
+    """Retrieve the newest ``limit`` metrics in the time period, oldest-first.
+
+    With ``raw``, each row's data is its stored JSON as bytes, ready to be
+    spliced into a response without decoding.
+    """
+    return get_metrics_page(metric_type, hours=hours, limit=limit, raw=raw, host=host)[0]
+
+
+@instrument('db')
+def get_metrics_page(metric_type: str, hours: int = 24, limit: int = 1000,
+                     before: Optional[tuple] = None, raw: bool = False, host: str = LOCAL_HOST) -> tuple:
+    """
+    One page of history, walking backwards from the newest row.
+
+    Returns (rows oldest-first, keyset of the next older page or None).
+    ``before`` is the keyset (timestamp, id) returned for the previous page.
+    Pages are seeks on the (metric_type, host, timestamp) index, not OFFSETs.
+    Archived days are merged in, so a window may reach past the hot one.
+    """
     try:
+        if before is None and raw and _cache_ready():
+            return _cached_page(None, metric_type, hours, limit, host)
         with get_connection() as conn:
-            cursor = conn.cursor()
-            since = datetime.utcnow() - timedelta(hours=hours)
+            return _metrics_page(conn.cursor(), metric_type, _window_start(hours), limit, before, raw, host)
+    except Exception as e:
+        logger.error(f"Error retrieving metrics: {e}")
+        return [], None
+
+
+def _metrics_page(cursor, metric_type: str, since: str, limit: int, before: Optional[tuple],
+                  raw: bool, host: str, with_ids: bool = False) -> tuple:
+    """``get_metrics_page`` on an open cursor, for rows newer than ``since``."""
+    if before is None:
+        cursor.execute('''
+            SELECT id, timestamp, data, encoding, host
+            FROM metrics
+            WHERE metric_type = ? AND host = ? AND timestamp > ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', (metric_type, host, since, limit + 1))
+    else:
+        cursor.execute('''
+            SELECT id, timestamp, data, encoding, host
+            FROM metrics
+            WHERE metric_type = ? AND host = ? AND timestamp > ? AND (timestamp, id) < (?, ?)
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', (metric_type, host, since, before[0], before[1], limit + 1))
+
+    rows = cursor.fetchall()
+    archived = _archived_rows_desc(cursor, host, metric_type, since, before, limit + 1)
+    if archived:
+        rows = list(heapq.merge(rows, archived, key=lambda r: (r['timestamp'], r['id']), reverse=True))
+    next_page = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_page = (rows[-1]['timestamp'], rows[-1]['id'])
+    return _expand_rows(cursor, metric_type, reversed(rows), raw, with_ids), next_page
+
+
+@instrument('db')
+def get_metrics_since(metric_type: str, after: tuple, hours: int = 24, limit: int = 1000,
+                      raw: bool = False, host: str = LOCAL_HOST) -> tuple:
+    """
+    Rows newer than the ``after`` keyset (timestamp, id), oldest-first.
 
+    For incremental refreshes: the cost is one index seek plus the new
+    rows, whatever the window. ``after`` older than the last ``hours`` is
+    moved up to the window start. Returns (rows, keyset of the last row
+    returned, or ``after`` if none, True if more than ``limit`` rows
+    were newer).
+    """
+    try:
+        if raw and _cache_ready():
+            cached = _cached_since(metric_type, after, hours, limit, host)
+            if cached is not None:
+                return cached
+        with get_connection() as conn:
+            return _metrics_since(conn.cursor(), metric_type, after, hours, limit, raw, host)
+    except Exception as e:
+        logger.error(f"Error retrieving new metrics: {e}")
+        return [], after, False
+
+
+def _metrics_since(cursor, metric_type: str, after: tuple, hours: int, limit: int,
+                   raw: bool, host: str) -> tuple:
+    """``get_metrics_since`` on an open cursor."""
+    after = max(after, (_window_start(hours), MAX_ROW_ID))
+    cursor.execute('''
+        SELECT id, timestamp, data, encoding, host
+        FROM metrics
+        WHERE metric_type = ? AND host = ? AND (timestamp, id) > (?, ?)
+        ORDER BY timestamp, id
+        LIMIT ?
+    ''', (metric_type, host, after[0], after[1], limit + 1))
+
+    rows = cursor.fetchall()
+    archived = _archived_rows_asc(cursor, host, metric_type, after, limit + 1)
+    if archived:
+        rows = list(heapq.merge(archived, rows, key=lambda r: (r['timestamp'], r['id'])))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        after = (rows[-1]['timestamp'], rows[-1]['id'])
+    return _expand_rows(cursor, metric_type, rows, raw), after, more
+
+
+def iter_metrics(metric_type: str, hours: int = 24, raw: bool = False, batch_size: int = 500,
+                 start: Optional[str] = None, end: Optional[str] = None, host: str = LOCAL_HOST):
+    """
+    Yield every row in the time period oldest-first, in lists of up to ``batch_size``.
+
+    ``start``/``end`` ('YYYY-MM-DD HH:MM:SS', end exclusive) select an
+    explicit range instead of the last ``hours``.
+
+    Each batch is its own short keyset query on its own connection, so
+    nothing is held while the caller (e.g. a slow HTTP client) consumes a
+    batch, batches may be fetched from different threads, and memory stays
+    flat whatever the window. Archived days are merged in by timestamp.
+    """
+    since = start or _db_time(datetime.utcnow() - timedelta(hours=hours))
+    until = end or _END_OF_TIME
+    with get_connection() as conn:
+        days = _archived_days(conn.cursor(), host, metric_type, since, until)
+
+    stored = _iter_stored(host, metric_type, since, until, raw, batch_size)
+    if not days:
+        yield from stored
+        return
+
+    merged = heapq.merge(
+        _iter_archived(host, metric_type, days, since, until, raw),
+        (row for batch in stored for row in batch),
+        key=lambda r: r['timestamp']
+    )
+    batch = []
+    for row in merged:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _iter_stored(host: str, metric_type: str, since: str, until: str, raw: bool, batch_size: int):
+    """Database rows of ``iter_metrics``, one connection per batch."""
+    after = ('', 0)
+    while True:
+        with timed('db', 'iter_metrics_batch'), get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute('''
-                SELECT timestamp, data
+                SELECT id, timestamp, data, encoding, host
                 FROM metrics
-                WHERE metric_type = ? AND timestamp > ?
-                ORDER BY timestamp DESC
+                WHERE metric_type = ? AND host = ? AND timestamp >= ? AND timestamp < ? AND (timestamp, id) > (?, ?)
+                ORDER BY timestamp, id
                 LIMIT ?
-            ''', (metric_type, since.isoformat(), limit))
+            ''', (metric_type, host, since, until, after[0], after[1], batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            after = (rows[-1]['timestamp'], rows[-1]['id'])
+            expanded = _expand_rows(cursor, metric_type, rows, raw)
+        yield expanded
+        if len(rows) < batch_size:
+            return
 
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    'timestamp': row['timestamp'],
-                    'data': json.loads(row['data'])
-                })
 
-            return list(reversed(results))
-    except Exception as e:
-        logger.error(f"Error retrieving metrics: {e}")
-        return []
+def _archived_days(cursor, host: str, metric_type: str, since: str, until: str) -> list:
+    """Archived days of ``metric_type`` that may hold rows in [since, until], oldest first.
+
+    Inclusive at both ends so a keyset on a day's first timestamp still
+    finds it; callers filter rows exactly.
+    """
+    cursor.execute('''
+        SELECT day FROM archive_segments
+        WHERE host = ? AND metric_type = ? AND last_timestamp >= ? AND first_timestamp <= ?
+        ORDER BY day
+    ''', (host, metric_type, since, until))
+    return [row['day'] for row in cursor.fetchall()]
+
+
+def _segment_rows(host: str, metric_type: str, day: str) -> tuple:
+    """(timestamp, JSON bytes) rows of one archived day; empty if its file is gone."""
+    try:
+        return load_segment(segment_path(Config.ARCHIVE_DIR, metric_type, day, host))
+    except FileNotFoundError:
+        logger.warning(f"Archive segment for {host or 'local'} {metric_type} {day} is missing")
+        return ()
+
+
+def _archived_rows_desc(cursor, host: str, metric_type: str, since: str,
+                        before: Optional[tuple], limit: int) -> list:
+    """
+    Up to ``limit`` archived rows newer than ``since`` and below the ``before`` keyset, newest first.
+
+    Shaped like database rows. Ids are negative positions within the day,
+    below every database id, so one keyset pages through both sources.
+    """
+    results = []
+    for day in reversed(_archived_days(cursor, host, metric_type, since, before[0] if before else _END_OF_TIME)):
+        segment = _segment_rows(host, metric_type, day)
+        count = len(segment)
+        for position in range(count - 1, -1, -1):
+            timestamp, payload = segment[position]
+            if timestamp <= since:
+                return results
+            row_id = position - count
+            if before is not None and (timestamp, row_id) >= before:
+                continue
+            results.append({'id': row_id, 'timestamp': timestamp, 'data': payload,
+                            'encoding': ENCODING_JSON, 'host': host})
+            if len(results) >= limit:
+                return results
+    return results
+
+
+def _archived_rows_asc(cursor, host: str, metric_type: str, after: tuple, limit: int) -> list:
+    """Up to ``limit`` archived rows above the ``after`` keyset, oldest first, shaped like database rows."""
+    results = []
+    for day in _archived_days(cursor, host, metric_type, after[0], _END_OF_TIME):
+        segment = _segment_rows(host, metric_type, day)
+        count = len(segment)
+        for position, (timestamp, payload) in enumerate(segment):
+            row_id = position - count
+            if (timestamp, row_id) <= after:
+                continue
+            results.append({'id': row_id, 'timestamp': timestamp, 'data': payload,
+                            'encoding': ENCODING_JSON, 'host': host})
+            if len(results) >= limit:
+                return results
+    return results
+
+
+def _iter_archived(host: str, metric_type: str, days: list, since: str, until: str, raw: bool):
+    """Rows of the given archived days within [since, until), oldest-first."""
+    for day in days:
+        for timestamp, payload in _segment_rows(host, metric_type, day):
+            if since <= timestamp < until:
+                yield {'timestamp': timestamp, 'data': payload if raw else loads(payload)}
+
+
+def _resolve_base(cursor, metric_type: str, row, raw: bool = False):
+    """Return the payload of the last full row of the same host stored before ``row`` in time.
+
+    Ordered by (timestamp, id) like history reads, so bulk-imported older
+    rows (with higher ids) never become the base of a live marker.
+    """
+    cursor.execute('''
+        SELECT data, encoding FROM metrics
+        WHERE metric_type = ? AND host = ? AND (timestamp, id) < (?, ?) AND data != ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+    ''', (metric_type, row['host'], row['timestamp'], row['id'], SAME_AS_PREVIOUS))
+    base = cursor.fetchone()
+    if base is None:
+        return None
+    return (decode_raw if raw else decode)(base['data'], base['encoding'])
+
+
+def _expand_rows(cursor, metric_type: str, rows, raw: bool = False, with_ids: bool = False) -> list:
+    """Decode rows oldest-first, replacing unchanged markers with the preceding payload.
+
+    ``with_ids`` keeps each row's id (negative for archived rows) for keysets.
+    """
+    results = []
+    previous = None
+    decoder = decode_raw if raw else decode
+    for row in rows:
+        if row['data'] == SAME_AS_PREVIOUS:
+            if previous is None:
+                previous = _resolve_base(cursor, metric_type, row, raw)
+                if previous is None:
+                    continue
+            data = previous
+        else:
+            data = previous = decoder(row['data'], row['encoding'])
+        results.append({
+            'timestamp': row['timestamp'],
+            'data': data
+        })
+        if with_ids:
+            results[-1]['id'] = row['id']
+    return results
+
+
+def _existing_timestamps(cursor, host: str, metric_type: str, stamps: list) -> set:
+    """Timestamps of ``metric_type`` rows already stored for ``host`` between the given ones."""
+    low, high = min(stamps), max(stamps)
+    cursor.execute(
+        'SELECT timestamp FROM metrics WHERE metric_type = ? AND host = ? AND timestamp BETWEEN ? AND ?',
+        (metric_type, host, low, high)
+    )
+    existing = {r['timestamp'] for r in cursor.fetchall()}
+    cursor.execute(
+        'SELECT day FROM archive_segments WHERE host = ? AND metric_type = ? AND day BETWEEN ? AND ?',
+        (host, metric_type, low[:10], high[:10])
+    )
+    for day in [r['day'] for r in cursor.fetchall()]:
+        existing.update(timestamp for timestamp, _ in _segment_rows(host, metric_type, day))
+    return existing
+
+
+@instrument('db')
+def bulk_insert_metrics(rows: list, skip_existing: bool = True, host: str = LOCAL_HOST) -> int:
+    """
+    Insert (metric_type, timestamp, JSON bytes) rows in one short transaction.
+
+    Payloads are stored as given, compressed for COMPRESS_METRIC_TYPES,
+    without decoding. With ``skip_existing``, rows whose type and timestamp
+    are already stored (in the database or an archived day) are dropped,
+    so re-importing an export is harmless.
+    Returns the number of rows inserted.
+    """
+    return bulk_insert_batches([(host, rows)], skip_existing)[0]
+
+
+@instrument('db')
+def bulk_insert_batches(batches: list, skip_existing: bool = True, sketches: list = ()) -> list:
+    """
+    ``bulk_insert_metrics`` for several (host, rows) batches in one transaction.
+
+    Used to group-commit batches pushed by many agents at once; agent
+    hosts' last-seen times are updated in the same transaction, and the
+    agents' (host, metric_type, bucket start, JSON bytes) ``sketches`` are
+    stored with them. Returns the number of rows inserted per batch.
+    """
+    if not sketches and not any(rows for _, rows in batches):
+        return [0] * len(batches)
+    inserted = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _begin_write(cursor)
+        counter = _change_counter() if query_cache.enabled else None
+        with timed('db', 'write_lock_hold'):
+            for host, rows in batches:
+                if skip_existing and rows:
+                    existing = set()
+                    for metric_type in {r[0] for r in rows}:
+                        stamps = [r[1] for r in rows if r[0] == metric_type]
+                        existing.update(
+                            (metric_type, timestamp)
+                            for timestamp in _existing_timestamps(cursor, host, metric_type, stamps)
+                        )
+                    # Also drops duplicates within the batch
+                    fresh = []
+                    for row in rows:
+                        if (row[0], row[1]) not in existing:
+                            existing.add((row[0], row[1]))
+                            fresh.append(row)
+                    rows = fresh
+
+                values = []
+                for metric_type, timestamp, payload in rows:
+                    encoding = _compressed_encoding if metric_type in Config.COMPRESS_METRIC_TYPES else ENCODING_JSON
+                    values.append((timestamp, metric_type, encode_raw(payload, encoding), encoding, host))
+                cursor.executemany(
+                    'INSERT INTO metrics (timestamp, metric_type, data, encoding, host) VALUES (?, ?, ?, ?, ?)',
+                    values
+                )
+                if host != LOCAL_HOST:
+                    cursor.execute('''
+                        INSERT INTO hosts (host, samples) VALUES (?, ?)
+                        ON CONFLICT(host) DO UPDATE SET
+                            last_seen = CURRENT_TIMESTAMP, samples = samples + excluded.samples
+                    ''', (host, len(values)))
+                inserted.append(len(values))
+            _insert_sketches(cursor, sketches)
+            conn.commit()
+        increment('db', 'writes')
+        changed = conn.total_changes > 0
+
+    if counter is not None and changed:
+        # Imported rows may land anywhere in a window, so its entries are re-read
+        query_cache.wrote(counter)
+        for host, rows in batches:
+            for metric_type in {r[0] for r in rows}:
+                query_cache.invalidate(_series_tag(host, metric_type))
+        query_cache.invalidate(_STATS_TAG)
+    return inserted
 
 
-def get_latest_metrics(metric_type: str) -> Optional[dict]:
-    """Get the most recent metric of a given type."""
+@instrument('db')
+def get_latest_metrics(metric_type: str, raw: bool = False, host: str = LOCAL_HOST) -> Optional[dict]:
+    """Get the most recent metric of a given type (data as JSON bytes with ``raw``)."""
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT timestamp, data
+                SELECT id, timestamp, data, encoding, host
                 FROM metrics
-                WHERE metric_type = ?
-                ORDER BY timestamp DESC
+                WHERE metric_type = ? AND host = ?
+                ORDER BY timestamp DESC, id DESC
                 LIMIT 1
-            ''', (metric_type,))
+            ''', (metric_type, host))
 
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'timestamp': row['timestamp'],
-                    'data': json.loads(row['data'])
-                }
-            return None
+            rows = _expand_rows(cursor, metric_type, cursor.fetchall(), raw)
+            if rows:
+                return rows[0]
+
+            # Nothing in the hot window: the newest archived row, if any
+            cursor.execute(
+                'SELECT day FROM archive_segments WHERE host = ? AND metric_type = ? ORDER BY day DESC LIMIT 1',
+                (host, metric_type)
+            )
+            day = cursor.fetchone()
+            segment = _segment_rows(host, metric_type, day['day']) if day else ()
+            if not segment:
+                return None
+            timestamp, payload = segment[-1]
+            return {'timestamp': timestamp, 'data': payload if raw else loads(payload)}
     except Exception as e:
         logger.error(f"Error retrieving latest metrics: {e}")
         return None
 
 
-def check_and_store_alert(level: str, metric: str, message: str) -> bool:
-    """Store an alert only if an identical level+metric alert hasn't fired in the last hour."""
+def _insert_sketches(cursor, sketches):
+    """Store (host, metric_type, bucket start, JSON bytes) sketch rows; a resent bucket replaces the old one."""
+    cursor.executemany(
+        'INSERT OR REPLACE INTO sketches (host, metric_type, timestamp, data, encoding) VALUES (?, ?, ?, ?, ?)',
+        [(host, metric_type, timestamp, encode_raw(payload, _compressed_encoding), _compressed_encoding)
+         for host, metric_type, timestamp, payload in sketches]
+    )
+
+
+@instrument('db')
+def store_sketches(buckets: dict, host: str = LOCAL_HOST):
+    """Store ``SketchAggregator.flush`` output: {metric_type: (bucket start, {path: sketch})}."""
+    if not buckets:
+        return
+    rows = [(host, metric_type, started, dumps(sketches)) for metric_type, (started, sketches) in buckets.items()]
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            _begin_write(cursor)
+            counter = _change_counter() if query_cache.enabled else None
+            with timed('db', 'write_lock_hold'):
+                _insert_sketches(cursor, rows)
+                conn.commit()
+            increment('db', 'writes')
+        if counter is not None:
+            # Nothing cached reads sketches
+            query_cache.wrote(counter)
+    except Exception as e:
+        logger.error(f"Error storing sketches: {e}")
+        raise
+
+
+@instrument('db')
+def get_quantiles(metric_type: str, field: str, quantiles: list, hours: int = 24, step: int = 3600,
+                  host: str = LOCAL_HOST) -> dict:
+    """
+    Percentiles of numeric fields per ``step`` seconds over the last ``hours``.
+
+    ``field`` is a dotted path or a suffix of one, as for trends, or empty
+    for every field. ``quantiles`` are (name, 0..1) pairs. Each step merges
+    the sketches of the collection buckets that started in it. Returns
+    {path: [[step start, samples, value per quantile...], ...]}, oldest-first.
+    """
+    merged = {}
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT timestamp, data, encoding FROM sketches
+                WHERE host = ? AND metric_type = ? AND timestamp > ?
+                ORDER BY timestamp
+            ''', (host, metric_type, _window_start(hours)))
+            rows = cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Error getting sketches: {e}")
+        raise
+
+    epoch = datetime(1970, 1, 1)
+    for row in rows:
+        started = int((datetime.strptime(row['timestamp'], '%Y-%m-%d %H:%M:%S') - epoch).total_seconds())
+        bucket = started - started % step
+        for path, data in decode(row['data'], row['encoding']).items():
+            if field and not _matches_field(path, field):
+                continue
+            sketch = merged.setdefault(path, {}).get(bucket)
+            if sketch is None:
+                merged[path][bucket] = QuantileSketch.from_dict(data)
+            else:
+                sketch.merge(QuantileSketch.from_dict(data))
+
+    return {
+        path: [
+            [_db_time(epoch + timedelta(seconds=bucket)), sketch.count]
+            + [sketch.quantile(q) for _, q in quantiles]
+            for bucket, sketch in sorted(buckets.items())
+        ]
+        for path, buckets in sorted(merged.items())
+    }
+
+
+@instrument('db')
+def get_hosts() -> list:
+    """Agents that have pushed samples, most recently seen first."""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT host, first_seen, last_seen, samples
+                FROM hosts
+                ORDER BY last_seen DESC
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting hosts: {e}")
+        return []
+
+
+@instrument('db')
+def check_and_store_alert(level: str, metric: str, message: str) -> Optional[int]:
+    """
+    Store an alert only if an identical level+metric alert hasn't fired in the last hour.
+
+    Returns the stored alert's id, or None if it was not stored.
+    """
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
@@ -148,52 +916,168 @@ def check_and_store_alert(level: str, metric: str, message: str) -> bool:
                 LIMIT 1
             ''', (metric, level))
             if cursor.fetchone():
-                return False
-            cursor.execute(
-                'INSERT INTO alerts (level, metric, message) VALUES (?, ?, ?)',
-                (level, metric, message)
-            )
-            conn.commit()
-            return True
+                return None
+            _begin_write(cursor)
+            counter = _change_counter() if query_cache.enabled else None
+            with timed('db', 'write_lock_hold'):
+                cursor.execute(
+                    'INSERT INTO alerts (level, metric, message) VALUES (?, ?, ?)',
+                    (level, metric, message)
+                )
+                alert_id = cursor.lastrowid
+                conn.commit()
+            increment('db', 'writes')
+        if counter is not None:
+            query_cache.wrote(counter)
+            query_cache.invalidate(_ALERTS_TAG)
+        return alert_id
     except Exception as e:
         logger.error(f"Error storing alert: {e}")
-        return False
+        return None
 
 
-def get_alerts(limit: int = 50) -> list:
-    """Return recent alerts newest-first."""
+@instrument('db')
+def store_recording(alert_ids: list, recording: dict) -> Optional[int]:
+    """Store a flight recording and attach it to the given alerts; returns its id."""
     try:
+        payload = dumps(recording)
         with get_connection() as conn:
             cursor = conn.cursor()
+            _begin_write(cursor)
+            counter = _change_counter() if query_cache.enabled else None
+            with timed('db', 'write_lock_hold'):
+                cursor.execute(
+                    'INSERT INTO recordings (data, encoding) VALUES (?, ?)',
+                    (encode_raw(payload, _compressed_encoding), _compressed_encoding)
+                )
+                recording_id = cursor.lastrowid
+                cursor.executemany(
+                    'UPDATE alerts SET recording_id = ? WHERE id = ?',
+                    [(recording_id, alert_id) for alert_id in alert_ids]
+                )
+                conn.commit()
+            increment('db', 'writes')
+        if counter is not None:
+            query_cache.wrote(counter)
+            query_cache.invalidate(_ALERTS_TAG)
+        return recording_id
+    except Exception as e:
+        logger.error(f"Error storing recording: {e}")
+        return None
+
+
+@instrument('db')
+def get_recording(recording_id: int) -> Optional[dict]:
+    """A stored flight recording, with the alerts attached to it, or None."""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT timestamp, data, encoding FROM recordings WHERE id = ?', (recording_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
             cursor.execute('''
-                SELECT timestamp, level, metric, message
+                SELECT id, timestamp, level, metric, message
                 FROM alerts
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+                WHERE recording_id = ?
+                ORDER BY id
+            ''', (recording_id,))
+            alerts = [dict(alert) for alert in cursor.fetchall()]
+        recording = decode(row['data'], row['encoding'])
+        return {'id': recording_id, 'timestamp': row['timestamp'], 'alerts': alerts, **recording}
+    except Exception as e:
+        logger.error(f"Error getting recording: {e}")
+        return None
+
+
+@instrument('db')
+def get_alerts(limit: int = 50) -> list:
+    """Return recent alerts newest-first."""
+    try:
+        if _cache_ready():
+            return _cached(None, ('alerts', limit), (_ALERTS_TAG,), lambda c: _alerts(c, limit))
+        with get_connection() as conn:
+            return _alerts(conn.cursor(), limit)
     except Exception as e:
         logger.error(f"Error getting alerts: {e}")
         return []
 
 
-def cleanup_old_data(retention_days: int = 90):
-    """Remove data older than retention period."""
+def _alerts(cursor, limit: int) -> list:
+    """``get_alerts`` on an open cursor."""
+    cursor.execute('''
+        SELECT id, timestamp, level, metric, message, recording_id
+        FROM alerts
+        ORDER BY timestamp DESC
+        LIMIT ?
+    ''', (limit,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def _materialize_markers(cursor, cutoff: str, series=None):
+    """Give the oldest surviving row of each (host, type) a full payload if it is a marker.
+
+    Its base row is about to be deleted, so the marker would otherwise
+    become unresolvable.
+    """
+    if series is None:
+        cursor.execute('SELECT DISTINCT host, metric_type FROM metrics')
+        series = [(r['host'], r['metric_type']) for r in cursor.fetchall()]
+    for host, metric_type in series:
+        cursor.execute('''
+            SELECT id, timestamp, data, host FROM metrics
+            WHERE metric_type = ? AND host = ? AND timestamp >= ?
+            ORDER BY timestamp, id
+            LIMIT 1
+        ''', (metric_type, host, cutoff))
+        row = cursor.fetchone()
+        if row is None or row['data'] != SAME_AS_PREVIOUS:
+            continue
+        base = _resolve_base(cursor, metric_type, row)
+        if base is not None:
+            cursor.execute(
+                'UPDATE metrics SET data = ?, encoding = ? WHERE id = ?',
+                (json.dumps(base), ENCODING_JSON, row['id'])
+            )
+
+
+@instrument('db')
+def cleanup_old_data(retention_days: int = 90, sketch_retention_days: Optional[int] = None):
+    """Remove data older than retention period.
+
+    Sketches are kept ``sketch_retention_days`` (default: ``retention_days``;
+    0 keeps them forever).
+    """
+    if sketch_retention_days is None:
+        sketch_retention_days = retention_days
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cutoff = datetime.utcnow() - timedelta(days=retention_days)
+            cutoff = _db_time(datetime.utcnow() - timedelta(days=retention_days))
 
-            cursor.execute(
-                'DELETE FROM metrics WHERE timestamp < ?',
-                (cutoff.isoformat(),)
-            )
-            deleted = cursor.rowcount
-            cursor.execute(
-                'DELETE FROM alerts WHERE timestamp < ?',
-                (cutoff.isoformat(),)
-            )
-            conn.commit()
+            _begin_write(cursor)
+            with timed('db', 'write_lock_hold'):
+                _materialize_markers(cursor, cutoff)
+                cursor.execute(
+                    'DELETE FROM metrics WHERE timestamp < ?',
+                    (cutoff,)
+                )
+                deleted = cursor.rowcount
+                cursor.execute(
+                    'DELETE FROM alerts WHERE timestamp < ?',
+                    (cutoff,)
+                )
+                cursor.execute(
+                    'DELETE FROM recordings WHERE timestamp < ?',
+                    (cutoff,)
+                )
+                if sketch_retention_days:
+                    cursor.execute(
+                        'DELETE FROM sketches WHERE timestamp < ?',
+                        (_db_time(datetime.utcnow() - timedelta(days=sketch_retention_days)),)
+                    )
+                conn.commit()
+            increment('db', 'writes')
 
             if deleted > 0:
                 cursor.execute('VACUUM')
@@ -205,33 +1089,283 @@ def cleanup_old_data(retention_days: int = 90):
         return 0
 
 
-def get_database_stats() -> dict:
-    """Get database statistics."""
+def _archive_day(host: str, metric_type: str, day: str, last_id: int) -> int:
+    """Move one day of a host's ``metric_type`` rows (ids up to ``last_id``) into its segment."""
+    start = f'{day} 00:00:00'
+    end = _db_time(datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, timestamp, data, encoding, host
+            FROM metrics
+            WHERE metric_type = ? AND host = ? AND timestamp >= ? AND timestamp < ? AND id <= ?
+            ORDER BY timestamp, id
+        ''', (metric_type, host, start, end, last_id))
+        stored = cursor.fetchall()
+        rows = [(r['timestamp'], r['data']) for r in _expand_rows(cursor, metric_type, stored, raw=True)]
+
+        # A day archived earlier gained rows (e.g. an import): rewrite it with both
+        cursor.execute(
+            'SELECT 1 FROM archive_segments WHERE host = ? AND metric_type = ? AND day = ?',
+            (host, metric_type, day)
+        )
+        if cursor.fetchone():
+            rows = list(heapq.merge(_segment_rows(host, metric_type, day), rows, key=lambda r: r[0]))
+
+        # The file is in place before the rows go: a failure in between
+        # leaves them readable twice, never lost
+        path = segment_path(Config.ARCHIVE_DIR, metric_type, day, host)
+        header = write_segment(path, metric_type, day, rows) if rows else None
+
+        _begin_write(cursor)
+        with timed('db', 'write_lock_hold'):
+            _materialize_markers(cursor, end, ((host, metric_type),))
+            if header is not None:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO archive_segments
+                    (host, metric_type, day, first_timestamp, last_timestamp, rows, size, fields)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (host, metric_type, day, header['first'], header['last'], header['rows'],
+                      header['size'], dumps(header['fields']).decode('utf-8')))
+            cursor.execute(
+                'DELETE FROM metrics WHERE metric_type = ? AND host = ? AND timestamp >= ? AND timestamp < ? AND id <= ?',
+                (metric_type, host, start, end, last_id)
+            )
+            conn.commit()
+        increment('db', 'writes')
+    return len(stored)
+
+
+def _prune_archive(retention_days: int) -> int:
+    """Delete archived days older than the archive retention period."""
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT host, metric_type, day FROM archive_segments WHERE day < ?', (cutoff,))
+        expired = cursor.fetchall()
+        if not expired:
+            return 0
+        _begin_write(cursor)
+        with timed('db', 'write_lock_hold'):
+            cursor.execute('DELETE FROM archive_segments WHERE day < ?', (cutoff,))
+            conn.commit()
+        increment('db', 'writes')
+    for row in expired:
+        remove_segment(segment_path(Config.ARCHIVE_DIR, row['metric_type'], row['day'], row['host']))
+    return len(expired)
+
+
+@instrument('db')
+def archive_old_data(hot_days: int, retention_days: int = 0) -> int:
+    """
+    Move whole UTC days older than ``hot_days`` into archive segments.
+
+    Runs one day and type at a time, each in its own short write
+    transaction. Archived days older than ``retention_days`` (0 keeps
+    them forever) are deleted. Returns the number of rows moved.
+    """
+    if hot_days <= 0:
+        return 0
     try:
+        boundary = (datetime.utcnow() - timedelta(days=hot_days)).strftime('%Y-%m-%d 00:00:00')
         with get_connection() as conn:
             cursor = conn.cursor()
-
-            cursor.execute('SELECT COUNT(*) as count FROM metrics')
-            total_records = cursor.fetchone()['count']
-
             cursor.execute('''
-                SELECT metric_type, COUNT(*) as count
+                SELECT host, metric_type, substr(timestamp, 1, 10) AS day, MAX(id) AS last_id
                 FROM metrics
-                GROUP BY metric_type
-            ''')
-            by_type = {row['metric_type']: row['count'] for row in cursor.fetchall()}
+                WHERE timestamp < ?
+                GROUP BY host, metric_type, day
+                ORDER BY day, host, metric_type
+            ''', (boundary,))
+            pending = cursor.fetchall()
+
+        moved = 0
+        for row in pending:
+            moved += _archive_day(row['host'], row['metric_type'], row['day'], row['last_id'])
+        pruned = _prune_archive(retention_days) if retention_days > 0 else 0
+
+        if moved > 0:
+            with get_connection() as conn:
+                conn.execute('VACUUM')
+            logger.info(f"Archived {moved} metric records from {len(pending)} host-type-days")
+        if pruned > 0:
+            logger.info(f"Removed {pruned} expired archive segments")
+        return moved
+    except Exception as e:
+        logger.error(f"Error archiving old data: {e}")
+        return 0
+
+
+def _matches_field(path: str, field: str) -> bool:
+    return path == field or path.endswith('.' + field)
 
-            cursor.execute('SELECT MIN(timestamp) as oldest FROM metrics')
-            oldest = cursor.fetchone()['oldest']
 
-            db_size = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+@instrument('db')
+def get_daily_ranges(metric_type: str, field: str, days: int = 365, host: str = LOCAL_HOST) -> dict:
+    """
+    Per-day [min, max] of numeric fields over the last ``days``, for trend views.
 
-            return {
-                'total_records': total_records,
-                'records_by_type': by_type,
-                'oldest_record': oldest,
-                'database_size_mb': round(db_size / (1024 * 1024), 2)
-            }
+    ``field`` is a dotted path or a suffix of one, e.g. 'percent_used'
+    matches the field of every mount. Archived days are answered from the
+    segment index without reading their rows; only days still in the
+    database are scanned. Returns {path: [[day, min, max], ...]}.
+    """
+    start_day = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    by_day = {}
+
+    def add(day: str, ranges: dict):
+        merged = by_day.setdefault(day, {})
+        for path, (low, high) in ranges.items():
+            if not _matches_field(path, field):
+                continue
+            if path in merged:
+                low, high = min(low, merged[path][0]), max(high, merged[path][1])
+            merged[path] = [low, high]
+
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT day, fields FROM archive_segments WHERE host = ? AND metric_type = ? AND day >= ?',
+                (host, metric_type, start_day)
+            )
+            for row in cursor.fetchall():
+                add(row['day'], loads(row['fields']))
+
+        day, ranges = None, None
+        for batch in _iter_stored(host, metric_type, f'{start_day} 00:00:00', _END_OF_TIME,
+                                  raw=False, batch_size=2000):
+            for row in batch:
+                if row['timestamp'][:10] != day:
+                    if ranges is not None:
+                        add(day, ranges.ranges)
+                    day, ranges = row['timestamp'][:10], FieldRanges()
+                ranges.add(row['data'])
+        if ranges is not None:
+            add(day, ranges.ranges)
+    except Exception as e:
+        logger.error(f"Error computing daily ranges: {e}")
+        return {}
+
+    series = {}
+    for day in sorted(by_day):
+        for path, (low, high) in by_day[day].items():
+            series.setdefault(path, []).append([day, low, high])
+    return series
+
+
+@instrument('db')
+def get_database_stats() -> dict:
+    """Get database statistics."""
+    try:
+        if _cache_ready():
+            return dict(_cached(None, ('stats',), (_STATS_TAG,), _database_stats))
+        with get_connection() as conn:
+            return _database_stats(conn.cursor())
     except Exception as e:
         logger.error(f"Error getting database stats: {e}")
         return {'error': str(e)}
+
+
+def _database_stats(cursor) -> dict:
+    """``get_database_stats`` on an open cursor."""
+    cursor.execute('SELECT COUNT(*) as count FROM metrics')
+    total_records = cursor.fetchone()['count']
+
+    cursor.execute('''
+        SELECT metric_type, COUNT(*) as count
+        FROM metrics
+        GROUP BY metric_type
+    ''')
+    by_type = {row['metric_type']: row['count'] for row in cursor.fetchall()}
+
+    cursor.execute('SELECT MIN(timestamp) as oldest FROM metrics')
+    oldest = cursor.fetchone()['oldest']
+
+    cursor.execute('SELECT COUNT(*) as count FROM metrics WHERE data = ?', (SAME_AS_PREVIOUS,))
+    unchanged = cursor.fetchone()['count']
+
+    db_size = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+
+    cursor.execute('''
+        SELECT COUNT(*) as segments, COALESCE(SUM(rows), 0) as records,
+               COALESCE(SUM(size), 0) as size, MIN(first_timestamp) as oldest
+        FROM archive_segments
+    ''')
+    archive = cursor.fetchone()
+    if archive['oldest'] is not None:
+        oldest = min(oldest or archive['oldest'], archive['oldest'])
+
+    cursor.execute('SELECT COUNT(*) as count FROM hosts')
+    agent_hosts = cursor.fetchone()['count']
+
+    return {
+        'total_records': total_records,
+        'records_by_type': by_type,
+        'unchanged_records': unchanged,
+        'oldest_record': oldest,
+        'database_size_mb': round(db_size / (1024 * 1024), 2),
+        'archive': {
+            'segments': archive['segments'],
+            'records': archive['records'],
+            'size_mb': round(archive['size'] / (1024 * 1024), 2)
+        },
+        'agent_hosts': agent_hosts
+    }
+
+
+@instrument('db')
+def get_dashboard(series: dict, hours: int = 24, limit: int = 1000, alerts_limit: int = 50,
+                  raw: bool = False, host: str = LOCAL_HOST) -> dict:
+    """
+    Several history series, recent alerts and stats in one read transaction.
+
+    ``series`` maps each metric type to a ``since`` keyset, for only the
+    rows after it (as ``get_metrics_since``), or to None for the newest
+    ``limit`` rows of the window (as ``get_metrics_page``). Everything is
+    read on one connection from one snapshot, so the series, counts and
+    alerts agree with each other.
+    """
+    try:
+        cache = raw and _cache_ready()
+        if cache:
+            cached = _cached_dashboard(series, hours, limit, alerts_limit, host)
+            if cached is not None:
+                return cached
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            try:
+                if cache:
+                    # The first read takes the shared lock; no write can commit
+                    # until the rollback, so the counter matches this snapshot
+                    cursor.execute('SELECT COUNT(*) FROM sqlite_master')
+                    query_cache.sync(_change_counter())
+                history = {}
+                for metric_type, after in series.items():
+                    if after is None:
+                        if cache:
+                            rows, next_page = _cached_page(cursor, metric_type, hours, limit, host)
+                        else:
+                            rows, next_page = _metrics_page(cursor, metric_type, _window_start(hours), limit,
+                                                            None, raw, host)
+                        history[metric_type] = {'data': rows, 'next_cursor': next_page}
+                    else:
+                        delta = _cached_since(metric_type, after, hours, limit, host) if cache else None
+                        if delta is None:
+                            delta = _metrics_since(cursor, metric_type, after, hours, limit, raw, host)
+                        rows, last, more = delta
+                        history[metric_type] = {'data': rows, 'cursor': last, 'more': more}
+                if cache:
+                    alerts = _cached(cursor, ('alerts', alerts_limit), (_ALERTS_TAG,),
+                                     lambda c: _alerts(c, alerts_limit))
+                    stats = dict(_cached(cursor, ('stats',), (_STATS_TAG,), _database_stats))
+                else:
+                    alerts = _alerts(cursor, alerts_limit)
+                    stats = _database_stats(cursor)
+                return {'series': history, 'alerts': alerts, 'stats': stats}
+            finally:
+                conn.rollback()
+    except Exception as e:
+        logger.error(f"Error reading dashboard data: {e}")
+        raise
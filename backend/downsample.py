@@ -0,0 +1,255 @@
+"""Downsampling of history rows to the number of points a chart can draw.
+
+A waveform canvas is a few hundred pixels wide, so a long window of
+history is reduced on the server to about that many rows before it is
+sent. Rows are selected, never averaged: each kept row is returned as
+stored, and the chart plots the same fields it always did.
+
+Two methods, both keeping the first and last row:
+
+- ``lttb`` (Largest-Triangle-Three-Buckets): one row per bucket, the one
+  forming the largest triangle with the previous pick and the next
+  bucket's average. Keeps the visual shape, including isolated spikes.
+- ``minmax``: the rows holding each field's minimum and maximum in every
+  pixel-wide time bucket. Every extreme survives, at two rows per pixel.
+
+Rows are ranked by one or more numeric fields, given as a dotted path or
+a suffix of one, as on /api/trend. With several fields (rx and tx for
+network) LTTB sums each field's triangle, scaled by the field's range.
+NumPy is used when installed, with a pure Python fallback.
+"""
+
+import math
+from datetime import datetime
+
+from serialization import loads
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+METHODS = ('lttb', 'minmax')
+DEFAULT_METHOD = 'lttb'
+MAX_POINTS = 5000
+
+# Fields each type's chart plots, used when the request names none
+DEFAULT_FIELDS = {
+    'cpu': ('temp_celsius',),
+    'memory': ('percent_used',),
+    'disk': ('percent_used',),
+    'network': ('_total.rx_mb_per_sec', '_total.tx_mb_per_sec'),
+    'smart': ('temperature_celsius',),
+}
+
+
+def _find_field(data, field: str):
+    """(key path, value) of the first numeric leaf whose dotted path equals or ends with ``field``."""
+    stack = [(data, ())]
+    while stack:
+        value, keys = stack.pop()
+        if isinstance(value, dict):
+            # Reversed, so the first key is visited first; '_agg' extremes are not samples
+            stack.extend((item, keys + (key,)) for key, item in reversed(list(value.items())) if key != '_agg')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            path = '.'.join(map(str, keys))
+            if path == field or path.endswith('.' + field):
+                return keys, value
+    return None, None
+
+
+class _FieldReader:
+    """Reads one field from each row; the path found in one row is tried first on the next."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.keys = None
+
+    def __call__(self, data):
+        if self.keys is not None:
+            value = data
+            for key in self.keys:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    return value
+        keys, value = _find_field(data, self.field)
+        if keys is not None:
+            self.keys = keys
+        return value
+
+
+def _epoch_seconds(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def _series(rows: list, fields: tuple) -> tuple:
+    """(positions of rows with a value, x in seconds, one list of y per field; NaN where missing)."""
+    readers = [_FieldReader(field) for field in fields]
+    positions, xs, ys = [], [], [[] for _ in fields]
+    for position, row in enumerate(rows):
+        data = row['data']
+        if isinstance(data, (bytes, str)):
+            data = loads(data)
+        values = [read(data) for read in readers]
+        if all(v is None for v in values):
+            continue
+        positions.append(position)
+        xs.append(_epoch_seconds(row['timestamp']))
+        for y, v in zip(ys, values):
+            y.append(math.nan if v is None else float(v))
+    return positions, xs, ys
+
+
+def _scaled(ys: list) -> list:
+    """Each field divided by its range, so no field dominates the others' triangles."""
+    scaled = []
+    for y in ys:
+        present = [v for v in y if v == v]
+        span = (max(present) - min(present)) if present else 0
+        scaled.append([v / span for v in y] if span else list(y))
+    return scaled
+
+
+def _lttb_python(xs: list, ys: list, points: int) -> list:
+    n = len(xs)
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / count
+        avg_ys = []
+        for y in ys:
+            present = [v for v in y[avg_start:avg_end] if v == v]
+            avg_ys.append(sum(present) / len(present) if present else math.nan)
+
+        best, best_area = avg_start - 1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = 0.0
+            for y, avg_y in zip(ys, avg_ys):
+                term = abs((xs[a] - avg_x) * (y[j] - y[a]) - (xs[a] - xs[j]) * (avg_y - y[a]))
+                if term == term:
+                    area += term
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def _lttb_numpy(xs: list, ys: list, points: int) -> list:
+    x = np.asarray(xs, dtype=float)
+    y = np.asarray(ys, dtype=float)
+    n = len(x)
+    every = (n - 2) / (points - 2)
+    # Bucket i holds rows bounds[i] .. bounds[i + 1] - 1, as in the Python path
+    bounds = np.minimum((np.arange(points) * every).astype(int) + 1, n)
+
+    # Averages of every following bucket at once, from running sums
+    present = ~np.isnan(y)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate((np.zeros((len(y), 1)), np.cumsum(np.where(present, y, 0.0), axis=1)), axis=1)
+    count_y = np.concatenate((np.zeros((len(y), 1)), np.cumsum(present, axis=1)), axis=1)
+    starts, ends = bounds[1:-1], bounds[2:]
+    avg_x = (sum_x[ends] - sum_x[starts]) / (ends - starts)
+    with np.errstate(invalid='ignore'):
+        avg_y = (sum_y[:, ends] - sum_y[:, starts]) / (count_y[:, ends] - count_y[:, starts])
+
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        start, end = bounds[i], bounds[i + 1]
+        areas = np.abs(
+            (x[a] - avg_x[i]) * (y[:, start:end] - y[:, a:a + 1])
+            - (x[a] - x[start:end]) * (avg_y[:, i:i + 1] - y[:, a:a + 1])
+        )
+        a = int(start + np.argmax(np.nansum(areas, axis=0)))
+        selected.append(a)
+    selected.append(n - 1)
+    return selected
+
+
+def _minmax_python(xs: list, ys: list, buckets: int) -> list:
+    first, span = xs[0], (xs[-1] - xs[0]) or 1.0
+    extremes = {}
+    for j, x in enumerate(xs):
+        bucket = min(int((x - first) * buckets / span), buckets - 1)
+        for f, y in enumerate(ys):
+            v = y[j]
+            if v != v:
+                continue
+            low, high = extremes.get((bucket, f), (None, None))
+            if low is None or v < y[low]:
+                low = j
+            if high is None or v > y[high]:
+                high = j
+            extremes[(bucket, f)] = (low, high)
+    selected = {0, len(xs) - 1}
+    for low, high in extremes.values():
+        selected.update((low, high))
+    return sorted(selected)
+
+
+def _minmax_numpy(xs: list, ys: list, buckets: int) -> list:
+    x = np.asarray(xs, dtype=float)
+    y = np.asarray(ys, dtype=float)
+    span = (x[-1] - x[0]) or 1.0
+    bucket = np.minimum(((x - x[0]) * buckets / span).astype(int), buckets - 1)
+    selected = [np.array([0, len(x) - 1])]
+    for values in y:
+        present = ~np.isnan(values)
+        if not present.any():
+            continue
+        idx = np.flatnonzero(present)
+        b, v = bucket[idx], values[idx]
+        # Sorted by bucket, then value: each bucket's first row is its minimum, its last the maximum
+        order = np.lexsort((v, b))
+        starts = np.flatnonzero(np.diff(b[order], prepend=-1))
+        ends = np.append(starts[1:], len(order)) - 1
+        selected.append(idx[order[starts]])
+        selected.append(idx[order[ends]])
+    return np.unique(np.concatenate(selected)).tolist()
+
+
+def downsample_rows(rows: list, fields: tuple, points: int, method: str = DEFAULT_METHOD) -> list:
+    """
+    At most about ``points`` of ``rows`` (oldest-first), chosen by ``method``.
+
+    Rows with none of ``fields`` cannot be drawn and are dropped. Rows
+    are returned unchanged, so raw rows stay raw. ``minmax`` may return
+    fewer rows than ``points`` (empty buckets) but never more: it keeps
+    the first and last rows plus up to two per field per bucket, and falls
+    back to LTTB when ``points`` cannot hold even one bucket of every field.
+    """
+    if len(rows) <= points:
+        return rows
+    positions, xs, ys = _series(rows, fields)
+    if len(positions) <= points:
+        return [rows[p] for p in positions]
+
+    buckets = (points - 2) // (2 * len(fields))
+    if method == 'minmax' and buckets >= 1:
+        minmax = _minmax_numpy if NUMPY_AVAILABLE else _minmax_python
+        selected = minmax(xs, ys, buckets)
+    else:
+        lttb = _lttb_numpy if NUMPY_AVAILABLE else _lttb_python
+        selected = lttb(xs, _scaled(ys), max(points, 3))
+    return [rows[positions[j]] for j in selected]
+
+
+def resolve_fields(metric_type: str, field: str = None) -> tuple:
+    """The ``field`` parameter (comma-separated) or the type's default; ValueError if neither."""
+    if field:
+        fields = tuple(f.strip() for f in field.split(',') if f.strip())
+        if fields:
+            return fields
+    if metric_type in DEFAULT_FIELDS:
+        return DEFAULT_FIELDS[metric_type]
+    raise ValueError(f'field is required to downsample {metric_type}, e.g. field=cpu_percent')
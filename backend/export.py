@@ -0,0 +1,325 @@
+"""Bulk export and import of metric history.
+
+Formats: Parquet and Arrow IPC stream (need the optional pyarrow package)
+or gzip-compressed CSV. Every format has the columns metric_type,
+timestamp, data (the payload as JSON text, unchanged markers expanded)
+and host ('' for the exporting instance, else the agent's name). Exports
+cover every host unless given a list; '.' in the list is the local host.
+Files without a host column (older exports) import as the local host.
+Export reads keyset batches and writes each one as it arrives, and import
+inserts one batch per transaction, so memory stays flat for any range.
+
+Usage: python export.py export -o metrics.parquet [--types cpu,disk] [--hosts .,web-3] [--start 2026-01-01] [--end 2026-02-01]
+       python export.py import metrics.parquet
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+from database import iter_metrics, bulk_insert_batches, get_hosts, init_database, LOCAL_HOST
+from ingest import is_valid_host
+from instrumentation import timed
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('parquet', 'arrow', 'csv')
+CONTENT_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'csv': 'application/gzip',
+}
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrows', 'csv': '.csv.gz'}
+
+# Metric types with stored history
+EXPORT_METRIC_TYPES = ('cpu', 'memory', 'disk', 'smart', 'drives', 'docker', 'processes', 'network')
+
+BATCH_SIZE = 5000
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Names the local host in a host list; agent names start with a letter or digit
+LOCAL_HOST_NAME = '.'
+
+
+def default_format() -> str:
+    return 'parquet' if PYARROW_AVAILABLE else 'csv'
+
+
+def resolve_format(fmt: str) -> str:
+    """Validate ``fmt``; columnar formats fall back to CSV without pyarrow."""
+    fmt = (fmt or default_format()).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown export format {fmt!r}. Valid: {list(FORMATS)}')
+    if fmt != 'csv' and not PYARROW_AVAILABLE:
+        logger.warning("pyarrow not installed; exporting gzip CSV instead")
+        return 'csv'
+    return fmt
+
+
+def normalize_timestamp(value: str):
+    """Accept an ISO date or datetime and return it in the stored format."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).strftime(_TIMESTAMP_FORMAT)
+
+
+def parse_hosts(value: str):
+    """A comma-separated host list as stored host names, or None (every host) when empty."""
+    names = [h.strip() for h in (value or '').split(',') if h.strip()]
+    if not names:
+        return None
+    invalid = [h for h in names if h != LOCAL_HOST_NAME and not is_valid_host(h)]
+    if invalid:
+        raise ValueError(f'Invalid host names {invalid}')
+    return [LOCAL_HOST if h == LOCAL_HOST_NAME else h for h in dict.fromkeys(names)]
+
+
+def stored_hosts() -> list:
+    """The local host, then every agent that has pushed samples."""
+    return [LOCAL_HOST] + [row['host'] for row in get_hosts()]
+
+
+def iter_batches(metric_types, start=None, end=None, batch_size: int = BATCH_SIZE, hosts=None):
+    """
+    Yield lists of (metric_type, timestamp, JSON bytes, host), host by host
+    and type by type, oldest-first. ``hosts`` defaults to every stored host.
+    """
+    start = start or '0000-00-00 00:00:00'
+    for host in (stored_hosts() if hosts is None else hosts):
+        for metric_type in metric_types:
+            for batch in iter_metrics(metric_type, raw=True, batch_size=batch_size, start=start, end=end, host=host):
+                yield [(metric_type, row['timestamp'], row['data'], host) for row in batch]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every batch."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([
+        ('metric_type', pa.dictionary(pa.int8(), pa.string())),
+        ('timestamp', pa.timestamp('s')),
+        ('data', pa.string()),
+        ('host', pa.dictionary(pa.int16(), pa.string())),
+    ])
+
+
+def _record_batch(rows, schema):
+    timestamps = pc.strptime(pa.array([r[1] for r in rows]), format=_TIMESTAMP_FORMAT, unit='s')
+    return pa.record_batch([
+        pa.array([r[0] for r in rows]).dictionary_encode().cast(schema.field('metric_type').type),
+        timestamps,
+        pa.array([r[2] for r in rows], type=pa.string()),
+        pa.array([r[3] for r in rows]).dictionary_encode().cast(schema.field('host').type),
+    ], schema=schema)
+
+
+def export_chunks(fmt: str, metric_types, start=None, end=None, stats: dict = None, hosts=None):
+    """
+    Yield the encoded export in chunks, one per database batch.
+
+    ``stats`` (if given) receives the running 'rows' count.
+    """
+    sink = _ChunkSink()
+    stats = stats if stats is not None else {}
+    stats['rows'] = 0
+
+    if fmt == 'csv':
+        gz = gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=6)
+        text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(('metric_type', 'timestamp', 'data', 'host'))
+        for rows in iter_batches(metric_types, start, end, hosts=hosts):
+            writer.writerows((t, ts, data.decode('utf-8'), host) for t, ts, data, host in rows)
+            text.flush()
+            stats['rows'] += len(rows)
+            yield sink.drain()
+        text.close()
+        yield sink.drain()
+        return
+
+    schema = _arrow_schema()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa_ipc.new_stream(sink, schema, options=pa_ipc.IpcWriteOptions(compression='zstd'))
+    try:
+        for rows in iter_batches(metric_types, start, end, hosts=hosts):
+            batch = _record_batch(rows, schema)
+            if fmt == 'parquet':
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            stats['rows'] += len(rows)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_to_file(path: str, fmt: str = None, metric_types=EXPORT_METRIC_TYPES, start=None, end=None,
+                   hosts=None) -> int:
+    """Write an export to ``path``; returns the row count."""
+    fmt = resolve_format(fmt)
+    stats = {}
+    with open(path, 'wb') as f:
+        for chunk in export_chunks(fmt, metric_types, start, end, stats, hosts):
+            f.write(chunk)
+    return stats['rows']
+
+
+def detect_format(path: str) -> str:
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == b'PAR1':
+        return 'parquet'
+    if magic[:2] == b'\x1f\x8b':
+        return 'csv'
+    if magic == b'\xff\xff\xff\xff':
+        return 'arrow'
+    raise ValueError(f'Unrecognized archive format: {path}')
+
+
+def _read_batches(path: str, fmt: str, batch_size: int):
+    """Yield lists of (metric_type, timestamp, JSON bytes, host) from an export file."""
+    if fmt == 'csv':
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            with_host = 'host' in header
+            rows = []
+            for record in reader:
+                host = record[3] if with_host else LOCAL_HOST
+                rows.append((record[0], record[1], record[2].encode('utf-8'), host))
+                if len(rows) >= batch_size:
+                    yield rows
+                    rows = []
+            if rows:
+                yield rows
+        return
+
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError(f'pyarrow is required to import {fmt} archives')
+    if fmt == 'parquet':
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    else:
+        batches = pa_ipc.open_stream(pa.memory_map(path))
+    for batch in batches:
+        types = batch.column('metric_type').cast(pa.string()).to_pylist()
+        stamps = pc.strftime(batch.column('timestamp'), format=_TIMESTAMP_FORMAT).to_pylist()
+        data = batch.column('data').to_pylist()
+        if 'host' in batch.schema.names:
+            hosts = batch.column('host').cast(pa.string()).to_pylist()
+        else:
+            hosts = [LOCAL_HOST] * len(data)
+        yield [(t, ts, d.encode('utf-8'), h) for t, ts, d, h in zip(types, stamps, data, hosts)]
+
+
+def import_file(path: str, fmt: str = None, skip_existing: bool = True, batch_size: int = BATCH_SIZE) -> dict:
+    """Bulk-load an export file, each row under its host; returns counts read and inserted."""
+    fmt = fmt or detect_format(path)
+    read = inserted = skipped_hosts = 0
+    started = time.perf_counter()
+    for rows in _read_batches(path, fmt, batch_size):
+        by_host = {}
+        for metric_type, timestamp, data, host in rows:
+            if metric_type not in EXPORT_METRIC_TYPES:
+                continue
+            if host != LOCAL_HOST and not is_valid_host(host):
+                skipped_hosts += 1
+                continue
+            by_host.setdefault(host, []).append((metric_type, timestamp, data))
+        with timed('db', 'import_batch'):
+            inserted += sum(bulk_insert_batches(list(by_host.items()), skip_existing=skip_existing))
+        read += sum(len(host_rows) for host_rows in by_host.values())
+    if skipped_hosts:
+        logger.warning(f"Skipped {skipped_hosts} rows with invalid host names")
+    elapsed = time.perf_counter() - started
+    return {
+        'format': fmt,
+        'rows_read': read,
+        'rows_inserted': inserted,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(read / elapsed) if elapsed else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    exp = sub.add_parser('export', help='write history to a file')
+    exp.add_argument('-o', '--output', required=True)
+    exp.add_argument('--format', choices=FORMATS, help='default: from the file extension, else parquet (csv without pyarrow)')
+    exp.add_argument('--types', default=','.join(EXPORT_METRIC_TYPES))
+    exp.add_argument('--hosts', help=f"comma-separated host names, '{LOCAL_HOST_NAME}' for this instance; default: every host")
+    exp.add_argument('--start', help='ISO date/time, inclusive')
+    exp.add_argument('--end', help='ISO date/time, exclusive')
+
+    imp = sub.add_parser('import', help='load an export file into the database')
+    imp.add_argument('path')
+    imp.add_argument('--format', choices=FORMATS, help='default: detected from the file')
+    imp.add_argument('--keep-duplicates', action='store_true', help='insert rows even if type+timestamp is already stored')
+
+    args = parser.parse_args()
+    init_database()
+
+    if args.command == 'export':
+        fmt = args.format or next((f for f, ext in EXTENSIONS.items() if args.output.endswith(ext)), None)
+        types = [t.strip() for t in args.types.split(',') if t.strip()]
+        unknown = set(types) - set(EXPORT_METRIC_TYPES)
+        if unknown:
+            parser.error(f'unknown metric types: {sorted(unknown)}')
+        try:
+            hosts = parse_hosts(args.hosts)
+        except ValueError as e:
+            parser.error(str(e))
+        started = time.perf_counter()
+        rows = export_to_file(args.output, fmt, types, normalize_timestamp(args.start), normalize_timestamp(args.end),
+                              hosts)
+        size = os.path.getsize(args.output)
+        print(f'{rows} rows, {size / (1024 * 1024):.2f} MB in {time.perf_counter() - started:.1f}s -> {args.output}')
+    else:
+        result = import_file(args.path, args.format, skip_existing=not args.keep_duplicates)
+        print(f"{result['rows_inserted']} of {result['rows_read']} rows imported from {result['format']} "
+              f"in {result['seconds']}s ({result['rows_per_second']} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""OpenMetrics text exposition rendered from the latest snapshot."""
+
+import os
+import threading
+
+from snapshot import snapshot
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+PREFIX = 'server_monitor'
+MB = 1024 * 1024
+GB = 1024 ** 3
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+
+_cache_lock = threading.Lock()
+_cached_version = -1
+_cached_body = b''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _Family:
+    """Samples of one metric family, emitted under a single TYPE/HELP header."""
+
+    __slots__ = ('name', 'kind', 'help', 'samples')
+
+    def __init__(self, name: str, kind: str, help_text: str):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        if not _is_number(value):
+            return
+        if labels:
+            label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            key = f'{{{label_str}}}'
+        else:
+            key = ''
+        suffix = '_total' if self.kind == 'counter' else ''
+        self.samples.append(f'{PREFIX}_{self.name}{suffix}{key} {value}')
+
+    def render(self, out: list):
+        if not self.samples:
+            return
+        out.append(f'# TYPE {PREFIX}_{self.name} {self.kind}')
+        out.append(f'# HELP {PREFIX}_{self.name} {self.help}')
+        out.extend(self.samples)
+
+
+def _valid(data) -> bool:
+    return isinstance(data, dict) and not data.get('error')
+
+
+def _cpu(data, families):
+    temps = data.get('temperature', {})
+    if _valid(temps):
+        f = families('cpu_temperature_celsius', 'gauge', 'Thermal zone temperature.')
+        for zone, info in temps.items():
+            if isinstance(info, dict):
+                f.add(info.get('temp_celsius'), zone=zone, type=info.get('type', 'unknown'))
+
+    load = data.get('load', {})
+    if _valid(load):
+        f = families('load_average', 'gauge', 'System load average.')
+        for period in ('1min', '5min', '15min'):
+            f.add(load.get(f'load_{period}'), period=period)
+        families('uptime_seconds', 'gauge', 'Host uptime.').add(load.get('uptime_seconds'))
+
+
+def _memory(data, families):
+    if not _valid(data):
+        return
+    f = families('memory_bytes', 'gauge', 'Memory usage by kind.')
+    for kind in ('total', 'used', 'free', 'available', 'buffers', 'cached', 'swap_total', 'swap_used'):
+        value = data.get(f'{kind}_mb')
+        if _is_number(value):
+            f.add(int(value * MB), kind=kind)
+    families('memory_used_percent', 'gauge', 'Memory in use.').add(data.get('percent_used'))
+
+
+def _disk(data, families):
+    if not _valid(data):
+        return
+    sizes = families('disk_bytes', 'gauge', 'Filesystem size by kind.')
+    pct = families('disk_used_percent', 'gauge', 'Filesystem space in use.')
+    for mount, disk in data.items():
+        if not isinstance(disk, dict):
+            continue
+        labels = {'mountpoint': mount, 'device': disk.get('device', ''), 'fstype': disk.get('fstype', '')}
+        for kind, key in (('total', 'total_gb'), ('used', 'used_gb'), ('available', 'available_gb')):
+            value = disk.get(key)
+            if _is_number(value):
+                sizes.add(int(value * GB), kind=kind, **labels)
+        pct.add(disk.get('percent_used'), **labels)
+
+
+def _network(data, families):
+    if not _valid(data) or data.get('_initializing'):
+        return
+    rx = families('network_receive_bytes_per_second', 'gauge', 'Interface receive rate.')
+    tx = families('network_transmit_bytes_per_second', 'gauge', 'Interface transmit rate.')
+    for iface, rates in data.items():
+        if not isinstance(rates, dict) or (iface.startswith('_') and iface != '_total'):
+            continue
+        name = 'total' if iface == '_total' else iface
+        if _is_number(rates.get('rx_mb_per_sec')):
+            rx.add(round(rates['rx_mb_per_sec'] * MB, 1), interface=name)
+        if _is_number(rates.get('tx_mb_per_sec')):
+            tx.add(round(rates['tx_mb_per_sec'] * MB, 1), interface=name)
+
+
+def _smart(data, families):
+    if not _valid(data):
+        return
+    health = families('smart_health_passed', 'gauge', 'SMART overall health (1 = passed).')
+    temp = families('smart_temperature_celsius', 'gauge', 'Drive temperature.')
+    hours = families('smart_power_on_hours', 'gauge', 'Drive power-on hours.')
+    attrs = families('smart_attribute_raw', 'gauge', 'Raw SMART attribute value.')
+    for device, disk in data.items():
+        if not isinstance(disk, dict):
+            continue
+        passed = disk.get('health_passed')
+        if passed is not None:
+            health.add(int(bool(passed)), device=device, model=disk.get('model', ''), serial=disk.get('serial', ''))
+        temp.add(disk.get('temperature_celsius'), device=device)
+        hours.add(disk.get('power_on_hours'), device=device)
+        for attr, values in disk.get('attributes', {}).items():
+            if isinstance(values, dict):
+                attrs.add(values.get('raw'), device=device, attribute=attr)
+
+
+def _docker(data, families):
+    if not _valid(data) or data.get('info'):
+        return
+    state = families('container_state', 'gauge', 'Container state (1 for the current state).')
+    health = families('container_health', 'gauge', 'Container health status (1 for the current status).')
+    cpu = families('container_cpu_percent', 'gauge', 'Container CPU usage.')
+    mem = families('container_memory_bytes', 'gauge', 'Container memory usage.')
+    mem_pct = families('container_memory_percent', 'gauge', 'Container memory usage relative to its limit.')
+    rx = families('container_network_receive_bytes', 'counter', 'Bytes received since container start.')
+    tx = families('container_network_transmit_bytes', 'counter', 'Bytes transmitted since container start.')
+    restarts = families('container_restarts', 'gauge', 'Container restart count.')
+    uptime = families('container_uptime_seconds', 'gauge', 'Container uptime.')
+    for name, info in data.items():
+        if not isinstance(info, dict):
+            continue
+        state.add(1, container=name, image=info.get('image', ''), state=info.get('status', 'unknown'))
+        health.add(1, container=name, health=info.get('health', 'none'))
+        cpu.add(info.get('cpu_percent'), container=name)
+        if _is_number(info.get('memory_mb')):
+            mem.add(int(info['memory_mb'] * MB), container=name)
+        mem_pct.add(info.get('memory_percent'), container=name)
+        if _is_number(info.get('network_rx_mb')):
+            rx.add(int(info['network_rx_mb'] * MB), container=name)
+        if _is_number(info.get('network_tx_mb')):
+            tx.add(int(info['network_tx_mb'] * MB), container=name)
+        restarts.add(info.get('restart_count'), container=name)
+        uptime.add(info.get('uptime_seconds'), container=name)
+
+
+def _processes(data, families):
+    if not _valid(data):
+        return
+    rss = families('process_resident_bytes', 'gauge', 'Resident memory of the top processes.')
+    cpu = families('process_cpu_seconds', 'counter', 'CPU time consumed by the top processes.')
+    for proc in data.get('processes', []):
+        labels = {'pid': proc.get('pid'), 'name': proc.get('name', '')}
+        if _is_number(proc.get('mem_mb')):
+            rss.add(int(proc['mem_mb'] * MB), **labels)
+        if _is_number(proc.get('cpu_jiffies')):
+            cpu.add(round(proc['cpu_jiffies'] / CLOCK_TICKS, 2), **labels)
+
+
+def _services(data, families):
+    if not _valid(data):
+        return
+    f = families('service_running', 'gauge', 'Watched service process present (1 = running).')
+    for service, info in data.items():
+        if isinstance(info, dict):
+            f.add(int(bool(info.get('running'))), service=service)
+
+
+_RENDERERS = (
+    ('cpu', _cpu),
+    ('memory', _memory),
+    ('disk', _disk),
+    ('network', _network),
+    ('smart', _smart),
+    ('docker', _docker),
+    ('processes', _processes),
+    ('services', _services),
+)
+
+
+def render(samples: dict, updated: dict) -> bytes:
+    """Render the given snapshot samples as an OpenMetrics text body."""
+    families = {}
+
+    def family(name, kind, help_text):
+        f = families.get(name)
+        if f is None:
+            f = families[name] = _Family(name, kind, help_text)
+        return f
+
+    for metric_type, renderer in _RENDERERS:
+        data = samples.get(metric_type)
+        if data is not None:
+            renderer(data, family)
+
+    stamps = family('sample_timestamp_seconds', 'gauge', 'Unix time of the latest sample per metric type.')
+    for metric_type, ts in sorted(updated.items()):
+        stamps.add(round(ts, 3), metric_type=metric_type)
+
+    out = []
+    for f in families.values():
+        f.render(out)
+    out.append('# EOF')
+    return ('\n'.join(out) + '\n').encode('utf-8')
+
+
+def get_exposition() -> bytes:
+    """Return the encoded exposition, re-rendering only when the snapshot has changed."""
+    global _cached_version, _cached_body
+
+    if snapshot.version == _cached_version:
+        return _cached_body
+
+    with _cache_lock:
+        version, samples, updated = snapshot.read()
+        if version != _cached_version:
+            _cached_body = render(samples, updated)
+            _cached_version = version
+        return _cached_body
@@ -0,0 +1,382 @@
+"""Trend forecasts for disk space and SMART attributes.
+
+Every disk mount's free space and every drive's temperature and
+reallocated, pending and uncorrectable sector counts is a series, fitted
+with an exponentially weighted least-squares line: recent samples count
+most, and a sample's weight halves every ``half_life`` days. The fit of a
+series needs only five running sums, so new samples are folded into the
+sums as they are stored, instead of refitting the stored history.
+
+All series are held in parallel arrays and folded together: a batch of
+samples (one for the newest rows, thousands when a process first reads
+the window) is one pass of NumPy over every series at once. NumPy is
+used when installed, with a pure Python fallback.
+
+From each line: the slope per day and, for disks, the days until free
+space reaches zero at that slope.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from database import get_metrics_since, LOCAL_HOST
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# SMART raw counters a failing drive grows
+SMART_COUNTERS = ('Reallocated_Sector_Ct', 'Current_Pending_Sector', 'Offline_Uncorrectable')
+
+# A series is forecast once it has this many samples spanning this long
+MIN_SAMPLES = 10
+MIN_SPAN_DAYS = 0.25
+
+# History read when a process first forecasts a host, in half-lives;
+# older samples would weigh under 1/16 together
+BOOTSTRAP_HALF_LIVES = 4
+
+# Rows per read while catching up
+PAGE_ROWS = 5000
+
+_SECONDS_PER_DAY = 86400.0
+
+# Columns of the per-series state
+_S0, _S1, _S2, _SY, _S1Y, _LAST_T, _FIRST_T, _LAST_Y, _COUNT = range(9)
+_COLUMNS = 9
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+        return float(value)
+    return None
+
+
+def _disk_samples(data: dict):
+    """((mount, 'available_gb'), value) per mount."""
+    for mount, disk in data.items():
+        if isinstance(disk, dict):
+            value = _number(disk.get('available_gb'))
+            if value is not None:
+                yield (mount, 'available_gb'), value
+
+
+def _smart_samples(data: dict):
+    """((device, field), value) per drive for temperature and the SMART_COUNTERS raw values."""
+    for device, drive in data.items():
+        if not isinstance(drive, dict) or drive.get('error'):
+            continue
+        value = _number(drive.get('temperature_celsius'))
+        if value is not None:
+            yield (device, 'temperature_celsius'), value
+        attributes = drive.get('attributes') or {}
+        for name in SMART_COUNTERS:
+            attribute = attributes.get(name)
+            value = _number(attribute.get('raw')) if isinstance(attribute, dict) else None
+            if value is not None:
+                yield (device, name), value
+
+
+SAMPLES = {
+    'disk': _disk_samples,
+    'smart': _smart_samples,
+}
+
+
+def _days(timestamp: str) -> float:
+    """A 'YYYY-MM-DD HH:MM:SS' UTC timestamp as days since the epoch."""
+    return datetime.fromisoformat(timestamp + '+00:00').timestamp() / _SECONDS_PER_DAY
+
+
+def _fold_numpy(state, idx: list, t: list, y: list, tau: float):
+    # Oldest first, so each series' last sample in the batch is its newest
+    order = np.argsort(np.asarray(t, dtype=float), kind='stable')
+    idx = np.asarray(idx, dtype=np.intp)[order]
+    t = np.asarray(t, dtype=float)[order]
+    y = np.asarray(y, dtype=float)[order]
+    n = len(state)
+
+    # Each touched series moves its origin to its newest sample
+    batch_last = np.full(n, -np.inf)
+    np.maximum.at(batch_last, idx, t)
+    touched = np.isfinite(batch_last)
+    last = np.where(touched, np.maximum(state[:, _LAST_T], batch_last), state[:, _LAST_T])
+
+    # Shift the existing sums to the new origin (u -> u - d), decayed by exp(-d / tau)
+    d = np.where(touched & (state[:, _COUNT] > 0), last - state[:, _LAST_T], 0.0)
+    w = np.exp(-d / tau)
+    s0, s1, sy = state[:, _S0].copy(), state[:, _S1].copy(), state[:, _SY].copy()
+    state[:, _S2] = w * (state[:, _S2] - 2 * d * s1 + d * d * s0)
+    state[:, _S1Y] = w * (state[:, _S1Y] - d * sy)
+    state[:, _S1] = w * (s1 - d * s0)
+    state[:, _S0] = w * s0
+    state[:, _SY] = w * sy
+
+    # Then add the batch, each sample at its age u <= 0 from the new origin
+    u = t - last[idx]
+    wu = np.exp(u / tau)
+    for column, weights in ((_S0, wu), (_S1, wu * u), (_S2, wu * u * u),
+                            (_SY, wu * y), (_S1Y, wu * u * y)):
+        state[:, column] += np.bincount(idx, weights, minlength=n)
+    state[:, _COUNT] += np.bincount(idx, minlength=n)
+
+    newest = np.full(n, -1)
+    np.maximum.at(newest, idx, np.arange(len(idx)))
+    newer = touched & (batch_last >= state[:, _LAST_T])
+    state[newer, _LAST_Y] = y[newest[newer]]
+    first = np.full(n, np.inf)
+    np.minimum.at(first, idx, t)
+    state[:, _FIRST_T] = np.minimum(state[:, _FIRST_T], first)
+    state[:, _LAST_T] = last
+
+
+def _fold_python(state, idx: list, t: list, y: list, tau: float):
+    for i, ti, yi in zip(idx, t, y):
+        row = state[i]
+        if row[_COUNT] and ti > row[_LAST_T]:
+            d = ti - row[_LAST_T]
+            w = math.exp(-d / tau)
+            s0, s1, sy = row[_S0], row[_S1], row[_SY]
+            row[_S2] = w * (row[_S2] - 2 * d * s1 + d * d * s0)
+            row[_S1Y] = w * (row[_S1Y] - d * sy)
+            row[_S1] = w * (s1 - d * s0)
+            row[_S0] = w * s0
+            row[_SY] = w * sy
+        if not row[_COUNT] or ti >= row[_LAST_T]:
+            row[_LAST_T] = ti
+            row[_LAST_Y] = yi
+        u = ti - row[_LAST_T]
+        wu = math.exp(u / tau)
+        row[_S0] += wu
+        row[_S1] += wu * u
+        row[_S2] += wu * u * u
+        row[_SY] += wu * yi
+        row[_S1Y] += wu * u * yi
+        row[_COUNT] += 1
+        row[_FIRST_T] = min(row[_FIRST_T], ti)
+
+
+class TrendSet:
+    """
+    Weighted least-squares sums of many series, one row of state per series.
+
+    Sample times are kept relative to each series' newest sample, so the
+    sums stay small and exact however long the process runs.
+    """
+
+    def __init__(self, half_life_days: float):
+        self.tau = half_life_days / math.log(2)
+        self.keys = []
+        self._index = {}
+        self._state = np.zeros((0, _COLUMNS)) if NUMPY_AVAILABLE else []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _row(self, key) -> int:
+        i = self._index.get(key)
+        if i is None:
+            i = self._index[key] = len(self.keys)
+            self.keys.append(key)
+            empty = [0.0] * _COLUMNS
+            empty[_LAST_T], empty[_FIRST_T] = -math.inf, math.inf
+            if NUMPY_AVAILABLE:
+                self._state = np.vstack((self._state, empty))
+            else:
+                self._state.append(empty)
+        return i
+
+    def fold(self, keys: list, t: list, y: list):
+        """Add samples: ``keys[i]`` had value ``y[i]`` at ``t[i]`` (days), in any order."""
+        if not keys:
+            return
+        idx = [self._row(key) for key in keys]
+        if NUMPY_AVAILABLE:
+            _fold_numpy(self._state, idx, t, y, self.tau)
+        else:
+            order = sorted(range(len(idx)), key=t.__getitem__)
+            _fold_python(self._state, [idx[i] for i in order], [t[i] for i in order], [y[i] for i in order], self.tau)
+
+    def fits(self, now: float) -> dict:
+        """
+        {key: fit} for series with enough samples; a fit has the fitted
+        ``level`` at ``now`` (days), ``per_day`` slope, last ``value``,
+        ``samples`` and ``span_days``.
+        """
+        if not self.keys:
+            return {}
+        if NUMPY_AVAILABLE:
+            columns = self._state.T
+        else:
+            columns = [list(column) for column in zip(*self._state)]
+        fits = {}
+        for key, (slope, level, span, value, count) in zip(self.keys, _solve(columns, now)):
+            if count >= MIN_SAMPLES and span >= MIN_SPAN_DAYS and slope is not None:
+                fits[key] = {
+                    'value': value,
+                    'level': level,
+                    'per_day': slope,
+                    'samples': count,
+                    'span_days': round(span, 2),
+                }
+        return fits
+
+
+def _solve(columns, now: float):
+    """(slope, level at ``now``, span, last value, samples) per series; slope None if the fit is singular."""
+    s0, s1, s2, sy, s1y = columns[_S0], columns[_S1], columns[_S2], columns[_SY], columns[_S1Y]
+    last_t, first_t, last_y, count = columns[_LAST_T], columns[_FIRST_T], columns[_LAST_Y], columns[_COUNT]
+    if NUMPY_AVAILABLE:
+        det = s0 * s2 - s1 * s1
+        solvable = det > 1e-12 * s0 * s0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(solvable, (s0 * s1y - s1 * sy) / det, np.nan)
+            level = (sy - slope * s1) / s0 + slope * (now - last_t)
+        for row in zip(slope.tolist(), level.tolist(), (last_t - first_t).tolist(), last_y.tolist(), count.tolist()):
+            yield (None if row[0] != row[0] else row[0]), row[1], row[2], row[3], int(row[4])
+        return
+    for i in range(len(s0)):
+        det = s0[i] * s2[i] - s1[i] * s1[i]
+        if det <= 1e-12 * s0[i] * s0[i]:
+            yield None, None, last_t[i] - first_t[i], last_y[i], int(count[i])
+            continue
+        slope = (s0[i] * s1y[i] - s1[i] * sy[i]) / det
+        level = (sy[i] - slope * s1[i]) / s0[i] + slope * (now - last_t[i])
+        yield slope, level, last_t[i] - first_t[i], last_y[i], int(count[i])
+
+
+def _timestamp(days: float) -> str:
+    return (datetime(1970, 1, 1) + timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class Forecaster:
+    """
+    Trends of one host, caught up from the stored history on demand.
+
+    Each ``update`` reads the rows stored since the previous one (one
+    keyset seek per type) and folds them in; the first reads the last
+    ``BOOTSTRAP_HALF_LIVES`` half-lives. Calls within ``refresh_seconds``
+    of the last update reuse it.
+    """
+
+    def __init__(self, host: str = LOCAL_HOST, half_life_hours: float = 72, refresh_seconds: float = 60):
+        self.host = host
+        self.half_life_hours = half_life_hours
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._trends = TrendSet(half_life_hours / 24)
+        self._cursors = {metric_type: ('', 0) for metric_type in SAMPLES}
+        self._totals = {}
+        self._updated = None
+
+    def update(self, force: bool = False):
+        with self._lock:
+            if not force and self._updated is not None and time.monotonic() - self._updated < self.refresh_seconds:
+                return
+            hours = math.ceil(self.half_life_hours * BOOTSTRAP_HALF_LIVES)
+            for metric_type in SAMPLES:
+                more = True
+                while more:
+                    rows, self._cursors[metric_type], more = get_metrics_since(
+                        metric_type, self._cursors[metric_type], hours=hours, limit=PAGE_ROWS, host=self.host
+                    )
+                    self._fold(metric_type, rows)
+            self._updated = time.monotonic()
+
+    def _fold(self, metric_type: str, rows: list):
+        keys, t, y = [], [], []
+        samples = SAMPLES[metric_type]
+        for row in rows:
+            data = row['data']
+            if not isinstance(data, dict) or data.get('error'):
+                continue
+            moment = _days(row['timestamp'])
+            for key, value in samples(data):
+                keys.append((metric_type,) + key)
+                t.append(moment)
+                y.append(value)
+            if metric_type == 'disk':
+                for mount, disk in data.items():
+                    if isinstance(disk, dict) and _number(disk.get('total_gb')) is not None:
+                        self._totals[mount] = disk['total_gb']
+        self._trends.fold(keys, t, y)
+
+    def forecast(self) -> dict:
+        """Disk time-to-full per mount and SMART trends per drive, from the current fits."""
+        now = time.time() / _SECONDS_PER_DAY
+        with self._lock:
+            fits = self._trends.fits(now)
+            totals = dict(self._totals)
+
+        disks, drives = {}, {}
+        for (metric_type, group, field), fit in sorted(fits.items()):
+            if metric_type == 'disk':
+                disks[group] = _disk_forecast(fit, totals.get(group), now)
+            else:
+                drives.setdefault(group, {})[field] = _smart_trend(field, fit)
+        return {
+            'host': self.host,
+            'half_life_hours': self.half_life_hours,
+            'disk': disks,
+            'smart': drives,
+        }
+
+
+def _disk_forecast(fit: dict, total_gb, now: float) -> dict:
+    """Time until free space runs out; None while it is not shrinking."""
+    available, per_day = max(fit['level'], 0.0), fit['per_day']
+    forecast = {
+        'available_gb': round(fit['value'], 2),
+        'total_gb': total_gb,
+        'used_gb_per_day': round(-per_day, 3),
+        'days_to_full': None,
+        'full_at': None,
+        'samples': fit['samples'],
+        'span_days': fit['span_days'],
+    }
+    # Beyond a century a shrinking trend is noise, and the date may not be representable
+    if per_day < 0 and available / -per_day < 36500:
+        days = available / -per_day
+        forecast['days_to_full'] = round(days, 2)
+        forecast['full_at'] = _timestamp(now + days)
+    return forecast
+
+
+def _smart_trend(field: str, fit: dict) -> dict:
+    trend = {
+        'value': fit['value'],
+        'per_day': round(fit['per_day'], 4),
+        'samples': fit['samples'],
+        'span_days': fit['span_days'],
+    }
+    if field in SMART_COUNTERS:
+        # At least one more sector over the fitted span, not a rounding wobble
+        trend['growing'] = fit['per_day'] > 0 and fit['per_day'] * fit['span_days'] >= 1
+    return trend
+
+
+_forecasters = {}
+_forecasters_lock = threading.Lock()
+
+
+def get_forecaster(host: str = LOCAL_HOST) -> Forecaster:
+    """The process-wide forecaster of ``host``, created on first use."""
+    with _forecasters_lock:
+        forecaster = _forecasters.get(host)
+        if forecaster is None:
+            forecaster = _forecasters[host] = Forecaster(
+                host, Config.FORECAST_HALF_LIFE_HOURS, Config.FORECAST_REFRESH_SECONDS
+            )
+        return forecaster
+
+
+def get_forecast(host: str = LOCAL_HOST) -> dict:
+    """``host``'s forecast, first folding in samples stored since the last one."""
+    forecaster = get_forecaster(host)
+    forecaster.update()
+    return forecaster.forecast()
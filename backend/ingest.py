@@ -0,0 +1,197 @@
+"""Ingestion of sample batches pushed by agents (agent.py).
+
+A batch is JSON, usually gzip-compressed:
+
+    {"host": "web-3", "samples": [["cpu", "2026-01-01 12:00:00", {...}], ...],
+     "sketches": [["cpu", "2026-01-01 11:55:00", {"load.load_1min": {...}}], ...]}
+
+``sketches`` (optional) are the agent's quantile sketches per collection
+bucket (sketch.py), keyed by bucket start.
+
+Batches are validated in the request thread and handed to one writer
+thread, which inserts every batch queued in the meantime in a single
+transaction (group commit). Fifty agents reporting at once then cost one
+write lock, not fifty, and the request returns once its rows are
+committed, so an agent only deletes a batch the aggregator has stored.
+"""
+
+import logging
+import queue
+import re
+import threading
+import zlib
+from datetime import datetime
+
+from database import bulk_insert_batches, LOCAL_HOST
+from instrumentation import increment, timed
+from serialization import dumps, loads
+from sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Stored history types an agent may push
+INGEST_METRIC_TYPES = frozenset({'cpu', 'memory', 'disk', 'smart', 'drives', 'docker', 'processes', 'network'})
+
+# Host names double as archive directory names
+HOST_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,62}$')
+
+# Upper bound on a decompressed batch; a day of spooled samples fits easily
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+
+# Batches committed per transaction, and how long a request waits for it
+MAX_GROUP = 200
+COMMIT_TIMEOUT_SECONDS = 30
+
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def is_valid_host(host: str) -> bool:
+    """True for agent host names; the local host ('') is not one."""
+    return bool(HOST_PATTERN.match(host or ''))
+
+
+def _check_timestamp(timestamp):
+    try:
+        datetime.strptime(timestamp, _TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timestamp {timestamp!r}; expected 'YYYY-MM-DD HH:MM:SS' UTC")
+
+
+def decode_batch(body: bytes, content_encoding: str = '') -> tuple:
+    """
+    Validate a pushed batch into (host, rows, sketches).
+
+    Rows and sketches are [(metric_type, timestamp, JSON bytes)].
+
+    Raises ValueError describing the first problem found.
+    """
+    if content_encoding.strip().lower() == 'gzip':
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            body = decompressor.decompress(body, MAX_BATCH_BYTES)
+        except zlib.error as e:
+            raise ValueError(f'Invalid gzip body: {e}')
+        if decompressor.unconsumed_tail:
+            raise ValueError(f'Batch larger than {MAX_BATCH_BYTES} bytes uncompressed')
+    elif content_encoding.strip():
+        raise ValueError(f'Unsupported Content-Encoding: {content_encoding}')
+
+    try:
+        batch = loads(body)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON: {e}')
+    if not isinstance(batch, dict) or not isinstance(batch.get('samples'), list):
+        raise ValueError('Expected an object with "host" and a "samples" list')
+
+    host = batch.get('host')
+    if not isinstance(host, str) or not is_valid_host(host):
+        raise ValueError(f'Invalid host name: {host!r}')
+
+    rows = []
+    for sample in batch['samples']:
+        if not isinstance(sample, list) or len(sample) != 3:
+            raise ValueError('Each sample must be [metric_type, timestamp, data]')
+        metric_type, timestamp, data = sample
+        if metric_type not in INGEST_METRIC_TYPES:
+            raise ValueError(f'Invalid metric type: {metric_type!r}')
+        _check_timestamp(timestamp)
+        if not isinstance(data, dict):
+            raise ValueError(f'Sample data must be an object ({metric_type} {timestamp})')
+        rows.append((metric_type, timestamp, dumps(data)))
+
+    sketches = []
+    if not isinstance(batch.get('sketches', []), list):
+        raise ValueError('"sketches" must be a list')
+    for item in batch.get('sketches', []):
+        if not isinstance(item, list) or len(item) != 3:
+            raise ValueError('Each sketch must be [metric_type, bucket start, {field: sketch}]')
+        metric_type, timestamp, fields = item
+        if metric_type not in INGEST_METRIC_TYPES:
+            raise ValueError(f'Invalid metric type: {metric_type!r}')
+        _check_timestamp(timestamp)
+        if not isinstance(fields, dict):
+            raise ValueError(f'Sketches must be an object ({metric_type} {timestamp})')
+        for path, data in fields.items():
+            try:
+                QuantileSketch.from_dict(data)
+            except ValueError as e:
+                raise ValueError(f'{e} ({metric_type} {timestamp} {path})')
+        sketches.append((metric_type, timestamp, dumps(fields)))
+    return host, rows, sketches
+
+
+class _Pending:
+    __slots__ = ('host', 'rows', 'sketches', 'inserted', 'error', 'done')
+
+    def __init__(self, host: str, rows: list, sketches: list):
+        self.host = host
+        self.rows = rows
+        self.sketches = sketches
+        self.inserted = 0
+        self.error = None
+        self.done = threading.Event()
+
+
+class IngestWriter:
+    """Single writer thread that group-commits queued batches."""
+
+    def __init__(self, max_group: int = MAX_GROUP):
+        self.max_group = max_group
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, host: str, rows: list, sketches: list = (), timeout: float = COMMIT_TIMEOUT_SECONDS) -> int:
+        """Queue a batch and wait until it is committed; returns rows inserted.
+
+        Raises TimeoutError if the commit takes longer than ``timeout``
+        (the batch may still be stored; agents resend and duplicates are
+        skipped), or the database error that failed the transaction.
+        """
+        if host == LOCAL_HOST:
+            raise ValueError('Agent batches need a host name')
+        self._ensure_started()
+        pending = _Pending(host, rows, sketches)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError('Timed out waiting for the batch to be committed')
+        if pending.error is not None:
+            raise pending.error
+        return pending.inserted
+
+    def _run(self):
+        while True:
+            group = [self._queue.get()]
+            while len(group) < self.max_group:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with timed('ingest', 'commit'):
+                    counts = bulk_insert_batches(
+                        [(p.host, p.rows) for p in group],
+                        sketches=[(p.host, *sketch) for p in group for sketch in p.sketches]
+                    )
+                for pending, count in zip(group, counts):
+                    pending.inserted = count
+                increment('ingest', 'commits')
+                increment('ingest', 'batches', len(group))
+                increment('ingest', 'rows', sum(counts))
+            except Exception as e:
+                logger.error(f"Error storing {len(group)} agent batches: {e}")
+                for pending in group:
+                    pending.error = e
+            finally:
+                for pending in group:
+                    pending.done.set()
+
+
+ingest_writer = IngestWriter()
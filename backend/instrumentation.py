@@ -0,0 +1,132 @@
+"""Self-instrumentation: timing histograms and counters for the monitor itself."""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_started = time.time()
+
+
+class Histogram:
+    """Cumulative-bucket timing histogram."""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        i = 0
+        for bound in BUCKETS:
+            if seconds <= bound:
+                break
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(BUCKETS + ('+Inf',), self.buckets):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.total, 6),
+            'avg_seconds': round(self.total / self.count, 6) if self.count else 0,
+            'max_seconds': round(self.max, 6),
+            'buckets': buckets
+        }
+
+
+def observe(group: str, name: str, seconds: float):
+    """Record a duration under group/name."""
+    with _lock:
+        hist = _histograms.setdefault(group, {}).get(name)
+        if hist is None:
+            hist = _histograms[group][name] = Histogram()
+        hist.observe(seconds)
+
+
+def increment(group: str, name: str, amount: int = 1):
+    """Increment the counter group/name."""
+    with _lock:
+        counters = _counters.setdefault(group, {})
+        counters[name] = counters.get(name, 0) + amount
+
+
+@contextmanager
+def timed(group: str, name: str):
+    """Context manager recording the wall time of its body."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(group, name, time.perf_counter() - start)
+
+
+def instrument(group: str, name: str = None):
+    """Decorator recording the wall time of every call."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(group, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _process_stats() -> dict:
+    """RSS and CPU time of the monitor process itself."""
+    rss_mb = None
+    try:
+        # Always the real /proc: this is our own process, not the host's
+        with open('/proc/self/statm', 'r') as f:
+            rss_mb = round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+
+    times = os.times()
+    uptime = time.time() - _started
+    cpu_seconds = times.user + times.system
+    return {
+        'pid': os.getpid(),
+        'rss_mb': rss_mb,
+        'cpu_user_seconds': round(times.user, 2),
+        'cpu_system_seconds': round(times.system, 2),
+        'cpu_percent_avg': round(cpu_seconds / uptime * 100, 2) if uptime > 0 else 0,
+        'threads': threading.active_count(),
+        'uptime_seconds': int(uptime)
+    }
+
+
+def get_snapshot() -> dict:
+    """Return all histograms, counters and process stats."""
+    with _lock:
+        timings = {
+            group: {name: hist.to_dict() for name, hist in hists.items()}
+            for group, hists in _histograms.items()
+        }
+        counters = {group: dict(values) for group, values in _counters.items()}
+
+    return {
+        'timings': timings,
+        'counters': counters,
+        'process': _process_stats()
+    }
@@ -0,0 +1,334 @@
+"""Outbound notifications of stored alerts: webhook, e-mail and script.
+
+The collector hands the alerts stored in one collection pass to
+``notifier.submit``, which only queues them and returns. Each configured
+target has its own worker thread and bounded queue, so an unreachable or
+slow receiver delays neither collection nor the other targets; when a
+queue is full, the newest batch is dropped and counted.
+
+A worker sends everything queued for its target as one message: the
+alerts of one pass, plus any that arrived while it was waiting. It waits
+while the target has had NOTIFY_MAX_PER_HOUR messages in the last hour,
+and retries a failed send with exponential backoff, up to NOTIFY_RETRIES
+times. Alerts queued meanwhile join the message being retried.
+
+Every target is configured by address, so a local stand-in (``python -m
+http.server``-style receiver, a debugging SMTP server, ``cat`` as the
+script) can replace the real one. ``python notify.py --test`` sends a
+test message to each configured target and reports the outcome.
+
+/api/metrics/internal has each target's queue depth under ``notify`` and
+its messages sent, retried, failed and dropped under ``counters.notify``.
+"""
+
+import argparse
+import logging
+import queue
+import shlex
+import smtplib
+import socket
+import subprocess
+import threading
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime
+from email.message import EmailMessage
+
+from config import Config
+from instrumentation import increment, timed
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+LEVEL_ORDER = {'warning': 1, 'critical': 2}
+
+# Longest wait between retries of one message
+MAX_BACKOFF_SECONDS = 600
+
+
+def format_message(alerts: list, host: str) -> dict:
+    """
+    The message for a list of alert dicts (level, metric, message, timestamp).
+
+    ``text`` is a plain summary with one line per alert, so chat webhooks
+    (Slack, Mattermost, Discord-compatible) can post it as it is.
+    """
+    counts = {}
+    for alert in alerts:
+        counts[alert['level']] = counts.get(alert['level'], 0) + 1
+    summary = ', '.join(f'{counts[level]} {level}' for level in ('critical', 'warning') if counts.get(level))
+    summary = f'{summary or "no"} alert{"s" if len(alerts) != 1 else ""} on {host}'
+    ordered = sorted(alerts, key=lambda a: (-LEVEL_ORDER.get(a['level'], 0), a['timestamp']))
+    lines = [f"{a['level'].upper()} {a['metric']}: {a['message']}" for a in ordered]
+    return {
+        'host': host,
+        'summary': summary,
+        'text': '\n'.join([summary] + lines),
+        'alerts': ordered,
+    }
+
+
+class WebhookTarget:
+    """POSTs the message as JSON; any non-2xx response is a failure."""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, message: dict):
+        request = urllib.request.Request(
+            self.url, data=dumps(message), method='POST',
+            headers={'Content-Type': 'application/json', 'User-Agent': 'server-monitor'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SmtpTarget:
+    """Sends the message's text as an e-mail, with the summary as the subject."""
+
+    name = 'email'
+
+    def __init__(self, host: str, port: int, sender: str, recipients: list, timeout: float,
+                 user: str = '', password: str = '', starttls: bool = False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.timeout = timeout
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+
+    def send(self, message: dict):
+        email = EmailMessage()
+        email['Subject'] = f"[server-monitor] {message['summary']}"
+        email['From'] = self.sender
+        email['To'] = ', '.join(self.recipients)
+        email.set_content(message['text'])
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            smtp.send_message(email)
+
+
+class ScriptTarget:
+    """Runs a command with the message as JSON on stdin; a non-zero exit is a failure."""
+
+    name = 'script'
+
+    def __init__(self, command: str, timeout: float):
+        self.args = shlex.split(command)
+        self.timeout = timeout
+
+    def send(self, message: dict):
+        result = subprocess.run(self.args, input=dumps(message), capture_output=True, timeout=self.timeout)
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', 'replace').strip()[-200:]
+            raise RuntimeError(f'exit status {result.returncode}: {stderr}')
+
+
+class TargetWorker:
+    """One target's queue and delivery thread; see the module docstring."""
+
+    def __init__(self, target, host: str, queue_size: int, max_per_hour: int,
+                 retries: int, retry_seconds: float):
+        self.target = target
+        self.host = host
+        self.max_per_hour = max_per_hour
+        self.retries = retries
+        self.retry_seconds = retry_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._sent = deque()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def put(self, alerts: list) -> bool:
+        """Queue a batch without waiting; False if the queue is full and it was dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(alerts)
+            return True
+        except queue.Full:
+            increment('notify', f'{self.target.name}_dropped')
+            logger.warning(f"Notification queue for {self.target.name} is full; dropped {len(alerts)} alerts")
+            return False
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name=f'notify-{self.target.name}', daemon=True
+                    )
+                    self._thread.start()
+
+    def _drain(self, alerts: list) -> list:
+        while True:
+            try:
+                alerts.extend(self._queue.get_nowait())
+            except queue.Empty:
+                return alerts
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                alerts = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._wait_for_rate()
+            self._deliver(self._drain(list(alerts)))
+
+    def _wait_for_rate(self):
+        """Block until one more message fits in NOTIFY_MAX_PER_HOUR."""
+        if self.max_per_hour <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            while self._sent and now - self._sent[0] >= 3600:
+                self._sent.popleft()
+            if len(self._sent) < self.max_per_hour:
+                return
+            increment('notify', f'{self.target.name}_rate_limited')
+            if self._stopping.wait(3600 - (now - self._sent[0])):
+                return
+
+    def _deliver(self, alerts: list):
+        for attempt in range(self.retries + 1):
+            message = format_message(alerts, self.host)
+            try:
+                with timed('notify', self.target.name):
+                    self.target.send(message)
+                self._sent.append(time.monotonic())
+                increment('notify', f'{self.target.name}_sent')
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    increment('notify', f'{self.target.name}_failed')
+                    logger.error(f"Giving up on {self.target.name} notification of {len(alerts)} alerts: {e}")
+                    return
+                delay = min(self.retry_seconds * 2 ** attempt, MAX_BACKOFF_SECONDS)
+                increment('notify', f'{self.target.name}_retried')
+                logger.warning(f"{self.target.name} notification failed ({e}); retrying in {delay:g}s")
+                if self._stopping.wait(delay):
+                    return
+                # Alerts queued while waiting go out with this message
+                self._drain(alerts)
+
+
+class Notifier:
+    """Fans each batch of stored alerts out to every target's worker."""
+
+    def __init__(self, targets: list, min_level: str = 'warning', host: str = None, queue_size: int = 100,
+                 max_per_hour: int = 20, retries: int = 5, retry_seconds: float = 5):
+        if min_level not in LEVEL_ORDER:
+            raise ValueError(f'Invalid notification level {min_level!r}; expected one of {sorted(LEVEL_ORDER)}')
+        self.min_level = LEVEL_ORDER[min_level]
+        self.host = host or socket.gethostname()
+        self.workers = [
+            TargetWorker(target, self.host, queue_size, max_per_hour, retries, retry_seconds)
+            for target in targets
+        ]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.workers)
+
+    def submit(self, alerts: list):
+        """Queue the alerts stored in one collection pass as one message; never blocks."""
+        if not self.workers:
+            return
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        batch = [
+            {'level': a.level, 'metric': a.metric, 'message': a.message, 'timestamp': now}
+            for a in alerts if LEVEL_ORDER.get(a.level, 0) >= self.min_level
+        ]
+        if not batch:
+            return
+        for worker in self.workers:
+            worker.put(list(batch))
+
+    def stats(self) -> dict:
+        """Configured targets and the batches waiting in each one's queue."""
+        return {
+            'min_level': next(name for name, order in LEVEL_ORDER.items() if order == self.min_level),
+            'queued': {worker.target.name: worker.queued() for worker in self.workers},
+        }
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+def targets_from_config() -> list:
+    """The targets configured in Config; an empty list disables notifications."""
+    c = Config
+    targets = []
+    if c.NOTIFY_WEBHOOK_URL:
+        targets.append(WebhookTarget(c.NOTIFY_WEBHOOK_URL, c.NOTIFY_TIMEOUT_SECONDS))
+    if c.NOTIFY_SMTP_HOST and c.NOTIFY_EMAIL_TO:
+        targets.append(SmtpTarget(
+            c.NOTIFY_SMTP_HOST, c.NOTIFY_SMTP_PORT, c.NOTIFY_EMAIL_FROM, c.NOTIFY_EMAIL_TO,
+            c.NOTIFY_TIMEOUT_SECONDS, c.NOTIFY_SMTP_USER, c.NOTIFY_SMTP_PASSWORD, c.NOTIFY_SMTP_STARTTLS
+        ))
+    if c.NOTIFY_SCRIPT:
+        targets.append(ScriptTarget(c.NOTIFY_SCRIPT, c.NOTIFY_TIMEOUT_SECONDS))
+    return targets
+
+
+def _build_notifier() -> Notifier:
+    c = Config
+    kwargs = dict(queue_size=c.NOTIFY_QUEUE_SIZE, max_per_hour=c.NOTIFY_MAX_PER_HOUR,
+                  retries=c.NOTIFY_RETRIES, retry_seconds=c.NOTIFY_RETRY_SECONDS)
+    try:
+        return Notifier(targets_from_config(), c.NOTIFY_MIN_LEVEL, **kwargs)
+    except ValueError as e:
+        logger.error(f"Notifications disabled: {e}")
+        return Notifier([], **kwargs)
+
+
+notifier = _build_notifier()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--test', action='store_true', help='send a test message to every configured target')
+    args = parser.parse_args()
+    if not args.test:
+        parser.print_help()
+        return
+
+    targets = targets_from_config()
+    if not targets:
+        raise SystemExit('No notification targets configured (NOTIFY_WEBHOOK_URL, NOTIFY_SMTP_HOST, NOTIFY_SCRIPT)')
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    message = format_message(
+        [{'level': 'warning', 'metric': 'test', 'message': 'Test notification from server-monitor', 'timestamp': now}],
+        socket.gethostname()
+    )
+    failed = False
+    for target in targets:
+        try:
+            target.send(message)
+            print(f'{target.name}: sent')
+        except Exception as e:
+            failed = True
+            print(f'{target.name}: failed: {e}')
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
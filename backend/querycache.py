@@ -0,0 +1,277 @@
+"""Bounded in-process cache of read-query results.
+
+Results are held in LRU order under both an entry and a byte budget.
+Each entry carries tags: a (host, metric_type) series, 'alerts' or
+'stats'. A write made through this process either updates the entries of
+the tags it touched (a stored sample is appended to cached history
+windows) or drops them.
+
+Writes made by other processes (another gunicorn worker ingesting, the
+standalone collector, export.py imports) are noticed through SQLite's
+file change counter, which every committed write transaction
+increments: when it differs from the value the cache was last valid
+for, everything is dropped. The caller reads the counter and passes it
+to ``sync`` before each lookup.
+
+A result computed on a miss is only stored if nothing it depends on
+changed while it was computed (``token``/``put``), so a slow query can
+never overwrite a newer entry with older data.
+"""
+
+import bisect
+import threading
+from collections import OrderedDict
+
+from instrumentation import increment
+
+# Rough per-row overhead of a cached history row beyond its payload bytes
+_ROW_OVERHEAD = 120
+
+
+class HistoryWindow:
+    """
+    The newest rows of one series, as cached for a history window.
+
+    ``rows`` are (timestamp, id, JSON bytes) oldest-first. ``complete``
+    means no rows older than the first one were in the window when it
+    was read; otherwise ``limit`` cut the window short and older rows
+    exist.
+    """
+
+    __slots__ = ('hours', 'limit', 'window_start', 'rows', 'keys', 'complete', 'size')
+
+    def __init__(self, hours: int, limit: int, window_start: str, rows: list, complete: bool):
+        self.hours = hours
+        self.limit = limit
+        self.window_start = window_start
+        self.rows = rows
+        self.keys = [(row[0], row[1]) for row in rows]
+        self.complete = complete
+        self.size = sum(len(row[2]) for row in rows) + _ROW_OVERHEAD * (len(rows) + 1)
+
+    def covers(self, after: tuple, max_row_id: int) -> bool:
+        """True if every row above the ``after`` keyset is in this window."""
+        if self.complete:
+            return after >= (self.window_start, max_row_id)
+        return bool(self.keys) and after >= self.keys[0]
+
+    def page(self, window_start: str) -> tuple:
+        """(rows oldest-first, keyset of the next older page or None) for a window starting now."""
+        first = bisect.bisect_right(self.keys, (window_start, float('inf')))
+        rows = self.rows[first:]
+        next_page = None
+        if first == 0 and not self.complete and rows:
+            next_page = self.keys[0]
+        return rows, next_page
+
+    def after(self, after: tuple, limit: int) -> tuple:
+        """(rows above ``after`` oldest-first, up to ``limit``; True if more were cut off)."""
+        first = bisect.bisect_right(self.keys, after)
+        rows = self.rows[first:first + limit]
+        return rows, len(self.rows) - first > limit
+
+    def append(self, timestamp: str, row_id: int, payload) -> bool:
+        """
+        Add a newly stored row; False if the window cannot be extended.
+
+        ``payload`` is the row's JSON bytes, or None for an unchanged
+        marker, which repeats the newest cached payload.
+        """
+        key = (timestamp, row_id)
+        if self.keys and key <= self.keys[-1]:
+            return False
+        if payload is None:
+            if not self.rows:
+                return False
+            payload = self.rows[-1][2]
+        self.rows.append((timestamp, row_id, payload))
+        self.keys.append(key)
+        self.size += len(payload) + _ROW_OVERHEAD
+        if len(self.rows) > self.limit:
+            dropped = self.rows.pop(0)
+            self.keys.pop(0)
+            self.size -= len(dropped[2]) + _ROW_OVERHEAD
+            self.complete = False
+        return True
+
+
+class QueryCache:
+    """LRU result cache with tag invalidation, capped by entries and bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> (value, size, tags)
+        self._tagged = {}              # tag -> set of keys
+        self._versions = {}            # tag -> times its entries changed
+        self._epoch = 0                # times everything was dropped
+        self._counter = None           # change counter the entries are valid for
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    # -- lookups ----------------------------------------------------------
+
+    def sync(self, counter: int):
+        """Drop everything if the database changed since the entries were read."""
+        with self._lock:
+            if counter != self._counter:
+                if self._entries:
+                    self.invalidations += 1
+                    increment('query_cache', 'invalidations')
+                self._clear()
+                self._counter = counter
+
+    def get(self, key, view=None, count: bool = True):
+        """
+        The cached value for ``key``, or None.
+
+        ``view(value)`` is returned instead of the value if given; it runs
+        under the cache lock, so it sees a window no write is extending.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                result = None
+            else:
+                self._entries.move_to_end(key)
+                result = entry[0] if view is None else view(entry[0])
+        if count:
+            self.counted(result is not None)
+        return result
+
+    def find(self, tag, view, count: bool = True):
+        """The first non-None ``view(value)`` over entries with ``tag``, or None."""
+        with self._lock:
+            result = None
+            for key in self._tagged.get(tag, ()):
+                result = view(self._entries[key][0])
+                if result is not None:
+                    self._entries.move_to_end(key)
+                    break
+        if count:
+            self.counted(result is not None)
+        return result
+
+    def atomic(self):
+        """Hold the cache lock, so several lookups see the same entries."""
+        return self._lock
+
+    def counted(self, hit: bool, lookups: int = 1):
+        """Count lookups made with ``count=False``."""
+        with self._lock:
+            if hit:
+                self.hits += lookups
+            else:
+                self.misses += lookups
+        increment('query_cache', 'hits' if hit else 'misses', lookups)
+
+    def token(self, tags) -> tuple:
+        """Taken before computing a result on a miss; ``put`` stores it only if still current."""
+        with self._lock:
+            return self._epoch, tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def put(self, key, value, size: int, tags, token: tuple):
+        """Store a result computed on a miss, evicting least recently used entries to fit."""
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if token != (self._epoch, tuple(self._versions.get(tag, 0) for tag in tags)):
+                return
+            self._discard(key)
+            self._entries[key] = (value, size, tuple(tags))
+            self.bytes += size
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+                increment('query_cache', 'evictions')
+
+    # -- writes through this process ----------------------------------------
+
+    def wrote(self, counter_before: int):
+        """
+        Record a committed write transaction made by this process.
+
+        ``counter_before`` is the change counter read inside the
+        transaction, before anything was changed. If other processes
+        wrote since the entries were read, everything is dropped.
+        """
+        with self._lock:
+            if counter_before != self._counter:
+                self._clear()
+            self._counter = counter_before + 1
+
+    def invalidate(self, tag):
+        """Drop every entry with ``tag``."""
+        with self._lock:
+            keys = self._tagged.get(tag)
+            if keys:
+                self.invalidations += 1
+                for key in list(keys):
+                    self._discard(key)
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+        if keys:
+            increment('query_cache', 'invalidations')
+
+    def update(self, tag, func):
+        """
+        Apply ``func(value)`` to every entry with ``tag`` in place.
+
+        ``func`` returns the entry's new size, or None to drop it.
+        """
+        with self._lock:
+            for key in list(self._tagged.get(tag, ())):
+                value, size, tags = self._entries[key]
+                new_size = func(value)
+                if new_size is None:
+                    self._discard(key)
+                    self.invalidations += 1
+                else:
+                    self._entries[key] = (value, new_size, tags)
+                    self.bytes += new_size - size
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    # -- internals ----------------------------------------------------------
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry[1]
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def _clear(self):
+        self._entries.clear()
+        self._tagged.clear()
+        self._epoch += 1
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'size_mb': round(self.bytes / (1024 * 1024), 2),
+                'max_entries': self.max_entries,
+                'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,210 @@
+"""Flight recorder: seconds-resolution context for alerts.
+
+Stored history is one row per COLLECTION_INTERVAL, and the processes
+snapshot is the top 12 by memory every MEDIUM_INTERVAL. By the time an
+alert is read, the spike behind it is averaged away. The recorder keeps
+a ring of the last RECORDER_WINDOW seconds instead: every
+RECORDER_INTERVAL it samples CPU, memory, swap and network from /proc,
+plus CPU% and RSS of the RECORDER_PROCESSES busiest and largest
+processes. Only /proc/stat, /proc/meminfo, /proc/net/dev and each
+process's stat file are read, through collectors.procfs. The ring is
+preallocated and never stored, so normal operation costs one sample per
+interval and nothing else.
+
+When an alert starts firing (a rule transition, see rules.py), the
+collector calls ``recorder.trigger``. The ring is frozen as it is, and
+sampling switches to every RECORDER_BURST_INTERVAL for RECORDER_BURST
+seconds. Alerts that start firing during the burst join it. The frozen
+window and the burst are then stored as one recording, attached to
+every alert that joined it, and served at /api/recordings/<id>.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from collectors import procfs
+from config import Config
+from database import store_recording
+from instrumentation import increment, timed
+
+logger = logging.getLogger(__name__)
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+_PAGE_MB = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+_MB = 1024 * 1024
+_MEMINFO_KEYS = ('MemTotal', 'MemAvailable', 'SwapTotal', 'SwapFree')
+
+
+class Sampler:
+    """Rates and percentages since the previous ``sample`` call."""
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._previous = None
+        # (cpu_percent, iowait_percent) of the last sample that saw jiffies pass
+        self._cpu_percent = (None, None)
+
+    def sample(self):
+        """One sample, or None on the first call (nothing to diff against yet)."""
+        now = time.monotonic()
+        cpu = procfs.read_cpu_times()
+        network = procfs.read_net_dev()
+        processes = procfs.read_process_stats()
+        memory = procfs.read_meminfo(_MEMINFO_KEYS)
+        previous, self._previous = self._previous, (now, cpu, network, processes)
+        if previous is None:
+            return None
+
+        then, previous_cpu, previous_network, previous_processes = previous
+        elapsed = now - then
+        total = cpu[0] - previous_cpu[0]
+        # Short burst intervals can fall between two clock ticks: repeat the last values
+        if total > 0:
+            self._cpu_percent = (
+                round((total - (cpu[1] - previous_cpu[1])) / total * 100, 1),
+                round((cpu[2] - previous_cpu[2]) / total * 100, 1),
+            )
+        rx = sum(v[0] - previous_network[k][0] for k, v in network.items() if k in previous_network)
+        tx = sum(v[1] - previous_network[k][1] for k, v in network.items() if k in previous_network)
+
+        # Jiffies used since the previous sample, for processes seen in both
+        used = {
+            pid: jiffies - previous_processes[pid][1]
+            for pid, (name, jiffies, rss) in processes.items() if pid in previous_processes
+        }
+        busiest = heapq.nlargest(self.processes, (pid for pid in used if used[pid]), key=used.get)
+        largest = heapq.nlargest(self.processes, processes, key=lambda pid: processes[pid][2])
+        top = busiest + [pid for pid in largest if pid not in busiest]
+
+        mem_total = memory.get('MemTotal') or 1
+        return {
+            't': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'cpu_percent': self._cpu_percent[0],
+            'iowait_percent': self._cpu_percent[1],
+            'memory_percent': round((mem_total - memory.get('MemAvailable', 0)) / mem_total * 100, 1),
+            'swap_used_mb': round((memory.get('SwapTotal', 0) - memory.get('SwapFree', 0)) / 1024, 1),
+            'rx_mb_per_sec': round(max(rx, 0) / elapsed / _MB, 4),
+            'tx_mb_per_sec': round(max(tx, 0) / elapsed / _MB, 4),
+            'processes': [
+                {
+                    'pid': pid,
+                    'name': processes[pid][0],
+                    'cpu_percent': round(used.get(pid, 0) / _CLOCK_TICKS / elapsed * 100, 1),
+                    'mem_mb': round(processes[pid][2] * _PAGE_MB, 1),
+                }
+                for pid in top
+            ],
+        }
+
+
+class FlightRecorder:
+    """The ring of recent samples and the burst around alerts; see the module docstring."""
+
+    def __init__(self, interval: float, window: float, burst_seconds: float, burst_interval: float,
+                 processes: int, store=store_recording):
+        self.interval = interval
+        self.burst_seconds = burst_seconds
+        self.burst_interval = min(burst_interval, interval) if interval > 0 else burst_interval
+        self._store = store
+        self._sampler = Sampler(processes)
+        self._ring = [None] * max(int(window / interval), 1) if interval > 0 else []
+        self._head = 0
+        self._ring_at = 0.0
+        self._burst = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._ring)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='flight-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def window(self) -> list:
+        """The ring's samples, oldest first."""
+        with self._lock:
+            return self._window()
+
+    def _window(self) -> list:
+        return [s for s in self._ring[self._head:] + self._ring[:self._head] if s is not None]
+
+    def trigger(self, alert_ids: list):
+        """Freeze the window and start a burst for these alerts, or add them to the running burst."""
+        if self._thread is None or not alert_ids:
+            return
+        with self._lock:
+            if self._burst is None:
+                self._burst = {
+                    'alert_ids': list(alert_ids),
+                    'window': self._window(),
+                    'burst': [],
+                    'deadline': time.monotonic() + self.burst_seconds,
+                }
+            else:
+                self._burst['alert_ids'].extend(alert_ids)
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with timed('recorder', 'sample'):
+                    sample = self._sampler.sample()
+            except Exception as e:
+                logger.error(f"Error sampling for the flight recorder: {e}")
+                sample = None
+            now = time.monotonic()
+
+            with self._lock:
+                burst = self._burst
+                if sample is not None:
+                    if burst is not None:
+                        burst['burst'].append(sample)
+                    # During a burst the ring still gets one sample per interval
+                    if burst is None or now - self._ring_at >= self.interval * 0.9:
+                        self._ring[self._head] = sample
+                        self._head = (self._head + 1) % len(self._ring)
+                        self._ring_at = now
+                finished = burst is not None and now >= burst['deadline']
+                if finished:
+                    self._burst = None
+
+            if finished:
+                self._persist(burst)
+            self._wake.wait(self.burst_interval if self._burst is not None else self.interval)
+            self._wake.clear()
+
+    def _persist(self, burst: dict):
+        recording = {
+            'interval': self.interval,
+            'burst_interval': self.burst_interval,
+            'window': burst['window'],
+            'burst': burst['burst'],
+        }
+        recording_id = self._store(burst['alert_ids'], recording)
+        if recording_id is not None:
+            increment('recorder', 'recordings')
+            logger.info(f"Stored flight recording {recording_id} for alerts {burst['alert_ids']}")
+
+
+recorder = FlightRecorder(
+    Config.RECORDER_INTERVAL_SECONDS,
+    Config.RECORDER_WINDOW_SECONDS,
+    Config.RECORDER_BURST_SECONDS,
+    Config.RECORDER_BURST_INTERVAL_SECONDS,
+    Config.RECORDER_PROCESSES,
+)
@@ -0,0 +1,453 @@
+"""Declarative alert rules, compiled once into evaluator closures.
+
+A rule names a metric type and a field, a comparison and a warning
+and/or critical threshold. With ``entities`` it applies to every mount,
+container, drive or interface in the payload separately, each alerting
+under its own metric (``disk:/srv``). Thresholds and the time a condition
+must hold can be overridden per entity.
+
+The built-in rules are derived from the threshold settings in Config;
+ALERT_RULES_FILE (JSON) adds rules, or replaces built-in ones of the same
+name. A rule looks like::
+
+    {"name": "disk", "type": "disk", "entities": "", "field": "percent_used",
+     "op": ">=", "warning": 80, "critical": 95, "for": 0,
+     "exclude": ["/boot*"], "overrides": {"/backup": {"warning": 95}},
+     "message": "Disk {entity} at {value}% — {level} threshold {threshold}%"}
+
+Each rule is compiled into a closure with its path lookups, comparison,
+entity filter and overrides resolved, and the rules are indexed by metric
+type, so evaluating a freshly collected payload is one pass over the
+rules of its type. The engine keeps a small state per rule and entity:
+how long the condition has held, and the level last alerted.
+"""
+
+import fnmatch
+import json
+import logging
+import operator
+import os
+import re
+import time
+from collections import namedtuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+_ORDERING = frozenset({'>', '>=', '<', '<='})
+
+# Checked in this order: a value over both thresholds is critical
+LEVELS = ('critical', 'warning')
+
+# 'first' takes the first entity in payload order
+REDUCERS = {'max': max, 'min': min, 'first': lambda values: values[0]}
+
+RULE_KEYS = frozenset({
+    'name', 'type', 'entities', 'include', 'exclude', 'field', 'percent_of', 'per_cpu', 'delta',
+    'reduce', 'prefer', 'op', 'warning', 'critical', 'for', 'overrides', 'message', 'enabled',
+})
+OVERRIDE_KEYS = frozenset({'warning', 'critical', 'for'})
+
+# A condition that keeps holding is alerted again after this long, as the
+# alerts table only suppresses repeats within an hour
+REPEAT_SECONDS = 3600
+
+# Entities whose filter result, overrides and last value (delta) are remembered per rule
+_MAX_CACHED_ENTITIES = 4096
+
+_CPUS = os.cpu_count() or 1
+
+Alert = namedtuple('Alert', 'level metric message transition')
+Alert.__doc__ = """An alert to store; ``transition`` is False when it repeats one already firing at that level."""
+
+CompiledRule = namedtuple('CompiledRule', 'name type evaluate spec')
+
+
+_NUMBER_TYPES = (int, float)
+
+
+def _is_number(value) -> bool:
+    return type(value) in _NUMBER_TYPES
+
+
+def _keys(path: str) -> tuple:
+    return tuple(path.split('.')) if path else ()
+
+
+def _reader(keys: tuple):
+    """A function reading the value at ``keys`` from a dict, or None."""
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda data: data.get(key)
+    return lambda data: _lookup(data, keys)
+
+
+def _lookup(data, keys: tuple):
+    for key in keys:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return f'{round(value, 2):g}'
+    return str(value)
+
+
+def _glob(patterns) -> re.Pattern:
+    """One regex matching any of the ``fnmatch`` patterns."""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns))
+
+
+def _thresholds(spec: dict, name: str, numeric: bool) -> tuple:
+    """(level, threshold) pairs in LEVELS order, and the hold time, of a rule or override."""
+    levels = []
+    for level in LEVELS:
+        threshold = spec.get(level)
+        if threshold is None:
+            continue
+        if numeric and not _is_number(threshold):
+            raise ValueError(f'Rule {name!r}: {level} must be a number for a numeric comparison')
+        levels.append((level, threshold))
+    hold = spec.get('for', 0)
+    if not _is_number(hold) or hold < 0:
+        raise ValueError(f"Rule {name!r}: 'for' must be a number of seconds")
+    return tuple(levels), float(hold)
+
+
+def compile_rule(spec: dict) -> CompiledRule:
+    """
+    Compile a rule into ``evaluate(payload)``, yielding (entity, value,
+    level, threshold, hold seconds) for every subject whose condition is
+    met; entity is None for a rule on the payload as a whole. ValueError
+    if the rule is malformed.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('A rule must be an object')
+    name = spec.get('name')
+    if not name or not isinstance(name, str):
+        raise ValueError('Every rule needs a name')
+    unknown = set(spec) - RULE_KEYS
+    if unknown:
+        raise ValueError(f'Rule {name!r}: unknown keys {sorted(unknown)}')
+    for key in ('type', 'field'):
+        if not isinstance(spec.get(key), str) or not spec[key]:
+            raise ValueError(f'Rule {name!r}: {key} is required')
+
+    op = spec.get('op', '>=')
+    if op not in OPERATORS:
+        raise ValueError(f'Rule {name!r}: op must be one of {sorted(OPERATORS)}')
+    compare = OPERATORS[op]
+    numeric = op in _ORDERING or bool(spec.get('percent_of') or spec.get('per_cpu') or spec.get('delta'))
+    levels, hold = _thresholds(spec, name, numeric)
+    if not levels:
+        raise ValueError(f'Rule {name!r}: needs a warning or critical threshold')
+
+    entities = spec.get('entities')
+    per_entity = entities is not None
+    reduce = spec.get('reduce')
+    if reduce is not None and (reduce not in REDUCERS or not per_entity):
+        raise ValueError(f'Rule {name!r}: reduce must be one of {sorted(REDUCERS)}, with entities')
+    reducer = REDUCERS.get(reduce)
+
+    # {field: [values]}: reduce over the entities whose fields match (case
+    # insensitively), or over all of them if none do
+    prefer = spec.get('prefer')
+    preferred = None
+    if prefer is not None:
+        if not reducer or not isinstance(prefer, dict) or not all(
+                isinstance(values, list) and all(isinstance(v, str) for v in values) for values in prefer.values()):
+            raise ValueError(f'Rule {name!r}: prefer maps fields to lists of values, with reduce')
+        matchers = [(_reader(_keys(field)), frozenset(v.lower() for v in values)) for field, values in prefer.items()]
+
+        def preferred(subject) -> bool:
+            for read_field, values in matchers:
+                value = read_field(subject)
+                if not isinstance(value, str) or value.lower() not in values:
+                    return False
+            return True
+
+    overrides = []
+    for pattern, override in (spec.get('overrides') or {}).items():
+        if not isinstance(override, dict) or set(override) - OVERRIDE_KEYS:
+            raise ValueError(f'Rule {name!r}: overrides map entity patterns to warning/critical/for')
+        merged = {'warning': spec.get('warning'), 'critical': spec.get('critical'), 'for': spec.get('for', 0)}
+        merged.update(override)
+        overrides.append((_glob(pattern), _thresholds(merged, name, numeric)))
+    if overrides and (not per_entity or reducer):
+        raise ValueError(f'Rule {name!r}: overrides need per-entity alerts (entities without reduce)')
+
+    entity_keys = _keys(entities or '')
+    read = _reader(_keys(spec['field']))
+    divisor = _reader(_keys(spec['percent_of'])) if spec.get('percent_of') else None
+    per_cpu = bool(spec.get('per_cpu'))
+    delta = bool(spec.get('delta'))
+    include = _glob(spec['include']) if spec.get('include') else None
+    exclude = _glob(spec['exclude']) if spec.get('exclude') else None
+    previous = {}
+    selected = {}
+    resolved = {}
+
+    if not (divisor or per_cpu or delta):
+        if numeric:
+            def value_of(subject, entity):
+                value = read(subject)
+                return value if type(value) in _NUMBER_TYPES else None
+        else:
+            def value_of(subject, entity):
+                return read(subject)
+    else:
+        def value_of(subject, entity):
+            value = read(subject)
+            if type(value) not in _NUMBER_TYPES:
+                return None
+            if divisor:
+                total = divisor(subject)
+                if type(total) not in _NUMBER_TYPES or not total:
+                    return None
+                value = 100.0 * value / total
+            if per_cpu:
+                value = value / _CPUS
+            if delta:
+                if len(previous) >= _MAX_CACHED_ENTITIES and entity not in previous:
+                    previous.clear()
+                last, previous[entity] = previous.get(entity), value
+                if last is None:
+                    return None
+                value = value - last
+            return value
+
+    select = None
+    if include is not None or exclude is not None:
+        def select(entity) -> bool:
+            keep = selected.get(entity)
+            if keep is None:
+                if len(selected) >= _MAX_CACHED_ENTITIES:
+                    selected.clear()
+                keep = selected[entity] = (
+                    (include is None or include.match(entity) is not None)
+                    and (exclude is None or exclude.match(entity) is None)
+                )
+            return keep
+
+    def thresholds_for(entity) -> tuple:
+        found = resolved.get(entity)
+        if found is None:
+            if len(resolved) >= _MAX_CACHED_ENTITIES:
+                resolved.clear()
+            found = next((t for pattern, t in overrides if pattern.match(entity)), (levels, hold))
+            resolved[entity] = found
+        return found
+
+    def subjects(payload):
+        """(entity, value, subject) of the selected entities that have the field."""
+        group = _lookup(payload, entity_keys)
+        if type(group) is not dict:
+            return
+        for entity, subject in group.items():
+            if type(subject) is dict and (select is None or select(entity)):
+                value = value_of(subject, entity)
+                if value is not None:
+                    yield entity, value, subject
+
+    if not per_entity:
+        def evaluate(payload):
+            value = value_of(payload, None)
+            if value is not None:
+                for level, threshold in levels:
+                    if compare(value, threshold):
+                        yield None, value, level, threshold, hold
+                        break
+
+    elif reducer:
+        def evaluate(payload):
+            values, preferred_values = [], []
+            for _, value, subject in subjects(payload):
+                values.append(value)
+                if preferred is not None and preferred(subject):
+                    preferred_values.append(value)
+            if values:
+                value = reducer(preferred_values or values)
+                for level, threshold in levels:
+                    if compare(value, threshold):
+                        yield None, value, level, threshold, hold
+                        break
+
+    else:
+        def evaluate(payload):
+            rule_levels, rule_hold = levels, hold
+            for entity, value, _ in subjects(payload):
+                if overrides:
+                    rule_levels, rule_hold = thresholds_for(entity)
+                for level, threshold in rule_levels:
+                    if compare(value, threshold):
+                        yield entity, value, level, threshold, rule_hold
+                        break
+
+    return CompiledRule(name, spec['type'], evaluate, spec)
+
+
+def _message(rule: CompiledRule, entity, value, level: str, threshold) -> str:
+    template = rule.spec.get('message')
+    fields = {
+        'name': rule.name,
+        'entity': entity if entity is not None else '',
+        'value': _format(value),
+        'level': level,
+        'threshold': _format(threshold),
+    }
+    if template:
+        try:
+            return template.format(**fields)
+        except (KeyError, IndexError, ValueError):
+            pass
+    subject = f'{rule.name} {entity}' if entity is not None else rule.name
+    return f'{subject} {fields["value"]} — {level} threshold {fields["threshold"]}'
+
+
+def _usable(payload) -> bool:
+    return isinstance(payload, dict) and not (
+        payload.get('error') or payload.get('_initializing') or payload.get('warming_up')
+    )
+
+
+class RuleEngine:
+    """Compiled rules indexed by metric type, with per-entity firing state."""
+
+    def __init__(self, rules: list, repeat_seconds: float = REPEAT_SECONDS):
+        self.repeat_seconds = repeat_seconds
+        self.rules = []
+        self._by_type = {}
+        for spec in rules:
+            if spec.get('enabled', True) is False:
+                continue
+            rule = compile_rule(spec)
+            self.rules.append(rule)
+            self._by_type.setdefault(rule.type, []).append(rule)
+        # Per rule: entity -> [pending level, pending since, alerted level, alerted at]
+        self._state = {rule.name: {} for rule in self.rules}
+
+    def evaluate(self, payloads: dict, now: float = None) -> list:
+        """
+        Evaluate the rules of every type in ``payloads`` ({type: payload}).
+
+        Returns the alerts to store: conditions that have held for their
+        rule's ``for`` time, at a level not yet alerted, or that are still
+        firing REPEAT_SECONDS after they were last alerted. Payloads with
+        an error leave their rules' state as it was.
+        """
+        now = time.monotonic() if now is None else now
+        alerts = []
+        for metric_type, payload in payloads.items():
+            rules = self._by_type.get(metric_type)
+            if not rules or not _usable(payload):
+                continue
+            for rule in rules:
+                states = self._state[rule.name]
+                seen = set()
+                for entity, value, level, threshold, hold in rule.evaluate(payload):
+                    seen.add(entity)
+                    state = states.get(entity)
+                    if state is None:
+                        state = states[entity] = [level, now, None, 0.0]
+                    elif state[0] != level:
+                        state[0], state[1] = level, now
+                    if now - state[1] < hold:
+                        continue
+                    transition = state[2] != level
+                    if transition or now - state[3] >= self.repeat_seconds:
+                        state[2], state[3] = level, now
+                        metric = rule.name if entity is None else f'{rule.name}:{entity}'
+                        alerts.append(Alert(level, metric, _message(rule, entity, value, level, threshold), transition))
+                # Conditions no longer met, and entities gone from the payload
+                # (a removed container), start over
+                if len(states) > len(seen):
+                    for entity in [e for e in states if e not in seen]:
+                        del states[entity]
+        return alerts
+
+
+def default_rules() -> list:
+    """The built-in rules, from Config's thresholds."""
+    c = Config
+    return [
+        # The CPU package zone, else the first zone, as the original check read
+        {'name': 'cpu_temp', 'type': 'cpu', 'entities': 'temperature', 'field': 'temp_celsius', 'reduce': 'first',
+         'prefer': {'type': ['x86_pkg_temp', 'cpu-thermal', 'cpu']},
+         'warning': c.TEMP_WARNING_CELSIUS, 'critical': c.TEMP_CRITICAL_CELSIUS,
+         'message': 'CPU temp {value}°C — {level} threshold {threshold}°C'},
+        {'name': 'load', 'type': 'cpu', 'field': 'load.load_5min', 'per_cpu': True,
+         'warning': c.LOAD_WARNING_MULTIPLIER, 'critical': c.LOAD_CRITICAL_MULTIPLIER,
+         'message': 'Load {value} per CPU (5 min) — {level} threshold {threshold}'},
+        {'name': 'memory', 'type': 'memory', 'field': 'percent_used',
+         'warning': c.MEMORY_WARNING_PERCENT, 'critical': c.MEMORY_CRITICAL_PERCENT,
+         'message': 'RAM {value}% — {level} threshold {threshold}%'},
+        {'name': 'swap', 'type': 'memory', 'field': 'swap_used_mb', 'percent_of': 'swap_total_mb',
+         'warning': c.SWAP_WARNING_PERCENT, 'critical': c.SWAP_CRITICAL_PERCENT,
+         'message': 'Swap {value}% used — {level} threshold {threshold}%'},
+        {'name': 'disk', 'type': 'disk', 'entities': '', 'field': 'percent_used',
+         'warning': c.DISK_WARNING_PERCENT, 'critical': c.DISK_CRITICAL_PERCENT,
+         'message': 'Disk {entity} at {value}% — {level} threshold {threshold}%'},
+        {'name': 'smart_health', 'type': 'smart', 'entities': '', 'field': 'health_passed', 'op': '==',
+         'critical': False, 'message': 'SMART health check failed on {entity}'},
+        {'name': 'container_restarts', 'type': 'docker', 'entities': '', 'field': 'restart_count', 'delta': True,
+         'op': '>', 'warning': 0, 'message': 'Container {entity} restarted {value} times since the last check'},
+        {'name': 'container_health', 'type': 'docker', 'entities': '', 'field': 'health', 'op': '==',
+         'warning': 'unhealthy', 'message': 'Container {entity} is unhealthy'},
+        {'name': 'service', 'type': 'services', 'entities': '', 'field': 'running', 'op': '==',
+         'critical': False, 'for': c.SERVICE_DOWN_SECONDS, 'message': 'Service {entity} is not running'},
+        {'name': 'network_rx', 'type': 'network', 'entities': '', 'exclude': ['_total', 'lo'],
+         'field': 'rx_mb_per_sec', 'warning': c.NETWORK_WARNING_MB_PER_SEC or None, 'for': c.NETWORK_SATURATION_SECONDS,
+         'enabled': bool(c.NETWORK_WARNING_MB_PER_SEC),
+         'message': '{entity} receiving {value} MB/s — {level} threshold {threshold} MB/s'},
+        {'name': 'network_tx', 'type': 'network', 'entities': '', 'exclude': ['_total', 'lo'],
+         'field': 'tx_mb_per_sec', 'warning': c.NETWORK_WARNING_MB_PER_SEC or None, 'for': c.NETWORK_SATURATION_SECONDS,
+         'enabled': bool(c.NETWORK_WARNING_MB_PER_SEC),
+         'message': '{entity} sending {value} MB/s — {level} threshold {threshold} MB/s'},
+    ]
+
+
+def load_rules(path: str = None) -> list:
+    """
+    The built-in rules merged with the rules in ``path`` (a JSON list, or
+    an object with a ``rules`` list); a file rule replaces the built-in
+    rule of the same name. OSError or ValueError if the file is unusable.
+    """
+    rules = {rule['name']: rule for rule in default_rules()}
+    if path:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('rules')
+        if not isinstance(data, list):
+            raise ValueError(f'{path}: expected a list of rules')
+        for spec in data:
+            compile_rule(spec)
+            rules[spec['name']] = spec
+    return list(rules.values())
+
+
+def build_engine(path: str = None) -> RuleEngine:
+    """The engine for ``path`` (default ALERT_RULES_FILE); the built-in rules if it cannot be used."""
+    path = Config.ALERT_RULES_FILE if path is None else path
+    try:
+        return RuleEngine(load_rules(path))
+    except (OSError, ValueError) as e:
+        logger.error(f"Alert rules {path} not loaded, using the built-in rules: {e}")
+        return RuleEngine(load_rules())
+
+
+rule_engine = build_engine()
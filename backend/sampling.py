@@ -0,0 +1,115 @@
+"""In-memory aggregation of high-frequency metric samples."""
+
+import copy
+import threading
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _walk_numbers(data: dict, prefix: tuple = ()):
+    """Yield (path, value) for every numeric leaf of a nested dict."""
+    for key, value in data.items():
+        path = prefix + (key,)
+        if isinstance(value, dict):
+            yield from _walk_numbers(value, path)
+        elif _is_number(value):
+            yield path, value
+
+
+def _get_path(tree: dict, path: tuple):
+    for key in path:
+        if not isinstance(tree, dict) or key not in tree:
+            return None
+        tree = tree[key]
+    return tree
+
+
+def _set_path(tree: dict, path: tuple, value):
+    for key in path[:-1]:
+        node = tree.get(key)
+        if not isinstance(node, dict):
+            node = tree[key] = {}
+        tree = node
+    tree[path[-1]] = value
+
+
+class SampleAggregator:
+    """
+    Accumulate samples per metric type and reduce them to min/avg/max.
+
+    Numeric leaves are averaged in place so flushed rows keep the shape of a
+    single sample; non-numeric leaves take the value from the latest sample,
+    as do the leaves named in ``counter_fields[metric_type]`` (counters and
+    uptimes, whose average is meaningless).
+    Per-leaf minimums and maximums are attached under ``_agg``. Leaves no
+    longer in the latest sample (a removed container, a vanished interface)
+    are dropped rather than re-created without their other fields.
+    """
+
+    def __init__(self, counter_fields: dict = None):
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._counter_fields = counter_fields or {}
+
+    def add(self, metric_type: str, data: dict):
+        """Fold one sample into the current window for ``metric_type``."""
+        if not isinstance(data, dict) or data.get('error') or data.get('_initializing'):
+            return
+
+        with self._lock:
+            window = self._windows.setdefault(metric_type, {'samples': 0, 'stats': {}, 'last': None})
+            window['samples'] += 1
+            window['last'] = data
+            stats = window['stats']
+            for path, value in _walk_numbers(data):
+                s = stats.get(path)
+                if s is None:
+                    stats[path] = [value, value, value, 1]
+                else:
+                    if value < s[0]:
+                        s[0] = value
+                    if value > s[1]:
+                        s[1] = value
+                    s[2] += value
+                    s[3] += 1
+
+    def flush(self) -> dict:
+        """Return aggregated data for every metric type and start new windows."""
+        with self._lock:
+            windows, self._windows = self._windows, {}
+
+        results = {}
+        for metric_type, window in windows.items():
+            avg_tree = copy.deepcopy(window['last'])
+            min_tree = {}
+            max_tree = {}
+            counters = self._counter_fields.get(metric_type, ())
+            for path, (lo, hi, total, count) in window['stats'].items():
+                if not _is_number(_get_path(avg_tree, path)):
+                    continue
+                if path[-1] not in counters:
+                    _set_path(avg_tree, path, round(total / count, 4))
+                _set_path(min_tree, path, lo)
+                _set_path(max_tree, path, hi)
+
+            avg_tree['_agg'] = {
+                'samples': window['samples'],
+                'min': min_tree,
+                'max': max_tree
+            }
+            results[metric_type] = avg_tree
+
+        return results
+
+
+def peak_values(data: dict) -> dict:
+    """Return a copy of an aggregated sample with numeric leaves set to their window maximum."""
+    agg = data.get('_agg') if isinstance(data, dict) else None
+    if not agg:
+        return data
+    peak = {k: copy.deepcopy(v) for k, v in data.items() if k != '_agg'}
+    for path, value in _walk_numbers(agg.get('max', {})):
+        _set_path(peak, path, value)
+    return peak
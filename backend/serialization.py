@@ -0,0 +1,79 @@
+"""JSON encoding for API responses, using orjson when it is installed.
+
+Stored payloads and snapshot fragments are already JSON, so responses are
+assembled by splicing those bytes into the envelope (``Raw`` values)
+rather than decoding and re-encoding them.
+"""
+
+import base64
+import json
+
+from config import Config
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+USE_ORJSON = ORJSON_AVAILABLE and Config.JSON_BACKEND != 'json'
+
+
+class Raw(bytes):
+    """Already-encoded JSON, inserted verbatim by ``splice``."""
+
+
+def dumps(obj) -> bytes:
+    """Encode ``obj`` as UTF-8 JSON bytes."""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode('utf-8')
+
+
+def loads(data):
+    """Decode JSON from str or bytes."""
+    if USE_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # json.dumps writes NaN/Infinity, which orjson rejects
+            pass
+    return json.loads(data)
+
+
+def splice(fields: dict) -> bytes:
+    """Encode a flat object; ``Raw`` values are copied in as they are."""
+    parts = []
+    for key, value in fields.items():
+        parts.append(dumps(key) + b': ' + (value if isinstance(value, Raw) else dumps(value)))
+    return b'{' + b', '.join(parts) + b'}'
+
+
+def _encode_row(row) -> bytes:
+    return b'{"timestamp": "%s", "data": %s}' % (row['timestamp'].encode('ascii'), row['data'])
+
+
+def encode_rows(rows) -> Raw:
+    """JSON array of history rows whose ``data`` is already-encoded JSON bytes."""
+    return Raw(b'[' + b', '.join(_encode_row(row) for row in rows) + b']')
+
+
+def encode_ndjson(rows) -> bytes:
+    """The same rows as newline-delimited JSON, one object per line."""
+    return b''.join(_encode_row(row) + b'\n' for row in rows)
+
+
+def encode_cursor(keyset) -> str:
+    """Opaque pagination token for a (timestamp, id) keyset, or None."""
+    if keyset is None:
+        return None
+    return base64.urlsafe_b64encode(f'{keyset[0]}|{keyset[1]}'.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: str) -> tuple:
+    """Inverse of ``encode_cursor``; raises ValueError for a malformed token."""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return timestamp, int(row_id)
+    except (UnicodeError, ValueError):
+        raise ValueError(f'Invalid cursor: {token!r}')
@@ -0,0 +1,174 @@
+"""Snapshot shared between processes through a memory-mapped segment.
+
+The collecting process writes the encoded /api/current body and the
+per-type update times into one file (under /dev/shm by default); any
+number of web workers map it read-only. A seqlock guards the contents:
+the writer makes the sequence number odd, rewrites the body, then makes
+it even again, and readers retry if the sequence was odd or changed while
+they copied. A CRC of the body catches torn reads on weakly ordered CPUs.
+
+Layout: header (magic, seq, current_len, updated_len, crc32), then the
+current body, then the updated-times JSON.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from serialization import loads
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SMSNAP01'
+_HEADER = struct.Struct('<8sQIII4x')
+_SEQ = struct.Struct('<Q')
+_SEQ_OFFSET = 8
+HEADER_SIZE = _HEADER.size
+INITIAL_CAPACITY = 1 << 20
+READ_RETRIES = 50
+
+
+class SegmentWriter:
+    """Single writer; owned by the process holding the collector lock."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._map = None
+        self.seq = 0
+
+    def _open(self, needed: int):
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < needed:
+            # Grow in powers of two; readers remap when the header says so
+            size = max(INITIAL_CAPACITY, 1 << (needed - 1).bit_length())
+            os.ftruncate(self._fd, size)
+        if self._map is None or len(self._map) < size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._fd, size)
+            magic, seq = self._map[:8], _SEQ.unpack_from(self._map, _SEQ_OFFSET)[0]
+            if magic == MAGIC:
+                # Continue the previous writer's sequence (rounded up if it died mid-write)
+                self.seq = max(self.seq, seq + (seq & 1))
+
+    def publish(self, current: bytes, updated: bytes):
+        """Replace the segment contents."""
+        self._open(HEADER_SIZE + len(current) + len(updated))
+        m = self._map
+        writing = self.seq + 1
+        _SEQ.pack_into(m, _SEQ_OFFSET, writing)
+        body_end = HEADER_SIZE + len(current)
+        m[HEADER_SIZE:body_end] = current
+        m[body_end:body_end + len(updated)] = updated
+        crc = zlib.crc32(updated, zlib.crc32(current))
+        _HEADER.pack_into(m, 0, MAGIC, writing, len(current), len(updated), crc)
+        self.seq = writing + 1
+        _SEQ.pack_into(m, _SEQ_OFFSET, self.seq)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class SegmentReader:
+    """Read-only view of a segment; cheap to poll, copies only on change."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = None
+        self._inode = None
+        # (seq, current, updated) of the last consistent read, swapped as one
+        self._last = None
+
+    def _remap(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._map is not None and st.st_ino == self._inode and len(self._map) >= st.st_size:
+            return True
+        if st.st_size < HEADER_SIZE:
+            return False
+        with open(self.path, 'rb') as f:
+            new_map = mmap.mmap(f.fileno(), st.st_size, access=mmap.ACCESS_READ)
+        # Not closed explicitly: another thread may still be copying from it
+        self._map, self._inode = new_map, st.st_ino
+        return True
+
+    def _sequence(self):
+        if self._map is None and not self._remap():
+            return None
+        return _SEQ.unpack_from(self._map, _SEQ_OFFSET)[0]
+
+    def read(self):
+        """Return (seq, current body, updated JSON) or None if nothing was published yet.
+
+        Returns the cached copy when the sequence has not moved.
+        """
+        seq = self._sequence()
+        if seq is None:
+            return None
+        last = self._last
+        if last is not None and last[0] == seq:
+            return last
+
+        for _ in range(READ_RETRIES):
+            m = self._map
+            magic, seq, current_len, updated_len, crc = _HEADER.unpack_from(m, 0)
+            if magic != MAGIC or seq == 0:
+                return None
+            end = HEADER_SIZE + current_len + updated_len
+            if seq & 1:
+                time.sleep(0.0005)
+                continue
+            if end > len(m):
+                # The writer grew the file since we mapped it
+                self._remap()
+                continue
+            current = m[HEADER_SIZE:HEADER_SIZE + current_len]
+            updated = m[HEADER_SIZE + current_len:end]
+            if _SEQ.unpack_from(m, _SEQ_OFFSET)[0] != seq:
+                continue
+            if zlib.crc32(updated, zlib.crc32(current)) != crc:
+                continue
+            self._last = (seq, current, updated)
+            return self._last
+        logger.debug("Snapshot segment busy; serving the previous copy")
+        return self._last
+
+    def current_body(self):
+        """Encoded /api/current body, or None if nothing was published yet."""
+        result = self.read()
+        return result[1] if result else None
+
+    def load_since(self, since: float) -> list:
+        """Return (metric_type, updated, data) for samples newer than ``since``.
+
+        Same contract as a SnapshotMirror loader; also notices a segment
+        recreated under the same path.
+        """
+        self._remap()
+        result = self.read()
+        if result is None:
+            return []
+        _, current, updated = result
+        times = loads(updated)
+        if not any(t > since for t in times.values()):
+            return []
+        samples = loads(current)
+        return [
+            (metric_type, t, samples[metric_type])
+            for metric_type, t in times.items()
+            if t > since and metric_type in samples
+        ]
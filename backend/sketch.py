@@ -0,0 +1,238 @@
+"""Mergeable quantile sketches of numeric metric fields.
+
+Averages and min/max per flushed row hide how often a field spikes. For
+every COLLECTION_INTERVAL bucket, each numeric leaf of the sketched types
+also gets a quantile sketch of every sample taken in it. A percentile over
+any window is then the merge of the buckets' sketches, without the raw
+samples (which the fast tier never stores).
+
+The sketch is DDSketch-style: values fall into logarithmic bins of
+relative width ``RELATIVE_ACCURACY``, so any quantile is returned within
+1% of a value actually observed at that rank, whatever the distribution.
+Merging two sketches adds their bin counts, which is exact: the merged
+sketch is the one that would have been built from all samples.
+"""
+
+import math
+import threading
+from datetime import datetime
+
+RELATIVE_ACCURACY = 0.01
+
+# Above this many bins per sign, the lowest are collapsed into one; at 1%
+# accuracy, 2048 bins span about 18 orders of magnitude
+MAX_BINS = 2048
+
+# Magnitudes below this are counted as zero
+MIN_VALUE = 1e-9
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def _index(value: float) -> int:
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def _bin_value(index: int) -> float:
+    """Value representing a bin: within RELATIVE_ACCURACY of anything in it."""
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+
+def _collapse(bins: dict):
+    """Fold the lowest bins into one, so at most MAX_BINS remain."""
+    if len(bins) <= MAX_BINS:
+        return
+    indexes = sorted(bins)
+    keep = indexes[-MAX_BINS]
+    for index in indexes[:-MAX_BINS]:
+        bins[keep] += bins.pop(index)
+
+
+def _pack(bins: dict) -> list:
+    """Bins as a flat list of index deltas and counts: [i0, c0, i1 - i0, c1, ...]."""
+    packed, previous = [], 0
+    for index in sorted(bins):
+        packed.extend((index - previous, bins[index]))
+        previous = index
+    return packed
+
+
+def _unpack(packed) -> dict:
+    if not isinstance(packed, list) or len(packed) % 2:
+        raise ValueError('Invalid sketch bins')
+    bins, index = {}, 0
+    for i in range(0, len(packed), 2):
+        delta, count = packed[i], packed[i + 1]
+        if not isinstance(delta, int) or not isinstance(count, int) or count < 0:
+            raise ValueError('Invalid sketch bins')
+        index += delta
+        bins[index] = bins.get(index, 0) + count
+    return bins
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch; see the module docstring."""
+
+    __slots__ = ('positive', 'negative', 'zero', 'count', 'min', 'max')
+
+    def __init__(self):
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        if value != value:
+            return
+        if value > MIN_VALUE:
+            index = _index(value)
+            self.positive[index] = self.positive.get(index, 0) + 1
+            if len(self.positive) > MAX_BINS:
+                _collapse(self.positive)
+        elif value < -MIN_VALUE:
+            index = _index(-value)
+            self.negative[index] = self.negative.get(index, 0) + 1
+            if len(self.negative) > MAX_BINS:
+                _collapse(self.negative)
+        else:
+            self.zero += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'QuantileSketch'):
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + count
+        _collapse(self.positive)
+        _collapse(self.negative)
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float):
+        """Value at quantile ``q`` (0..1), or None if the sketch is empty."""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return self._clamp(-_bin_value(index))
+        seen += self.zero
+        if seen > rank:
+            return self._clamp(0.0)
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._clamp(_bin_value(index))
+        return self.max
+
+    def _clamp(self, value: float) -> float:
+        return min(max(value, self.min), self.max)
+
+    def to_dict(self) -> dict:
+        sketch = {'n': self.count, 'min': self.min, 'max': self.max}
+        if self.positive:
+            sketch['p'] = _pack(self.positive)
+        if self.negative:
+            sketch['m'] = _pack(self.negative)
+        if self.zero:
+            sketch['z'] = self.zero
+        return sketch
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'QuantileSketch':
+        """Inverse of ``to_dict``; ValueError if ``data`` is not a sketch."""
+        if not isinstance(data, dict):
+            raise ValueError('A sketch must be an object')
+        sketch = cls()
+        try:
+            sketch.positive = _unpack(data.get('p', []))
+            sketch.negative = _unpack(data.get('m', []))
+            sketch.zero = int(data.get('z', 0))
+            sketch.count = int(data['n'])
+            sketch.min = float(data['min'])
+            sketch.max = float(data['max'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Invalid sketch')
+        if sketch.count != sketch.zero + sum(sketch.positive.values()) + sum(sketch.negative.values()):
+            raise ValueError('Sketch count does not match its bins')
+        return sketch
+
+
+def parse_quantiles(agg: str) -> list:
+    """'p50,p95,p99.9' as [(name, 0.5), (name, 0.95), ...]; ValueError otherwise."""
+    quantiles = []
+    for name in agg.split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        try:
+            value = float(name[1:]) / 100 if name.startswith('p') else None
+        except ValueError:
+            value = None
+        if value is None or not 0 <= value <= 1:
+            raise ValueError(f'Invalid agg {name!r}; expected percentiles such as p50,p95,p99')
+        quantiles.append((name, value))
+    if not quantiles:
+        raise ValueError('agg needs at least one percentile, e.g. agg=p95')
+    return quantiles
+
+
+def _walk_numbers(data: dict, path: str = ''):
+    """(dotted path, value) for every numeric leaf, skipping ``_agg`` and lists."""
+    for key, value in data.items():
+        child = f'{path}.{key}' if path else str(key)
+        if isinstance(value, dict):
+            if key != '_agg':
+                yield from _walk_numbers(value, child)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield child, value
+
+
+class SketchAggregator:
+    """
+    Per metric type, one sketch per numeric field for the current bucket.
+
+    ``flush`` returns each type's bucket as (start timestamp, {path:
+    sketch dict}) and starts new buckets; the start is when the bucket's
+    first sample was added.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def add(self, metric_type: str, data: dict):
+        if not isinstance(data, dict) or data.get('error') or data.get('_initializing'):
+            return
+        with self._lock:
+            bucket = self._buckets.get(metric_type)
+            if bucket is None:
+                started = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                bucket = self._buckets[metric_type] = (started, {})
+            sketches = bucket[1]
+            for path, value in _walk_numbers(data):
+                sketch = sketches.get(path)
+                if sketch is None:
+                    sketch = sketches[path] = QuantileSketch()
+                sketch.add(value)
+
+    def flush(self) -> dict:
+        with self._lock:
+            buckets, self._buckets = self._buckets, {}
+        return {
+            metric_type: (started, {path: sketch.to_dict() for path, sketch in sketches.items() if sketch.count})
+            for metric_type, (started, sketches) in buckets.items()
+        }
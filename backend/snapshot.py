@@ -0,0 +1,68 @@
+"""Latest collected sample per metric type, shared by the scheduler and the API."""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """
+    Thread-safe holder for the most recent sample of each metric type.
+
+    Every publish bumps ``version`` so readers can cache anything derived
+    from the snapshot and rebuild it only when a new sample arrives.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._updated = {}
+        self._listeners = []
+        self.version = 0
+
+    def subscribe(self, callback):
+        """
+        Call ``callback(version)`` from the publishing thread after every publish.
+
+        A callback that raises is logged; it does not fail the publish.
+        """
+        self._listeners.append(callback)
+
+    def publish(self, metric_type: str, data: dict):
+        """Replace the latest sample for ``metric_type``."""
+        with self._lock:
+            self._data[metric_type] = data
+            self._updated[metric_type] = time.time()
+            self.version += 1
+            version = self.version
+        self._notify(version)
+
+    def merge(self, samples: dict, updated: dict):
+        """Replace several samples at once, keeping their original timestamps."""
+        with self._lock:
+            self._data.update(samples)
+            self._updated.update(updated)
+            self.version += 1
+            version = self.version
+        self._notify(version)
+
+    def _notify(self, version: int):
+        for callback in self._listeners:
+            try:
+                callback(version)
+            except Exception as e:
+                logger.error(f"Error in snapshot listener {callback!r}: {e}")
+
+    def get(self, metric_type: str, default=None):
+        """Return the latest sample for ``metric_type``."""
+        return self._data.get(metric_type, default)
+
+    def read(self) -> tuple:
+        """Return (version, samples, updated timestamps) as a consistent copy."""
+        with self._lock:
+            return self.version, dict(self._data), dict(self._updated)
+
+
+snapshot = Snapshot()
@@ -5,7 +5,18 @@
 const API_BASE = '';
 
 let waveformBuffer = [];
-const WAVEFORM_MAX = 60;
+
+// Network history over the selected window: { t, tx, rx } per sample, oldest first
+let networkBuffer = [];
+
+// History is downsampled on the server to about one row per pixel of the widest waveform
+const WAVEFORM_IDS = ['cpu-waveform', 'net-waveform'];
+
+// Incremental history per type: the window it was loaded for and where to resume
+const historyState = {
+    cpu:     { hours: null, since: null },
+    network: { hours: null, since: null },
+};
 
 let thresholds = {};
 
@@ -48,8 +59,7 @@ function startClock() {
 function setupEventListeners() {
     document.getElementById('refresh-btn').addEventListener('click', loadData);
     document.getElementById('time-range').addEventListener('change', () => {
-        loadHistoricalData();
-        loadNetworkHistory();
+        loadData();
         document.getElementById('waveform-range').textContent =
             document.getElementById('time-range').options[document.getElementById('time-range').selectedIndex].text;
     });
@@ -58,22 +68,53 @@ function setupEventListeners() {
 // ─────────────────────────────────────────────────────
 //  Data loading
 // ─────────────────────────────────────────────────────
-async function loadData() {
+// One load at a time: each request sends historyState's since and its response
+// advances it, so overlapping loads would append the same rows twice. A call
+// made while a load is in flight runs once more after it.
+let loading = null;
+let loadQueued = false;
+
+// Reloads every 5s while panels warm up: one timer, replaced by each load
+let warmupTimer = null;
+
+function loadData() {
+    if (loading) {
+        loadQueued = true;
+        return loading;
+    }
+    loading = loadDashboard().finally(() => {
+        loading = null;
+        if (loadQueued) {
+            loadQueued = false;
+            loadData();
+        }
+    });
+    return loading;
+}
+
+// One /api/dashboard round-trip: current snapshot, history series, alerts and stats
+async function loadDashboard() {
+    const hours = document.getElementById('time-range').value;
     try {
-        const res = await fetch(`${API_BASE}/api/current`);
+        const res = await fetch(`${API_BASE}/api/dashboard?${dashboardQuery(hours)}`);
         if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        const data = await res.json();
+        const dashboard = await res.json();
+        const data = dashboard.current;
 
         thresholds = data.thresholds || {};
 
-        updateCpuDisplay(data.cpu);
-        updateMemoryDisplay(data.memory);
-        renderDiskHexes(data.disk, data.smart);
-        renderDockerBars(data.docker, data.memory);
-        renderProcessList(data.processes, data.memory);
-        updateNetworkStats(data.network);
-        renderServiceStatus(data.services);
+        // Panels whose first sample the server has not collected yet keep their spinner
+        const warming = new Set(data.warming_up || []);
+        if (!warming.has('cpu'))       updateCpuDisplay(data.cpu);
+        if (!warming.has('memory'))    updateMemoryDisplay(data.memory);
+        if (!warming.has('disk'))      renderDiskHexes(data.disk, data.smart, dashboard.forecast);
+        if (!warming.has('docker'))    renderDockerBars(data.docker, data.memory);
+        if (!warming.has('processes')) renderProcessList(data.processes, data.memory);
+        if (!warming.has('network'))   updateNetworkStats(data.network);
+        if (!warming.has('services'))  renderServiceStatus(data.services);
         updateMagiStatus(data);
+        clearTimeout(warmupTimer);
+        warmupTimer = warming.size ? setTimeout(loadData, 5000) : null;
 
         const uptime = data.cpu?.load?.uptime_seconds;
         if (uptime != null) {
@@ -84,13 +125,13 @@ async function loadData() {
             new Date().toLocaleTimeString();
 
         const statusEl = document.getElementById('system-status');
-        statusEl.textContent = '■ SYSTEM STATUS: NOMINAL';
+        statusEl.textContent = warming.size ? '■ SYSTEM STATUS: WARMING UP' : '■ SYSTEM STATUS: NOMINAL';
         statusEl.className = 'status-nominal';
 
-        loadHistoricalData();
-        loadNetworkHistory();
-        loadAlerts();
-        loadStats();
+        updateCpuHistory(await takeHistory('cpu', hours, dashboard.series.cpu));
+        updateNetworkHistory(hours, await takeHistory('network', hours, dashboard.series.network));
+        renderAlerts(dashboard.alerts);
+        renderStats(dashboard.stats);
 
     } catch (err) {
         console.error('Data load error:', err);
@@ -100,26 +141,68 @@ async function loadData() {
     }
 }
 
-async function loadHistoricalData() {
-    const hours = document.getElementById('time-range').value;
-    try {
-        const res = await fetch(`${API_BASE}/api/history/cpu?hours=${hours}`);
+// Full window on first load or a range change, afterwards only rows newer than the last one seen
+function dashboardQuery(hours) {
+    const params = new URLSearchParams({
+        hours, series: Object.keys(historyState).join(','), points: chartPoints(),
+    });
+    for (const [type, state] of Object.entries(historyState)) {
+        if (state.hours === hours && state.since) params.set(`since.${type}`, state.since);
+    }
+    return params.toString();
+}
+
+// Fold one series of a dashboard response into its state; returns { reset, data }
+async function takeHistory(type, hours, page) {
+    const state = historyState[type];
+    const data  = page?.data || [];
+    const reset = !page || !('cursor' in page);
+    if (reset) {
+        state.hours = hours;
+        state.since = data.length ? data[data.length - 1].timestamp : null;
+    } else {
+        state.since = page.cursor || state.since;
+        // More new rows than one response holds (e.g. after the tab slept)
+        if (page.more) data.push(...await fetchNewer(type, hours));
+    }
+    return { reset, data };
+}
+
+async function fetchNewer(type, hours) {
+    const state = historyState[type];
+    const data = [];
+    let more = true;
+    while (more) {
+        const res = await fetch(
+            `${API_BASE}/api/history/${type}?hours=${hours}&since=${encodeURIComponent(state.since)}`);
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
         const json = await res.json();
-        if (json.data && json.data.length > 0) {
-            populateWaveform(json.data);
-        }
-    } catch (err) {
-        console.error('History error:', err);
+        data.push(...(json.data || []));
+        state.since = json.cursor || state.since;
+        more = json.more === true;
     }
+    return data;
 }
 
-async function loadStats() {
-    try {
-        const res = await fetch(`${API_BASE}/api/stats`);
-        const stats = await res.json();
-        document.getElementById('db-stats').textContent =
-            `// REC:${stats.total_records || 0} DB:${stats.database_size_mb || 0}MB`;
-    } catch (_) {}
+function chartPoints() {
+    const widths = WAVEFORM_IDS.map(id => document.getElementById(id)?.getBoundingClientRect().width || 0);
+    return Math.round(Math.max(...widths, 240));
+}
+
+// Stored timestamps are UTC 'YYYY-MM-DD HH:MM:SS', so they compare as strings
+function windowStart(hours) {
+    return new Date(Date.now() - hours * 3600 * 1000).toISOString().slice(0, 19).replace('T', ' ');
+}
+
+function updateCpuHistory({ reset, data }) {
+    if (data.length > 0) {
+        populateWaveform(data, !reset);
+    }
+}
+
+function renderStats(stats) {
+    document.getElementById('db-stats').textContent =
+        `// REC:${stats?.total_records || 0} DB:${stats?.database_size_mb || 0}MB`;
 }
 
 // ─────────────────────────────────────────────────────
@@ -241,8 +324,8 @@ function drawArcGauge(canvas, value, max, statusKey) {
 // ─────────────────────────────────────────────────────
 //  Waveform (canvas)
 // ─────────────────────────────────────────────────────
-function populateWaveform(histData) {
-    waveformBuffer = histData
+function populateWaveform(histData, append = false) {
+    const temps = histData
         .map(d => {
             const t = d.data?.temperature;
             if (!t || t.error) return null;
@@ -250,9 +333,11 @@ function populateWaveform(histData) {
             return first?.temp_celsius ?? null;
         })
         .filter(v => v !== null);
+    waveformBuffer = append ? waveformBuffer.concat(temps) : temps;
 
-    if (waveformBuffer.length > WAVEFORM_MAX) {
-        waveformBuffer = waveformBuffer.slice(-WAVEFORM_MAX);
+    const max = chartPoints();
+    if (waveformBuffer.length > max) {
+        waveformBuffer = waveformBuffer.slice(-max);
     }
     drawWaveform();
 }
@@ -363,7 +448,10 @@ function renderRamBar(percent, container) {
 // ─────────────────────────────────────────────────────
 //  Disk Hexagons
 // ─────────────────────────────────────────────────────
-function renderDiskHexes(disks, smart) {
+// Mounts projected to fill within this many days show the estimate
+const FORECAST_SHOW_DAYS = 30;
+
+function renderDiskHexes(disks, smart, forecast) {
     const container = document.getElementById('disk-hexes');
 
     if (!disks || disks.error) {
@@ -379,6 +467,18 @@ function renderDiskHexes(disks, smart) {
         }
     }
 
+    // Forecast (/api/forecast): days to full per mount, drives with growing sector counts
+    const fullIn = {};
+    const degrading = new Set();
+    if (forecast) {
+        for (const [mount, f] of Object.entries(forecast.disk || {})) {
+            if (f.days_to_full != null && f.days_to_full <= FORECAST_SHOW_DAYS) fullIn[mount] = f.days_to_full;
+        }
+        for (const [dev, trends] of Object.entries(forecast.smart || {})) {
+            if (Object.values(trends).some(t => t.growing)) degrading.add(dev.replace('/dev/', ''));
+        }
+    }
+
     const fillColors = {
         'hex-ok':       { dark: 'rgba(1,8,5,0.98)',  fill: 'rgba(0,70,35,0.97)' },
         'hex-warn':     { dark: 'rgba(8,6,1,0.98)',  fill: 'rgba(75,52,0,0.97)' },
@@ -391,8 +491,12 @@ function renderDiskHexes(disks, smart) {
         const devShort = disk.device.replace('/dev/', '');
         const health   = healthMap[devShort];
         const smartBadge =
-            health === false ? '<div class="hex-smart-fail">⚠ SMART</div>' :
-            health === true  ? '<div class="hex-smart-ok">● OK</div>' : '';
+            health === false       ? '<div class="hex-smart-fail">⚠ SMART</div>' :
+            degrading.has(devShort) ? '<div class="hex-smart-warn">▲ SECTORS</div>' :
+            health === true        ? '<div class="hex-smart-ok">● OK</div>' : '';
+        const days = fullIn[mount];
+        const etaBadge = days == null ? '' :
+            `<div class="hex-eta">FULL ~${days < 1 ? `${Math.max(Math.round(days * 24), 1)}H` : `${Math.round(days)}D`}</div>`;
 
         const { dark, fill } = fillColors[hexClass];
         const bgStyle = `linear-gradient(to top, ${fill} ${pct}%, ${dark} ${pct}%)`;
@@ -405,6 +509,7 @@ function renderDiskHexes(disks, smart) {
             <div class="hex-pct">${pct}%</div>
             <div class="hex-gb">${disk.used_gb}/${disk.total_gb}G</div>
             <div class="hex-dev"><span class="hex-mount-text${devScrollClass}">${disk.device}</span></div>
+            ${etaBadge}
             ${smartBadge}
         </div>`;
     }).join('');
@@ -588,18 +693,19 @@ function renderServiceStatus(services) {
     }).join('');
 }
 
-async function loadNetworkHistory() {
-    const hours = document.getElementById('time-range').value;
-    try {
-        const res  = await fetch(`${API_BASE}/api/history/network?hours=${hours}`);
-        const json = await res.json();
-        if (!json.data || json.data.length < 2) return;
-        const txBuf = json.data.map(d => d.data?._total?.tx_mb_per_sec ?? 0);
-        const rxBuf = json.data.map(d => d.data?._total?.rx_mb_per_sec ?? 0);
-        drawNetworkWaveform(txBuf, rxBuf);
-    } catch (err) {
-        console.error('Network history error:', err);
-    }
+function updateNetworkHistory(hours, { reset, data }) {
+    const points = data.map(d => ({
+        t:  d.timestamp,
+        tx: d.data?._total?.tx_mb_per_sec ?? 0,
+        rx: d.data?._total?.rx_mb_per_sec ?? 0,
+    }));
+    // Drop samples that have scrolled out of the window
+    const start = windowStart(hours);
+    networkBuffer = (reset ? points : networkBuffer.concat(points))
+        .filter(p => p.t > start)
+        .slice(-chartPoints());
+    if (networkBuffer.length < 2) return;
+    drawNetworkWaveform(networkBuffer.map(p => p.tx), networkBuffer.map(p => p.rx));
 }
 
 function drawNetworkWaveform(txBuf, rxBuf) {
@@ -674,32 +780,25 @@ function drawNetworkWaveform(txBuf, rxBuf) {
 // ─────────────────────────────────────────────────────
 //  Alert Log
 // ─────────────────────────────────────────────────────
-async function loadAlerts() {
+function renderAlerts(alerts) {
     const container = document.getElementById('alert-list');
-    try {
-        const res    = await fetch(`${API_BASE}/api/alerts`);
-        const alerts = await res.json();
-
-        if (!Array.isArray(alerts) || alerts.length === 0) {
-            container.innerHTML = '<div class="no-data">NO ALERTS LOGGED</div>';
-            return;
-        }
-
-        container.innerHTML = alerts.map(a => {
-            const d   = new Date(a.timestamp + 'Z');
-            const ts  = `${String(d.getDate()).padStart(2,'0')}/${String(d.getMonth()+1).padStart(2,'0')} ${String(d.getHours()).padStart(2,'0')}:${String(d.getMinutes()).padStart(2,'0')}`;
-            return `
-            <div class="alert-row">
-                <span class="alert-badge alert-badge-${a.level}">${a.level.toUpperCase()}</span>
-                <div class="alert-content">
-                    <div class="alert-msg">${a.message}</div>
-                    <div class="alert-time">${ts}</div>
-                </div>
-            </div>`;
-        }).join('');
-    } catch (err) {
-        container.innerHTML = '<div class="no-data">ALERT DATA UNAVAILABLE</div>';
+    if (!Array.isArray(alerts) || alerts.length === 0) {
+        container.innerHTML = '<div class="no-data">NO ALERTS LOGGED</div>';
+        return;
     }
+
+    container.innerHTML = alerts.map(a => {
+        const d   = new Date(a.timestamp + 'Z');
+        const ts  = `${String(d.getDate()).padStart(2,'0')}/${String(d.getMonth()+1).padStart(2,'0')} ${String(d.getHours()).padStart(2,'0')}:${String(d.getMinutes()).padStart(2,'0')}`;
+        return `
+        <div class="alert-row">
+            <span class="alert-badge alert-badge-${a.level}">${a.level.toUpperCase()}</span>
+            <div class="alert-content">
+                <div class="alert-msg">${a.message}</div>
+                <div class="alert-time">${ts}${a.recording_id ? ` <a class="alert-rec" href="/api/recordings/${a.recording_id}" target="_blank" title="Samples around this alert">REC</a>` : ''}</div>
+            </div>
+        </div>`;
+    }).join('');
 }
 
 // ─────────────────────────────────────────────────────